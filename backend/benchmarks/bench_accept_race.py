@@ -0,0 +1,107 @@
+"""
+Benchmark de concorrência do aceite de corridas
+
+Sobe o app em um servidor werkzeug com threads e dispara, para cada
+corrida, N aceites simultâneos de motoristas diferentes. Verifica que
+exatamente um recebe 200 e os demais 409, que o driver_id gravado é o do
+vencedor, e mostra a distribuição de latência dos aceites.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_accept_race.py --threads 32 --rides 50
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=32, help='aceites simultâneos por corrida')
+    parser.add_argument('--rides', type=int, default=50)
+    args = parser.parse_args()
+
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+    os.environ.update({'DATABASE_URL': f'sqlite:///{db_file}', 'OUTBOX_WORKER': '0'})
+
+    from werkzeug.serving import make_server
+    from src.main import app
+    from src.models.user import db
+    from src.models.ride import Ride
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}/api"
+
+    passenger = requests.post(f"{base}/users", json={'username': 'p', 'email': 'p@x',
+                                                     'user_type': 'passenger'}).json()
+    drivers = [requests.post(f"{base}/users", json={'username': f'd{i}', 'email': f'd{i}@x',
+                                                    'user_type': 'driver'}).json()['id']
+               for i in range(args.threads)]
+
+    latencies = []
+    statuses = Counter()
+    violations = []
+    for _ in range(args.rides):
+        ride = requests.post(f"{base}/rides", json={'passenger_id': passenger['id'],
+                                                    'origin': 'A', 'destination': 'B',
+                                                    'origin_lat': -23.55, 'origin_lng': -46.63,
+                                                    'destination_lat': -23.56, 'destination_lng': -46.64}).json()
+        barrier = threading.Barrier(args.threads)
+        results = []
+        lock = threading.Lock()
+
+        def accept(driver_id):
+            session = requests.Session()
+            barrier.wait()
+            t0 = time.perf_counter()
+            response = session.post(f"{base}/rides/{ride['id']}/accept", json={'driver_id': driver_id})
+            elapsed = (time.perf_counter() - t0) * 1000
+            with lock:
+                results.append((driver_id, response.status_code, elapsed))
+
+        threads = [threading.Thread(target=accept, args=(driver_id,)) for driver_id in drivers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        winners = [driver_id for driver_id, status, _ in results if status == 200]
+        statuses.update(status for _, status, _ in results)
+        latencies.extend(elapsed for _, _, elapsed in results)
+        with app.app_context():
+            stored = db.session.get(Ride, ride['id']).driver_id
+        if len(winners) != 1 or stored != winners[0]:
+            violations.append((ride['id'], winners, stored))
+
+    server.shutdown()
+    os.unlink(db_file)
+
+    print(f"{args.rides} corridas x {args.threads} aceites simultâneos")
+    print(f"respostas: {dict(sorted(statuses.items()))}")
+    print(f"latência: p50 {percentile(latencies, 0.5):.1f} ms, p95 {percentile(latencies, 0.95):.1f} ms, "
+          f"p99 {percentile(latencies, 0.99):.1f} ms, desvio {statistics.pstdev(latencies):.1f} ms")
+    if violations:
+        print(f"FALHA: {len(violations)} corridas sem exatamente um vencedor: {violations[:5]}")
+        sys.exit(1)
+    print("OK: exatamente um vencedor por corrida")
+
+
+if __name__ == '__main__':
+    main()
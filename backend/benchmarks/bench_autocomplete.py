@@ -0,0 +1,75 @@
+"""
+Benchmark do índice de autocompletar (PlaceAutocompleteIndex)
+
+Carrega N endereços sintéticos (os mesmos do bench_gazetteer) com
+frequências aleatórias e simula usuários digitando endereços letra a letra:
+cada tecla é uma consulta ao índice. Mede a carga, o custo por tecla (com e
+sem a posição do usuário) e o de registrar o endereço de uma nova corrida.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_autocomplete.py --addresses 200000 --typed 500
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_gazetteer import synthetic_records
+from src.services.autocomplete import PlaceAutocompleteIndex
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def keystrokes(index, addresses, position):
+    samples = []
+    for address in addresses:
+        for length in range(1, len(address) + 1):
+            started = time.perf_counter()
+            index.search(address[:length], *position)
+            samples.append((time.perf_counter() - started) * 1e6)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--addresses', type=int, default=200000)
+    parser.add_argument('--typed', type=int, default=500, help='endereços digitados letra a letra')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    entries = []
+    for record in synthetic_records(args.addresses, rng):
+        address = f"{record['road']}, {record['house_number']}, {record['suburb']}"
+        entries.append((address, record['latitude'], record['longitude'], int(rng.paretovariate(1.2))))
+
+    index = PlaceAutocompleteIndex()
+    started = time.perf_counter()
+    index.load(entries)
+    stats = index.stats()
+    print(f"carga: {stats['places']} endereços, {stats['keys']} chaves em {time.perf_counter() - started:.1f} s")
+
+    # Usuários digitam o nome da rua e o número (ex: "Rua Augusta Lima 12, 35")
+    typed = [address.rsplit(',', 1)[0] for address, *_ in rng.sample(entries, args.typed)]
+    print(f"{'caso':<28} {'teclas':>7} {'p50':>9} {'p99':>9}")
+    for name, position in (('sem posição', (None, None)), ('com posição (proximidade)', (-23.55, -46.63))):
+        samples = keystrokes(index, typed, position)
+        print(f"{name:<28} {len(samples):>7} {percentile(samples, 0.5):>6.1f} µs {percentile(samples, 0.99):>6.1f} µs")
+
+    samples = []
+    for i in range(1000):
+        started = time.perf_counter()
+        index.add(f'Rua Nova {i}, {rng.randint(1, 999)}, Centro', -23.55, -46.63)
+        samples.append((time.perf_counter() - started) * 1e6)
+    print(f"{'add (endereço novo)':<28} {len(samples):>7} {percentile(samples, 0.5):>6.1f} µs "
+          f"{percentile(samples, 0.99):>6.1f} µs")
+
+
+if __name__ == '__main__':
+    main()
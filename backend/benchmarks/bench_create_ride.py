@@ -0,0 +1,97 @@
+"""
+Benchmark da latência de POST /rides com endereços sem coordenadas
+
+Aponta o geocodificador para o stub local com latência artificial no
+/search e cria corridas com origem, destino e waypoints só com endereço
+(endereços novos a cada corrida, sem hits de cache). Compara o pool de
+geocodificação com 1 worker (equivalente às consultas em sequência) e
+com N workers, e mostra o efeito do prazo total quando o stub fica lento.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_create_ride.py --rides 50 --delay 0.15 --waypoints 1
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import start_stub_server
+from src.services.cache import TwoTierCache
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run(client, passenger_id, rides, waypoints, tag):
+    latencies, missing = [], 0
+    for i in range(rides):
+        body = {
+            'passenger_id': passenger_id,
+            'origin': f'Rua {tag} {i}, São Paulo',
+            'destination': f'Avenida {tag} {i}, São Paulo',
+            'waypoints': [{'address': f'Parada {tag} {i}-{w}'} for w in range(waypoints)]
+        }
+        started = time.perf_counter()
+        response = client.post('/api/rides', json=body)
+        latencies.append((time.perf_counter() - started) * 1000)
+        ride = response.get_json()
+        missing += sum(value is None for value in (ride['origin_lat'], ride['destination_lat']))
+        missing += sum(waypoint.get('lat') is None for waypoint in ride['waypoints'])
+    return latencies, missing
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rides', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=0.15, help='latência do stub por consulta (s)')
+    parser.add_argument('--waypoints', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+    os.environ.update({'DATABASE_URL': f'sqlite:///{db_file}', 'OUTBOX_WORKER': '0',
+                       'LOCATION_INGESTOR': '0', 'DISPATCH_ENGINE': '0'})
+
+    import src.routes.ride as ride_routes
+    from src.main import app
+
+    server, base_url = start_stub_server(delay=args.delay)
+    service = ride_routes.nominatim_service
+    service.base_url = base_url
+    # O stub não tem limite de uso; o limitador de 1 req/s mediria só a fila
+    service.rate_governor = None
+    client = app.test_client()
+    passenger_id = client.post('/api/users', json={'username': 'p', 'email': 'p@x',
+                                                   'user_type': 'passenger'}).get_json()['id']
+
+    lookups = 2 + args.waypoints
+    print(f"{args.rides} corridas, {lookups} endereços por corrida, stub com {args.delay * 1000:.0f} ms por consulta")
+    print(f"{'configuração':<32} {'p50':>9} {'p99':>9} {'sem coords':>11}")
+    cases = [
+        ('1 worker (sequencial)', 1, 30.0, 'seq'),
+        (f'{args.workers} workers', args.workers, 30.0, 'par'),
+        (f'{args.workers} workers, prazo {args.delay * 500:.0f} ms', args.workers, args.delay / 2, 'prazo'),
+    ]
+    for name, workers, deadline, tag in cases:
+        service.cache = TwoTierCache()
+        service.max_workers = workers
+        service._executor = None
+        ride_routes.GEOCODE_DEADLINE_SECONDS = deadline
+        latencies, missing = run(client, passenger_id, args.rides, args.waypoints, tag)
+        print(f"{name:<32} {percentile(latencies, 0.5):>6.0f} ms {percentile(latencies, 0.99):>6.0f} ms "
+              f"{missing:>6}/{args.rides * lookups}")
+        # Consultas que passaram do prazo ainda rodam no pool: esperar antes do próximo caso
+        service._lookup_executor().shutdown(wait=True)
+
+    server.shutdown()
+    os.unlink(db_file)
+
+
+if __name__ == '__main__':
+    main()
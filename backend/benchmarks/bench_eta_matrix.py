@@ -0,0 +1,75 @@
+"""
+Benchmark da matriz de tempos em blocos (calculate_eta_matrix)
+
+Usa o stub local com latência artificial no /table para medir o efeito do
+número de requisições simultâneas, do cache de pares e do fallback em
+linha reta quando o OSRM está fora do ar.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_eta_matrix.py --sizes 100 500 1000 --delay 0.05
+
+O stub roda no mesmo processo (Python), então parte do tempo por bloco
+é do próprio stub; contra um OSRM real o custo de CPU do cliente é menor.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import start_stub_server
+from src.services.http_client import build_session
+from src.services.routing import OSRMRoutingService
+
+
+def random_points(rng, count):
+    return [(-46.63 + dx, -23.55 + dy) for dx, dy in rng.normal(0, 0.05, (count, 2))]
+
+
+def timed(function):
+    t0 = time.perf_counter()
+    result = function()
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500])
+    parser.add_argument('--delay', type=float, default=0.05, help='latência do /table no stub (s)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    server, url = start_stub_server(delay=args.delay)
+    rng = np.random.default_rng(7)
+    print(f"/table com {args.delay * 1000:.0f} ms de latência, blocos de 50 x 50")
+    print(f"{'N x N':>11} {'workers':>8} {'frio':>10} {'cache':>10} {'estimadas':>10}")
+    for size in args.sizes:
+        sources = random_points(rng, size)
+        destinations = random_points(rng, size)
+        reference = None
+        for workers in args.workers:
+            service = OSRMRoutingService(url, session=build_session(pool_size=max(args.workers)),
+                                         matrix_workers=workers)
+            cold, cold_ms = timed(lambda: service.calculate_eta_matrix(sources, destinations))
+            _, warm_ms = timed(lambda: service.calculate_eta_matrix(sources, destinations))
+            if reference is None:
+                reference = cold['durations']
+            assert np.allclose(cold['durations'], reference)
+            print(f"{size:>5} x {size:<5} {workers:>8} {cold_ms:>7.0f} ms {warm_ms:>7.0f} ms "
+                  f"{int(cold['estimated'].sum()):>10}")
+
+    # OSRM fora do ar: tudo estimado por haversine x fator de desvio
+    offline = OSRMRoutingService('http://127.0.0.1:9', session=build_session(retries=0))
+    sources = random_points(rng, 200)
+    matrix, offline_ms = timed(lambda: offline.calculate_eta_matrix(sources, sources))
+    print(f"OSRM indisponível, 200 x 200: {offline_ms:.0f} ms, "
+          f"{int(matrix['estimated'].sum())} células estimadas")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
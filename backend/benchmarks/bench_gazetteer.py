@@ -0,0 +1,109 @@
+"""
+Benchmark do gazetteer offline (FTS5 + R*Tree) com endereços sintéticos
+
+Gera N endereços espalhados pela região de São Paulo (ruas com nomes
+combinados de um vocabulário, números, bairros e CEPs), monta o banco com
+build_gazetteer e mede a latência de geocodificação direta (endereço
+completo e digitado de forma parcial), reversa e busca por proximidade
+(termo comum, conferido na caixa do raio, e nome de rua, buscado no FTS).
+
+Uso (a partir de backend/):
+    python benchmarks/bench_gazetteer.py --addresses 1000000 --queries 2000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.gazetteer import GazetteerGeocodingService, build_gazetteer
+
+STREET_TYPES = ['Rua', 'Avenida', 'Alameda', 'Travessa', 'Praça']
+NAMES = ['Augusta', 'Paulista', 'Consolação', 'Bela Cintra', 'Haddock Lobo', 'Oscar Freire',
+         'Pamplona', 'Itapeva', 'Frei Caneca', 'Peixoto Gomide', 'Joaquim Eugênio', 'Brigadeiro',
+         'Tutóia', 'Domingos', 'Santos', 'Almeida', 'Lima', 'Carvalho', 'Pereira', 'Souza',
+         'Vergueiro', 'Liberdade', 'Ipiranga', 'Tiradentes', 'Anchieta', 'Mooca', 'Penha']
+SUBURBS = ['Consolação', 'Jardins', 'Pinheiros', 'Vila Mariana', 'Moema', 'Mooca', 'Tatuapé',
+           'Santana', 'Lapa', 'Butantã', 'Ipiranga', 'Liberdade', 'Bela Vista', 'Perdizes']
+ORIGIN = (-23.55, -46.63)
+
+
+def synthetic_records(count, rng):
+    streets = []
+    for i in range(max(1, count // 500)):
+        name = f"{rng.choice(STREET_TYPES)} {rng.choice(NAMES)} {rng.choice(NAMES)} {i}"
+        start = (ORIGIN[0] + rng.uniform(-0.2, 0.2), ORIGIN[1] + rng.uniform(-0.25, 0.25))
+        direction = (rng.uniform(-0.02, 0.02), rng.uniform(-0.02, 0.02))
+        streets.append((name, start, direction, rng.choice(SUBURBS), f"0{rng.randint(1000, 9999)}-000"))
+    for i in range(count):
+        name, start, direction, suburb, postcode = streets[i % len(streets)]
+        number = i // len(streets) * 2 + 1
+        t = number / 1000
+        yield {
+            'latitude': start[0] + direction[0] * t + rng.uniform(-2e-5, 2e-5),
+            'longitude': start[1] + direction[1] * t + rng.uniform(-2e-5, 2e-5),
+            'road': name, 'house_number': str(number), 'suburb': suburb,
+            'city': 'São Paulo', 'postcode': postcode
+        }
+
+
+def timings(function, inputs):
+    samples, found = [], 0
+    for value in inputs:
+        started = time.perf_counter()
+        result = function(value)
+        samples.append((time.perf_counter() - started) * 1000)
+        found += bool(result)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1], found
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--addresses', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--db', help='reaproveitar um banco já gerado')
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'gazetteer.db')
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        count = build_gazetteer(path, synthetic_records(args.addresses, rng))
+        print(f"build: {count} endereços em {time.perf_counter() - started:.1f} s, "
+              f"{os.path.getsize(path) / 1e6:.0f} MB")
+
+    service = GazetteerGeocodingService(path)
+    sample = [dict(row) for row in service._conn().execute(
+        'SELECT * FROM places ORDER BY random() LIMIT ?', (args.queries,))]
+
+    full = [row['display_name'] for row in sample]
+    typed = [f"{row['road'].split(' ', 1)[1].lower()} {row['house_number']}" for row in sample]
+    missing_number = [f"{row['road']}, 99999, São Paulo" for row in sample]
+    points = [(row['latitude'] + rng.uniform(-3e-4, 3e-4), row['longitude'] + rng.uniform(-3e-4, 3e-4))
+              for row in sample]
+
+    cases = [
+        ('direta, endereço completo', service.geocode_address, full),
+        ('direta, digitado parcial', service.geocode_address, typed),
+        ('direta, número inexistente', service.geocode_address, missing_number),
+        ('reversa (~30 m do endereço)', lambda p: service.reverse_geocode(*p), points),
+        ('nearby "augusta" 1 km', lambda p: service.search_nearby(*p, 'augusta', 1000), points),
+        ('nearby nome da rua 1 km', lambda i: service.search_nearby(*points[i], sample[i]['road'], 1000),
+         range(len(sample))),
+    ]
+    correct = sum(service.geocode_address(address)['display_name'] == address for address in full)
+    print(f"{'consulta':<30} {'p50':>9} {'p99':>9} {'encontrados':>12}")
+    for name, function, inputs in cases:
+        p50, p99, found = timings(function, inputs)
+        print(f"{name:<30} {p50:>6.3f} ms {p99:>6.3f} ms {found:>6}/{len(inputs)}")
+    print(f"endereço completo devolvendo o próprio registro: {correct}/{len(full)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Microbenchmark das funções geográficas vetorizadas (src/services/geo.py)
+
+Compara laços escalares em Python (math) com as versões NumPy para
+distância haversine, rumo e filtro por raio, com 1k, 100k e 1M pontos, e
+confere que os resultados coincidem.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_geo.py --sizes 1000 100000 1000000
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.geo import haversine_distance, haversine_many, bearing, within_radius
+
+CENTER = (-23.55, -46.63)
+RADIUS_M = 3000
+
+
+def scalar_bearing(lat1, lng1, lat2, lng2):
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dlambda = math.radians(lng2 - lng1)
+    y = math.sin(dlambda) * math.cos(phi2)
+    x = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(dlambda)
+    return math.degrees(math.atan2(y, x)) % 360
+
+
+def timed(function, repeat):
+    best = math.inf
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - t0)
+    return result, best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    lat, lng = CENTER
+    print(f"{'pontos':>9} {'função':<14} {'escalar':>11} {'numpy':>10} {'ganho':>7}")
+    for size in args.sizes:
+        lats = lat + rng.normal(0, 0.1, size)
+        lngs = lng + rng.normal(0, 0.1, size)
+        lat_list = lats.tolist()
+        lng_list = lngs.tolist()
+        repeat = args.repeat if size <= 100000 else 1
+
+        cases = [
+            ('haversine',
+             lambda: [haversine_distance(lat, lng, a, b) for a, b in zip(lat_list, lng_list)],
+             lambda: haversine_many(lat, lng, lats, lngs)),
+            ('bearing',
+             lambda: [scalar_bearing(lat, lng, a, b) for a, b in zip(lat_list, lng_list)],
+             lambda: bearing(lat, lng, lats, lngs)),
+            ('within_radius',
+             lambda: [haversine_distance(lat, lng, a, b) <= RADIUS_M for a, b in zip(lat_list, lng_list)],
+             lambda: within_radius(lat, lng, lats, lngs, RADIUS_M)),
+        ]
+        for name, scalar, vectorized in cases:
+            expected, scalar_ms = timed(scalar, repeat)
+            actual, numpy_ms = timed(vectorized, repeat)
+            if actual.dtype == bool:
+                assert np.array_equal(actual, np.array(expected)), name
+            else:
+                assert np.allclose(actual, expected, atol=1e-6), name
+            print(f"{size:>9} {name:<14} {scalar_ms:>8.1f} ms {numpy_ms:>7.2f} ms {scalar_ms / numpy_ms:>6.0f}x")
+
+
+if __name__ == '__main__':
+    main()
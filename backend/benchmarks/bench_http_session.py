@@ -0,0 +1,55 @@
+"""
+Benchmark: requests.get sem sessão vs. sessão compartilhada com keep-alive
+
+Mede a latência por chamada contra o stub local. Contra o servidor real o
+ganho é maior, pois cada chamada sem sessão também paga o handshake TLS.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_http_session.py --calls 500
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from benchmarks.stub_server import start_stub_server
+from src.services.http_client import build_session
+
+
+def measure(call, calls):
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.mean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=500)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server()
+    url = f"{base_url}/search?q=stub&format=json"
+    session = build_session()
+
+    results = {
+        'requests.get (sem pool)': measure(lambda: requests.get(url, timeout=10), args.calls),
+        'sessão com keep-alive': measure(lambda: session.get(url, timeout=10), args.calls),
+    }
+    server.shutdown()
+
+    print(f"{'modo':<26} {'média ms':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for name, (mean, p50, p99) in results.items():
+        print(f"{name:<26} {mean:>10.3f} {p50:>10.3f} {p99:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark da serialização das respostas (to_dict + json vs serializers + orjson)
+
+Monta corridas em memória com passageiro e motorista (usuários repetidos
+entre corridas, como numa listagem real) e mede o tempo de gerar o corpo da
+resposta de GET /rides para cada combinação de serializador e provider.
+Confere também que todas as combinações produzem o mesmo JSON decodificado.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_json_serialization.py --rides 10000 --users 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.services.json_provider as json_provider
+from src.models.user import User
+from src.models.ride import Ride
+from src.models.serializers import serialize_ride
+from src.services.json_provider import FastJSONProvider
+
+
+def build_rides(count, user_count, rng):
+    start = datetime(2025, 1, 1)
+    users = [
+        User(id=i, username=f'usuario{i}', email=f'usuario{i}@example.com',
+             user_type='driver' if i % 2 else 'passenger', is_available=bool(i % 3),
+             latitude=-23.5 + rng.random() / 10, longitude=-46.6 + rng.random() / 10,
+             location_updated_at=start + timedelta(seconds=rng.randint(0, 10 ** 7), microseconds=rng.randint(0, 999999)),
+             created_at=start)
+        for i in range(1, user_count + 1)
+    ]
+    passengers, drivers = users[1::2], users[0::2]
+    rides = []
+    for i in range(1, count + 1):
+        created_at = start + timedelta(seconds=i * 37, microseconds=rng.randint(0, 999999))
+        ride = Ride(id=i, origin=f'Rua Origem, {i} - São Paulo', destination=f'Av. Destino, {i} - São Paulo',
+                    origin_lat=-23.5 + rng.random() / 10, origin_lng=-46.6 + rng.random() / 10,
+                    destination_lat=-23.5 + rng.random() / 10, destination_lng=-46.6 + rng.random() / 10,
+                    status=rng.choice(['requested', 'accepted', 'completed']),
+                    created_at=created_at, updated_at=created_at + timedelta(minutes=5))
+        if i % 4 == 0:
+            ride.set_waypoints([{'lat': -23.55, 'lng': -46.63, 'address': 'Parada'}])
+        ride.passenger = rng.choice(passengers)
+        ride.passenger_id = ride.passenger.id
+        if ride.status != 'requested':
+            ride.driver = rng.choice(drivers)
+            ride.driver_id = ride.driver.id
+        rides.append(ride)
+    return rides
+
+
+def to_dict_body(rides):
+    user_cache = {}
+    return [ride.to_dict(user_cache) for ride in rides]
+
+
+def serializer_body(rides):
+    user_cache = {}
+    return [serialize_ride(ride, user_cache) for ride in rides]
+
+
+def measure(app, build_body, rides, repeat):
+    best_build = best_dump = float('inf')
+    with app.app_context():
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            body = build_body(rides)
+            t1 = time.perf_counter()
+            data = app.json.response(body).get_data()
+            t2 = time.perf_counter()
+            best_build = min(best_build, t1 - t0)
+            best_dump = min(best_dump, t2 - t1)
+    return best_build * 1000, best_dump * 1000, data
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rides', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rides = build_rides(args.rides, args.users, random.Random(7))
+
+    default_app = Flask('default')
+    default_app.json = DefaultJSONProvider(default_app)
+    fast_app = Flask('fast')
+    fast_app.json = FastJSONProvider(fast_app)
+    has_orjson = json_provider.orjson is not None
+
+    cases = [
+        ('to_dict + json (atual)', default_app, to_dict_body, None),
+        ('to_dict + FastJSON', fast_app, to_dict_body, None),
+        ('serializers + FastJSON', fast_app, serializer_body, None),
+    ]
+    if has_orjson:
+        cases.append(('serializers + json stdlib', fast_app, serializer_body, 'stdlib'))
+
+    print(f"{args.rides} corridas, {args.users} usuários (orjson {'instalado' if has_orjson else 'ausente'})")
+    print(f"{'combinação':<28} {'montar':>9} {'serializar':>11} {'total':>9} {'tamanho':>9}")
+    reference, baseline = None, None
+    for name, app, build_body, mode in cases:
+        original = json_provider.orjson
+        if mode == 'stdlib':
+            json_provider.orjson = None
+        try:
+            build_ms, dump_ms, data = measure(app, build_body, rides, args.repeat)
+        finally:
+            json_provider.orjson = original
+        total = build_ms + dump_ms
+        baseline = baseline or total
+        print(f"{name:<28} {build_ms:>6.1f} ms {dump_ms:>8.1f} ms {total:>6.1f} ms "
+              f"{len(data) / 1024:>6.0f} KB  ({baseline / total:.1f}x)")
+        decoded = json.loads(data)
+        if reference is None:
+            reference = decoded
+        elif decoded != reference:
+            print(f"{'':<28} ATENÇÃO: JSON diferente do atual")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark do roteamento local (RoadGraph + LocalGraphBackend)
+
+Gera uma cidade sintética em grade (ruas a cada ~100 m, avenidas mais
+rápidas a cada 10 quarteirões, algumas ruas de mão única), mede
+construção/carga do grafo CSR e o tempo por consulta do A* comparado ao
+Dijkstra (mesmo laço sem heurística). Também converte um pequeno extrato
+OSM em XML e confere o fallback do OSRMRoutingService sem rede.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_local_routing.py --size 300 --queries 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.http_client import build_session
+from src.services.road_graph import RoadGraph, LocalGraphBackend
+from src.services.routing import OSRMRoutingService
+
+ORIGIN = (-23.60, -46.70)
+SPACING_DEG = 0.0009  # ~100 m
+
+
+def grid_city(size, rng):
+    lats, lngs, edges = [], [], []
+    for row in range(size):
+        for col in range(size):
+            lats.append(ORIGIN[0] + row * SPACING_DEG + rng.uniform(-1e-5, 1e-5))
+            lngs.append(ORIGIN[1] + col * SPACING_DEG + rng.uniform(-1e-5, 1e-5))
+    for row in range(size):
+        for col in range(size):
+            node = row * size + col
+            for neighbor, line in ((node + 1, row), (node + size, col)):
+                if (neighbor == node + 1 and col == size - 1) or neighbor >= size * size:
+                    continue
+                speed = 60 / 3.6 if line % 10 == 0 else 30 / 3.6
+                edges.append((node, neighbor, speed))
+                # Ruas de mão única em 1 a cada 4 linhas (exceto avenidas)
+                if line % 4 != 1 or line % 10 == 0:
+                    edges.append((neighbor, node, speed))
+    return lats, lngs, edges
+
+
+def sample_osm(path):
+    with open(path, 'w') as f:
+        f.write('<?xml version="1.0"?><osm version="0.6">')
+        for i in range(5):
+            f.write(f'<node id="{i + 1}" lat="{-23.55 + i * 0.001}" lon="-46.63"/>')
+        f.write('<node id="99" lat="-23.0" lon="-46.0"/>')
+        f.write('<way id="1"><nd ref="1"/><nd ref="2"/><nd ref="3"/>'
+                '<tag k="highway" v="residential"/></way>')
+        f.write('<way id="2"><nd ref="3"/><nd ref="4"/><nd ref="5"/>'
+                '<tag k="highway" v="primary"/><tag k="maxspeed" v="50"/><tag k="oneway" v="yes"/></way>')
+        f.write('<way id="3"><nd ref="1"/><nd ref="99"/><tag k="highway" v="footway"/></way>')
+        f.write('</osm>')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=300, help='nós por lado da grade')
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(3)
+
+    t0 = time.perf_counter()
+    lats, lngs, edges = grid_city(args.size, rng)
+    graph = RoadGraph.from_edges(lats, lngs, edges)
+    build_ms = (time.perf_counter() - t0) * 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'graph.npz')
+        graph.save(path)
+        size_kb = os.path.getsize(path) / 1024
+        t0 = time.perf_counter()
+        graph = RoadGraph.load(path)
+        load_ms = (time.perf_counter() - t0) * 1000
+    print(f"grafo: {graph.node_count} nós, {graph.edge_count} arestas, {size_kb:.0f} KB em disco, "
+          f"construção {build_ms:.0f} ms, carga {load_ms:.0f} ms")
+
+    backend = LocalGraphBackend(graph)
+    span = (args.size - 1) * SPACING_DEG
+    pairs = [[(ORIGIN[1] + rng.uniform(0, span), ORIGIN[0] + rng.uniform(0, span)) for _ in range(2)]
+             for _ in range(args.queries)]
+
+    astar, snap = [], []
+    routes = []
+    for coordinates in pairs:
+        t0 = time.perf_counter()
+        nodes = [graph.nearest_node(lat, lng)[0] for lng, lat in coordinates]
+        snap.append((time.perf_counter() - t0) * 1000 / 2)
+        t0 = time.perf_counter()
+        routes.append(graph.shortest_path(*nodes))
+        astar.append((time.perf_counter() - t0) * 1000)
+
+    # Dijkstra: mesma busca com heurística nula (velocidade máxima "infinita")
+    max_speed = graph.max_speed_mps
+    graph.max_speed_mps = 1e12
+    dijkstra = []
+    for coordinates, route in zip(pairs[:max(args.queries // 4, 1)], routes):
+        nodes = [graph.nearest_node(lat, lng)[0] for lng, lat in coordinates]
+        t0 = time.perf_counter()
+        result = graph.shortest_path(*nodes)
+        dijkstra.append((time.perf_counter() - t0) * 1000)
+        assert abs(result[0] - route[0]) < 1e-6, 'A* e Dijkstra divergem'
+    graph.max_speed_mps = max_speed
+
+    full = [backend.route(coordinates) for coordinates in pairs[:20]]
+    assert all(r and r['distance'] > 0 and r['geometry']['type'] == 'LineString' for r in full)
+
+    def summary(samples):
+        samples = sorted(samples)
+        return f"p50 {samples[len(samples) // 2]:.2f} ms, p99 {samples[int(len(samples) * 0.99) - 1]:.2f} ms"
+
+    print(f"nó mais próximo: {summary(snap)}")
+    print(f"A*:       {summary(astar)}")
+    print(f"Dijkstra: {summary(dijkstra)}")
+    print(f"distância média das rotas: {statistics.mean(r[1] for r in routes) / 1000:.1f} km")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'sample.osm')
+        sample_osm(path)
+        osm_graph = RoadGraph.from_osm(path)
+        print(f"extrato OSM de exemplo: {osm_graph.node_count} nós, {osm_graph.edge_count} arestas")
+
+    # OSRM inacessível: calculate_route cai no grafo local
+    offline = OSRMRoutingService('http://127.0.0.1:9', session=build_session(retries=0),
+                                 fallback_backend=backend)
+    route = offline.calculate_route(pairs[0])
+    print(f"fallback sem rede: {route['distance']:.0f} m, {route['duration']:.0f} s, "
+          f"{len(route['geometry']['coordinates'])} pontos, legs {len(route['legs'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: ingestão de pings de localização
+
+Mede a taxa de pings aceitos pelo LocationIngestor (caminho usado por
+PUT /api/users/<id>/location), a taxa pela API completa via test client e o
+custo de cada flush em lote para a tabela users, além do endpoint
+POST /api/locations/batch usado pelo gateway de motoristas.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_location_ingest.py --drivers 5000 --pings 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--drivers', type=int, default=5000)
+    parser.add_argument('--pings', type=int, default=200000)
+    parser.add_argument('--http-pings', type=int, default=5000)
+    args = parser.parse_args()
+
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+    os.environ.update({'DATABASE_URL': f'sqlite:///{db_file}', 'OUTBOX_WORKER': '0',
+                       'LOCATION_FLUSH_INTERVAL': '3600'})
+
+    from src.main import app
+    from src.models.user import db
+
+    now = datetime.utcnow()
+    with app.app_context():
+        raw = db.engine.raw_connection()
+        raw.executemany('INSERT INTO users (id, username, email, user_type, is_available, created_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?)',
+                        [(i, f'driver{i}', f'driver{i}@sim', 'driver', True, now)
+                         for i in range(1, args.drivers + 1)])
+        raw.commit()
+        raw.close()
+
+    ingestor = app.extensions['location_ingestor']
+    random.seed(1)
+    pings = [(random.randint(1, args.drivers), -23.5 + random.random() * 0.1, -46.6 + random.random() * 0.1)
+             for _ in range(args.pings)]
+
+    t0 = time.perf_counter()
+    for user_id, lat, lng in pings:
+        ingestor.record(user_id, lat, lng)
+    record_rate = args.pings / (time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    flushed = ingestor.flush()
+    flush_ms = (time.perf_counter() - t0) * 1000
+
+    client = app.test_client()
+    # Motoristas já conhecidos pelo worker (pings seguintes ao primeiro)
+    for user_id in range(1, args.drivers + 1):
+        ingestor.mark_known_user(user_id)
+    t0 = time.perf_counter()
+    for user_id, lat, lng in pings[:args.http_pings]:
+        response = client.put(f'/api/users/{user_id}/location', json={'latitude': lat, 'longitude': lng})
+        assert response.status_code == 200, response.json
+    http_rate = args.http_pings / (time.perf_counter() - t0)
+    ingestor.flush()
+
+    # POST /api/locations/batch com lotes de 1000 pings do gateway
+    batch_pings = pings[:args.http_pings * 10]
+    t0 = time.perf_counter()
+    for start in range(0, len(batch_pings), 1000):
+        payload = [{'user_id': user_id, 'latitude': lat, 'longitude': lng, 'ts': time.time()}
+                   for user_id, lat, lng in batch_pings[start:start + 1000]]
+        response = client.post('/api/locations/batch', json=payload)
+        assert response.status_code == 200, response.json
+    batch_rate = len(batch_pings) / (time.perf_counter() - t0)
+
+    os.environ['LOCATION_INGESTOR'] = '0'
+    from src.main import create_app
+    direct_app = create_app()
+    direct_client = direct_app.test_client()
+    direct_pings = pings[:min(args.http_pings, 1000)]
+    t0 = time.perf_counter()
+    for user_id, lat, lng in direct_pings:
+        direct_client.put(f'/api/users/{user_id}/location', json={'latitude': lat, 'longitude': lng})
+    direct_rate = len(direct_pings) / (time.perf_counter() - t0)
+
+    ingestor.stop()
+    os.unlink(db_file)
+    print(f"ingestor.record: {record_rate:,.0f} pings/s")
+    print(f"flush em lote: {flushed} motoristas em {flush_ms:.1f} ms")
+    print(f"PUT /location (test client, com ingestor): {http_rate:,.0f} pings/s")
+    print(f"PUT /location (test client, commit por ping): {direct_rate:,.0f} pings/s")
+    print(f"POST /locations/batch (lotes de 1000): {batch_rate:,.0f} pings/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: GET /api/drivers/nearby com 100k motoristas simulados
+
+Compara a consulta pelo índice geohash com a varredura completa (carregar
+todos os motoristas e calcular a distância de cada um).
+
+Uso (a partir de backend/):
+    python benchmarks/bench_nearby_drivers.py --drivers 100000 --queries 200
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Centro de São Paulo, motoristas espalhados em ~60 km
+CENTER = (-23.5505, -46.6333)
+SPREAD = 0.3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--drivers', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--radius', type=float, default=3000)
+    args = parser.parse_args()
+
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+    os.environ['OUTBOX_WORKER'] = '0'
+
+    from src.main import app
+    from src.models.user import db, User
+    from src.services.geo import geohash_encode, haversine_distance
+
+    random.seed(42)
+    now = datetime.utcnow()
+    rows = []
+    for i in range(args.drivers):
+        lat = CENTER[0] + random.uniform(-SPREAD, SPREAD)
+        lng = CENTER[1] + random.uniform(-SPREAD, SPREAD)
+        rows.append((f'driver{i}', f'driver{i}@sim', 'driver', random.random() < 0.7,
+                     lat, lng, geohash_encode(lat, lng), now, now))
+    with app.app_context():
+        raw = db.engine.raw_connection()
+        raw.executemany('INSERT INTO users (username, email, user_type, is_available, latitude, longitude, '
+                        'geohash, location_updated_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        raw.commit()
+        raw.close()
+
+    client = app.test_client()
+    points = [(CENTER[0] + random.uniform(-0.2, 0.2), CENTER[1] + random.uniform(-0.2, 0.2))
+              for _ in range(args.queries)]
+
+    samples = []
+    results = []
+    for lat, lng in points:
+        t0 = time.perf_counter()
+        response = client.get(f'/api/drivers/nearby?lat={lat}&lng={lng}&radius={args.radius}&limit=10')
+        samples.append((time.perf_counter() - t0) * 1000)
+        assert response.status_code == 200, response.json
+        results.append([driver['id'] for driver in response.json])
+    samples.sort()
+
+    # Linha de base: varredura completa para algumas consultas
+    scan = []
+    with app.app_context():
+        for (lat, lng), expected in list(zip(points, results))[:5]:
+            t0 = time.perf_counter()
+            drivers = User.query.filter_by(user_type='driver', is_available=True).all()
+            ranked = sorted((haversine_distance(lat, lng, d.latitude, d.longitude), d.id) for d in drivers)
+            nearest = [driver_id for distance, driver_id in ranked if distance <= args.radius][:10]
+            scan.append((time.perf_counter() - t0) * 1000)
+            assert nearest == expected, 'resultado do índice difere da varredura completa'
+
+    os.unlink(db_file)
+    print(f"{args.drivers} motoristas, raio {args.radius:.0f} m")
+    print(f"índice geohash: p50 {samples[len(samples) // 2]:.2f} ms, p99 {samples[int(len(samples) * 0.99) - 1]:.2f} ms")
+    print(f"varredura completa: média {sum(scan) / len(scan):.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
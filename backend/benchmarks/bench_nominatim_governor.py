@@ -0,0 +1,139 @@
+"""
+Benchmark do single-flight e do limitador de taxa do Nominatim
+
+1. Single-flight: N threads pedem o mesmo endereço ao mesmo tempo contra o
+   stub (com latência); conta quantas requisições chegam ao stub com
+   geocode_address (cache com coalescência) e chamando o fetch direto.
+2. Limitador: P processos disparam consultas distintas ao mesmo tempo;
+   compara o balde compartilhado em arquivo com um balde por processo,
+   medindo o maior número de requisições enviadas em qualquer janela de 1 s.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_nominatim_governor.py --threads 50 --processes 4 --rate 5
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import start_stub_server
+from src.services.cache import TwoTierCache
+from src.services.geocoding import NominatimGeocodingService
+from src.services.http_client import build_session
+from src.services.rate_limit import RateGovernor
+
+
+class CountingSession:
+    """Sessão que conta as requisições enviadas"""
+
+    def __init__(self):
+        self.session = build_session()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get(self, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+        return self.session.get(*args, **kwargs)
+
+
+def burst(call, threads):
+    start = threading.Barrier(threads)
+
+    def worker():
+        start.wait()
+        call()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return (time.perf_counter() - started) * 1000
+
+
+def single_flight(base_url, threads):
+    for name, coalesce in (('fetch direto (antes)', False), ('geocode_address', True)):
+        session = CountingSession()
+        service = NominatimGeocodingService(cache=TwoTierCache(), session=session)
+        service.base_url = base_url
+        address = 'Allianz Parque, São Paulo'
+        call = (lambda: service.geocode_address(address)) if coalesce else (lambda: service._fetch_geocode(address))
+        elapsed = burst(call, threads)
+        print(f"{name:<22} {threads} chamadas -> {session.calls:>3} requisições ao stub em {elapsed:.0f} ms")
+
+
+def send_requests(base_url, state_path, rate, count, start_at, results):
+    governor = RateGovernor(rate=rate, state_path=state_path, max_wait=60)
+    service = NominatimGeocodingService(cache=TwoTierCache(), rate_governor=governor)
+    service.base_url = base_url
+    sent = []
+    original_get = service.session.get
+
+    def timed_get(*args, **kwargs):
+        sent.append(time.time())
+        return original_get(*args, **kwargs)
+    service.session.get = timed_get
+    time.sleep(max(0.0, start_at - time.time()))
+    for i in range(count):
+        service.geocode_address(f'Endereço {os.getpid()}-{i}')
+    results.put(sent)
+
+
+def max_per_window(timestamps, window=1.0):
+    timestamps = sorted(timestamps)
+    best, left = 0, 0
+    for right, ts in enumerate(timestamps):
+        while ts - timestamps[left] >= window:
+            left += 1
+        best = max(best, right - left + 1)
+    return best
+
+
+def governor(base_url, processes, rate, per_process):
+    for name, shared in (('balde por processo', False), ('balde compartilhado', True)):
+        state_path = tempfile.NamedTemporaryFile(suffix='.state', delete=False).name if shared else None
+        if state_path:
+            os.unlink(state_path)
+        results = multiprocessing.Queue()
+        start_at = time.time() + 1.0
+        workers = [multiprocessing.Process(target=send_requests,
+                                           args=(base_url, state_path, rate, per_process, start_at, results))
+                   for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        timestamps = [ts for _ in workers for ts in results.get()]
+        for worker in workers:
+            worker.join()
+        if state_path:
+            os.unlink(state_path)
+        duration = max(timestamps) - min(timestamps)
+        print(f"{name:<22} {len(timestamps)} requisições em {duration:.1f} s, "
+              f"máximo em 1 s: {max_per_window(timestamps)} (limite {rate:g}/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=50)
+    parser.add_argument('--delay', type=float, default=0.2, help='latência do stub (s)')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=5.0, help='requisições/s do limitador')
+    parser.add_argument('--per-process', type=int, default=10)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(delay=args.delay)
+    print("Single-flight")
+    single_flight(base_url, args.threads)
+    print(f"\nLimitador ({args.processes} processos x {args.per_process} consultas)")
+    governor(base_url, args.processes, args.rate, args.per_process)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
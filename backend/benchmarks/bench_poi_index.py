@@ -0,0 +1,120 @@
+"""
+Benchmark da busca de POIs próximos
+
+Gera N POIs sintéticos na região de São Paulo (categorias OSM e nomes de
+redes) e compara, para buscas por tipo ("farmácia") e por nome
+("drogasil"):
+  - varredura completa com NumPy (caixa + haversine em todos os POIs)
+  - PoiIndex (grade ordenada + caixa geodésica + haversine nos candidatos)
+Também mede o search_nearby do Nominatim contra o stub local (com
+latência), sem cache (células diferentes) e com cache (mesma célula).
+
+Uso (a partir de backend/):
+    python benchmarks/bench_poi_index.py --pois 500000 --queries 2000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import start_stub_server
+from src.services.cache import TwoTierCache
+from src.services.geo import within_radius
+from src.services.geocoding import NominatimGeocodingService
+from src.services.poi_index import PoiIndex
+
+CATEGORIES = ['amenity=pharmacy', 'amenity=fuel', 'amenity=restaurant', 'amenity=fast_food', 'amenity=cafe',
+              'amenity=bank', 'amenity=atm', 'amenity=parking', 'amenity=school', 'shop=supermarket',
+              'shop=bakery', 'shop=convenience', 'tourism=hotel', 'leisure=park', 'amenity=hospital']
+BRANDS = ['Drogasil', 'Droga Raia', 'Pague Menos', 'Shell', 'Ipiranga', 'Petrobras', 'Pão de Açúcar',
+          'Carrefour', 'Extra', 'Itaú', 'Bradesco', 'Santander', 'Starbucks', 'McDonalds', 'Habibs']
+ORIGIN = (-23.55, -46.63)
+
+
+def synthetic_pois(count, rng):
+    for i in range(count):
+        yield {
+            'latitude': ORIGIN[0] + rng.gauss(0, 0.08),
+            'longitude': ORIGIN[1] + rng.gauss(0, 0.1),
+            'name': f"{rng.choice(BRANDS)} {i}",
+            'category': rng.choice(CATEGORIES)
+        }
+
+
+def timings(function, inputs):
+    samples, found = [], 0
+    for value in inputs:
+        started = time.perf_counter()
+        found += len(function(value))
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1], found
+
+
+def brute_force(latitudes, longitudes, categories, names):
+    """Varredura completa: máscara de raio e categoria/nome em todos os POIs"""
+    def search(point, radius, category=None, name=None):
+        mask = within_radius(point[0], point[1], latitudes, longitudes, radius)
+        if category:
+            mask &= categories == category
+        found = np.flatnonzero(mask)
+        if name:
+            found = [i for i in found.tolist() if name in names[i]]
+        return found[:10]
+    return search
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pois', type=int, default=500000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--delay', type=float, default=0.1, help='latência do stub do Nominatim (s)')
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    records = list(synthetic_pois(args.pois, rng))
+    started = time.perf_counter()
+    index = PoiIndex(records)
+    print(f"PoiIndex: {args.pois} POIs em {time.perf_counter() - started:.1f} s, {index.stats()['cells']} células")
+
+    latitudes = np.array([r['latitude'] for r in records])
+    longitudes = np.array([r['longitude'] for r in records])
+    categories = np.array([r['category'] for r in records])
+    names = [r['name'].lower() for r in records]
+    brute = brute_force(latitudes, longitudes, categories, names)
+    points = [(ORIGIN[0] + rng.gauss(0, 0.05), ORIGIN[1] + rng.gauss(0, 0.06)) for _ in range(args.queries)]
+
+    cases = [
+        ('"farmácia" 1 km', lambda p: brute(p, 1000, category='amenity=pharmacy'),
+         lambda p: index.search_nearby(p[0], p[1], 'farmácia', 1000)),
+        ('"farmácia" 5 km', lambda p: brute(p, 5000, category='amenity=pharmacy'),
+         lambda p: index.search_nearby(p[0], p[1], 'farmácia', 5000)),
+        ('"drogasil" 2 km', lambda p: brute(p, 2000, name='drogasil'),
+         lambda p: index.search_nearby(p[0], p[1], 'drogasil', 2000)),
+    ]
+    print(f"{'busca':<18} {'varredura p50':>14} {'p99':>9} {'PoiIndex p50':>13} {'p99':>9}")
+    for name, scan, grid in cases:
+        scan_p50, scan_p99, _ = timings(scan, points)
+        grid_p50, grid_p99, _ = timings(grid, points)
+        print(f"{name:<18} {scan_p50:>11.3f} ms {scan_p99:>6.3f} ms {grid_p50:>10.3f} ms {grid_p99:>6.3f} ms")
+
+    server, base_url = start_stub_server(delay=args.delay)
+    service = NominatimGeocodingService(cache=TwoTierCache())
+    service.base_url = base_url
+    sample = points[:20]
+    cold = timings(lambda p: service.search_nearby(p[0], p[1], 'farmácia', 1000), sample)
+    warm = timings(lambda p: service.search_nearby(p[0] + 1e-5, p[1] + 1e-5, 'farmácia', 1000), sample)
+    print(f"Nominatim (stub, {args.delay * 1000:.0f} ms): sem cache p50 {cold[0]:.1f} ms, "
+          f"mesma célula (cache) p50 {warm[0]:.3f} ms")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark do payload de rotas (GeoJSON + passos vs polyline simplificada)
+
+Gera uma rota sintética no formato do OSRM (overview=full, geometries=geojson,
+steps=true), com um ponto a cada ~15 m e um passo a cada ~400 m, e compara
+o tamanho do JSON (cru e gzip) e o tempo de shape_route + serialização
+pelo jsonify do Flask para cada formato aceito pela API.
+
+Uso (a partir de backend/):
+    python benchmarks/bench_route_payload.py --km 20 150 --repeat 20
+"""
+
+import argparse
+import gzip
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.geo import METERS_PER_DEGREE, decode_polyline
+from src.services.routing import shape_route
+
+POINT_SPACING_M = 15
+STEP_LENGTH_M = 400
+
+VARIANTS = [
+    ('geojson + steps (atual)', {'geometry': 'geojson', 'steps': True}),
+    ('geojson', {'geometry': 'geojson'}),
+    ('polyline', {'geometry': 'polyline'}),
+    ('polyline6', {'geometry': 'polyline6'}),
+    ('polyline6 tol=2m', {'geometry': 'polyline6', 'tolerance_m': 2}),
+    ('polyline6 tol=5m', {'geometry': 'polyline6', 'tolerance_m': 5}),
+    ('polyline6 tol=20m', {'geometry': 'polyline6', 'tolerance_m': 20}),
+]
+
+
+def synthetic_route(length_km, rng):
+    """Rota com curvas suaves e trechos retos, no formato de _fetch_route"""
+    lat, lng, heading = -23.55, -46.63, rng.uniform(0, 360)
+    coordinates = [[round(lng, 6), round(lat, 6)]]
+    for _ in range(int(length_km * 1000 / POINT_SPACING_M)):
+        if rng.random() < 0.02:
+            heading += rng.choice((-90, 90))
+        heading += rng.gauss(0, 4)
+        lat += POINT_SPACING_M * math.cos(math.radians(heading)) / 111320
+        lng += POINT_SPACING_M * math.sin(math.radians(heading)) / (111320 * math.cos(math.radians(lat)))
+        coordinates.append([round(lng, 6), round(lat, 6)])
+
+    per_step = max(2, STEP_LENGTH_M // POINT_SPACING_M)
+    steps = []
+    for start in range(0, len(coordinates) - 1, per_step):
+        chunk = coordinates[start:start + per_step + 1]
+        distance = POINT_SPACING_M * (len(chunk) - 1)
+        steps.append({
+            'distance': distance,
+            'duration': distance / 10,
+            'weight': distance / 10,
+            'name': f'Rua {len(steps)}',
+            'mode': 'driving',
+            'driving_side': 'right',
+            'geometry': {'type': 'LineString', 'coordinates': chunk},
+            'maneuver': {'type': 'turn', 'modifier': 'right', 'location': chunk[0],
+                         'bearing_before': 90, 'bearing_after': 180},
+            'intersections': [{'location': chunk[0], 'bearings': [0, 90, 180, 270],
+                               'entry': [True, True, True, False], 'in': 3, 'out': 1}]
+        })
+    total = POINT_SPACING_M * (len(coordinates) - 1)
+    return {
+        'distance': total,
+        'duration': total / 10,
+        'geometry': {'type': 'LineString', 'coordinates': coordinates},
+        'legs': [{'distance': total, 'duration': total / 10, 'summary': 'Rua 0, Rua 1',
+                  'weight': total / 10, 'steps': steps}],
+        'waypoints': [{'location': coordinates[0], 'name': 'Rua 0'},
+                      {'location': coordinates[-1], 'name': f'Rua {len(steps) - 1}'}]
+    }
+
+
+def max_deviation_m(original, encoded, precision):
+    """Maior distância (m) de um ponto original até a linha decodificada"""
+    simplified = np.array(decode_polyline(encoded, precision))
+    points = np.array([(lat, lng) for lng, lat in original])
+    scale = np.array([METERS_PER_DEGREE, METERS_PER_DEGREE * math.cos(math.radians(points[:, 0].mean()))])
+    p, a, b = points * scale, simplified[:-1] * scale, simplified[1:] * scale
+    worst = 0.0
+    for chunk in np.array_split(p, max(1, len(p) // 2000)):
+        ab = b - a
+        ap = chunk[:, None, :] - a[None, :, :]
+        t = np.clip((ap * ab).sum(-1) / np.maximum((ab * ab).sum(-1), 1e-12), 0, 1)
+        distances = np.linalg.norm(ap - t[..., None] * ab, axis=-1).min(axis=1)
+        worst = max(worst, float(distances.max()))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--km', type=float, nargs='+', default=[20, 150])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    rng = random.Random(42)
+
+    for length_km in args.km:
+        route = synthetic_route(length_km, rng)
+        points = len(route['geometry']['coordinates'])
+        print(f"\nRota de {length_km:.0f} km: {points} pontos, {len(route['legs'][0]['steps'])} passos")
+        print(f"{'formato':<24} {'pontos':>7} {'JSON':>10} {'gzip':>9} {'shape':>9} {'jsonify':>9}")
+        baseline = None
+        with app.app_context():
+            for name, options in VARIANTS:
+                t0 = time.perf_counter()
+                for _ in range(args.repeat):
+                    shaped = shape_route(route, **options)
+                shape_ms = (time.perf_counter() - t0) * 1000 / args.repeat
+
+                t0 = time.perf_counter()
+                for _ in range(args.repeat):
+                    body = app.json.response({'ride_id': 1, 'route': shaped}).get_data()
+                jsonify_ms = (time.perf_counter() - t0) * 1000 / args.repeat
+
+                geometry = shaped['geometry']
+                if isinstance(geometry, str):
+                    precision = 6 if options['geometry'] == 'polyline6' else 5
+                    kept = len(decode_polyline(geometry, precision))
+                else:
+                    kept = len(geometry['coordinates'])
+                baseline = baseline or len(body)
+                print(f"{name:<24} {kept:>7} {len(body) / 1024:>7.0f} KB {len(gzip.compress(body)) / 1024:>6.0f} KB "
+                      f"{shape_ms:>6.1f} ms {jsonify_ms:>6.1f} ms  ({baseline / len(body):.0f}x menor)")
+                if options.get('tolerance_m'):
+                    deviation = max_deviation_m(route['geometry']['coordinates'], geometry, 6)
+                    print(f"{'':<24} desvio máximo medido: {deviation:.1f} m")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Teste de ponta a ponta da outbox de notificações contra um stub do GitHub
+
+Sobe o stub local, aponta GITHUB_API_URL para ele, envia mensagens pela API
+e mede a latência do POST (que agora depende apenas do commit local) e o
+tempo até a entrega de todas as notificações.
+
+Uso (a partir de backend/):
+    python benchmarks/outbox_flow.py --messages 50 --stub-delay 0.2
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import start_stub_server, StubHandler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--stub-delay', type=float, default=0.2, help='latência simulada do GitHub (s)')
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(delay=args.stub_delay)
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+    os.environ.update({
+        'DATABASE_URL': f'sqlite:///{db_file}',
+        'GITHUB_API_URL': base_url,
+        'GITHUB_TOKEN': 'stub-token',
+    })
+
+    from src.main import app
+    client = app.test_client()
+
+    passenger = client.post('/api/users', json={'username': 'p', 'email': 'p@x', 'user_type': 'passenger'}).json
+    driver = client.post('/api/users', json={'username': 'd', 'email': 'd@x', 'user_type': 'driver'}).json
+    ride = client.post('/api/rides', json={'passenger_id': passenger['id'], 'origin': 'A', 'destination': 'B',
+                                           'origin_lat': -23.5, 'origin_lng': -46.6,
+                                           'destination_lat': -23.6, 'destination_lng': -46.7}).json
+    client.post(f"/api/rides/{ride['id']}/accept", json={'driver_id': driver['id']})
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(args.messages):
+        t0 = time.perf_counter()
+        response = client.post(f"/api/rides/{ride['id']}/messages",
+                               json={'sender_id': passenger['id'], 'content': f'mensagem {i}'})
+        latencies.append((time.perf_counter() - t0) * 1000)
+        assert response.status_code == 201, response.json
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        stats = client.get('/api/outbox/stats').json
+        if stats.get('sent', 0) >= args.messages:
+            break
+        time.sleep(0.05)
+    delivered_after = time.perf_counter() - started
+
+    app.extensions['outbox_worker'].stop()
+    server.shutdown()
+    os.unlink(db_file)
+
+    latencies.sort()
+    print(f"POST /messages p50: {latencies[len(latencies) // 2]:.2f} ms, "
+          f"média: {statistics.mean(latencies):.2f} ms (GitHub simulado: {args.stub_delay * 1000:.0f} ms)")
+    print(f"Status da outbox: {stats}")
+    print(f"Dispatches recebidos pelo stub: {len(StubHandler.received)} em {delivered_after:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
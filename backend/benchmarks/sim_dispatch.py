@@ -0,0 +1,76 @@
+"""
+Simulador do despacho automático de corridas
+
+Gera pedidos e motoristas espalhados por uma área urbana (~20 x 20 km) e
+mede o tempo do matching de um lote (DispatchEngine.match) e o ETA médio de
+embarque. Também compara, em um lote pequeno, a atribuição ótima (húngaro)
+com a gulosa.
+
+Uso (a partir de backend/):
+    python benchmarks/sim_dispatch.py --requests 1000 10000 --drivers-ratio 1.2
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.dispatch import DispatchEngine
+
+CENTER = (-23.55, -46.63)
+SPAN_DEG = 0.09  # ~10 km para cada lado
+
+
+def random_points(rng, count):
+    # Mais densidade no centro, como em uma cidade real
+    return [(CENTER[0] + rng.gauss(0, SPAN_DEG / 2), CENTER[1] + rng.gauss(0, SPAN_DEG / 2))
+            for _ in range(count)]
+
+
+def run_batch(engine, pickups, drivers, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        assignment = engine.match(pickups, drivers)
+        timings.append((time.perf_counter() - t0) * 1000)
+    etas = [eta for _, _, eta in assignment]
+    return assignment, statistics.median(timings), etas
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--drivers-ratio', type=float, default=1.2)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    engine = DispatchEngine(app=None)
+    print(f"raio máx. {engine.max_pickup_m:.0f} m, {engine.candidates_per_ride} candidatos por corrida, "
+          f"húngaro até {engine.hungarian_max_size}")
+    for count in args.requests:
+        pickups = random_points(rng, count)
+        drivers = random_points(rng, int(count * args.drivers_ratio))
+        assignment, match_ms, etas = run_batch(engine, pickups, drivers, args.repeat)
+        print(f"{count:>6} pedidos / {len(drivers):>6} motoristas: matching {match_ms:8.1f} ms "
+              f"({match_ms * 1000 / count:.0f} µs/pedido), atendidos {len(assignment) / count:6.1%}, "
+              f"ETA médio {statistics.mean(etas) / 60:.1f} min, p90 {sorted(etas)[int(len(etas) * 0.9)] / 60:.1f} min")
+
+    # Qualidade: húngaro x guloso no mesmo lote pequeno
+    pickups = random_points(rng, 120)
+    drivers = random_points(rng, 140)
+    optimal, optimal_ms, optimal_etas = run_batch(engine, pickups, drivers, 1)
+    engine.hungarian_max_size = 0
+    greedy, greedy_ms, greedy_etas = run_batch(engine, pickups, drivers, 1)
+    for name, assignment, match_ms, etas in (('húngaro', optimal, optimal_ms, optimal_etas),
+                                              ('guloso', greedy, greedy_ms, greedy_etas)):
+        print(f"lote de 120 / 140, {name:>7}: {match_ms:6.1f} ms, atendidos {len(assignment)}, "
+              f"ETA total {sum(etas) / 60:.0f} min, médio {statistics.mean(etas) / 60:.2f} min")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Servidor HTTP local que imita as APIs externas (Nominatim, OSRM, GitHub)
+
+Usado pelos benchmarks para medir o custo das chamadas de saída sem depender
+da rede. Responde com HTTP/1.1 e Content-Length, então suporta keep-alive.
+
+Uso direto:
+    python benchmarks/stub_server.py --port 8099
+"""
+
+import argparse
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    # Latência artificial por requisição (segundos)
+    delay = 0.0
+    received = []
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.path.startswith('/search'):
+            self._send_json(200, [{'lat': '-23.55', 'lon': '-46.63', 'display_name': 'Stub', 'address': {}}])
+        elif self.path.startswith('/reverse'):
+            self._send_json(200, {'display_name': 'Stub', 'address': {}})
+        elif self.path.startswith('/route/'):
+            self._send_json(200, {'code': 'Ok', 'routes': [{'distance': 1000, 'duration': 120,
+                                                            'geometry': None, 'legs': []}],
+                                  'waypoints': []})
+        elif self.path.startswith('/table/'):
+            self._send_json(200, self._table())
+        else:
+            self._send_json(200, {'ok': True})
+
+    def _table(self):
+        """Resposta /table com distâncias em linha reta entre as coordenadas pedidas"""
+        path, _, query = self.path.partition('?')
+        points = [tuple(map(float, pair.split(','))) for pair in path.rsplit('/', 1)[1].split(';')]
+        params = dict(item.split('=', 1) for item in query.split('&') if '=' in item)
+        sources = [int(i) for i in params['sources'].split('%3B')] if 'sources' in params else range(len(points))
+        destinations = ([int(i) for i in params['destinations'].split('%3B')]
+                        if 'destinations' in params else range(len(points)))
+        distances = [[round(math.dist(points[i], points[j]) * 111320, 1) for j in destinations]
+                     for i in sources]
+        durations = [[round(d / 10, 1) for d in row] for row in distances]
+        return {'code': 'Ok', 'durations': durations, 'distances': distances}
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+        if self.delay:
+            time.sleep(self.delay)
+        StubHandler.received.append((self.path, body))
+        if self.path.endswith('/dispatches'):
+            self.send_response(204)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            self._send_json(200, {'ok': True})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port: int = 0, delay: float = 0.0):
+    """Inicia o servidor em uma thread daemon e retorna (server, base_url)"""
+    StubHandler.delay = delay
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--delay', type=float, default=0.0)
+    args = parser.parse_args()
+    server, url = start_stub_server(args.port, args.delay)
+    print(f"Stub rodando em {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
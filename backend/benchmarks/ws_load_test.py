@@ -0,0 +1,152 @@
+"""
+Teste de carga do gateway WebSocket de motoristas (/api/ws/driver)
+
+Abre N conexões simultâneas, cada uma enviando localização periodicamente,
+e mede quantas conexões o worker mantém, a latência de conexão e o tempo até
+uma oferta de corrida chegar a todos os motoristas disponíveis.
+
+Sem --url, sobe o app em um servidor werkzeug com threads neste processo.
+
+Uso (a partir de backend/):
+    python benchmarks/ws_load_test.py --connections 500 --duration 20
+    python benchmarks/ws_load_test.py --url ws://localhost:5000 --connections 200 --driver-ids 1-200
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simple_websocket
+
+
+def start_local_server(connections):
+    db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+    os.environ.update({'DATABASE_URL': f'sqlite:///{db_file}', 'OUTBOX_WORKER': '0', 'DISPATCH_ENGINE': '0'})
+
+    from datetime import datetime
+    from werkzeug.serving import make_server
+    from src.main import app
+    from src.models.user import db
+
+    now = datetime.utcnow()
+    with app.app_context():
+        raw = db.engine.raw_connection()
+        raw.executemany('INSERT INTO users (id, username, email, user_type, is_available, created_at) '
+                        'VALUES (?, ?, ?, ?, ?, ?)',
+                        [(i, f'driver{i}', f'driver{i}@sim', 'driver', True, now)
+                         for i in range(1, connections + 1)])
+        raw.execute('INSERT INTO users (id, username, email, user_type, is_available, created_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)', (connections + 1, 'passenger', 'p@sim', 'passenger', False, now))
+        raw.commit()
+        raw.close()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, app, f"ws://127.0.0.1:{server.server_port}", connections + 1, db_file
+
+
+def driver_client(url, driver_id, duration, ping_interval, stats, offer_seen):
+    try:
+        t0 = time.perf_counter()
+        ws = simple_websocket.Client.connect(f"{url}/api/ws/driver?driver_id={driver_id}")
+        hello = json.loads(ws.receive(timeout=10))
+        assert hello['t'] == 'hello', hello
+        with stats['lock']:
+            stats['connected'] += 1
+            stats['connect_ms'].append((time.perf_counter() - t0) * 1000)
+    except Exception as e:
+        with stats['lock']:
+            stats['failed'] += 1
+            stats['errors'].append(str(e))
+        return
+
+    deadline = time.monotonic() + duration
+    next_ping = time.monotonic()
+    try:
+        while time.monotonic() < deadline:
+            if time.monotonic() >= next_ping:
+                ws.send(json.dumps({'t': 'loc', 'lat': -23.55 + driver_id * 1e-5, 'lng': -46.63}))
+                next_ping += ping_interval
+            raw = ws.receive(timeout=0.2)
+            if raw:
+                message = json.loads(raw)
+                if message['t'] == 'offer' and message['id'] in offer_seen:
+                    with stats['lock']:
+                        offer_seen[message['id']].append(time.perf_counter())
+    except Exception as e:
+        with stats['lock']:
+            stats['dropped'] += 1
+            stats['errors'].append(str(e))
+    finally:
+        ws.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='ws://host:porta de um servidor já em execução')
+    parser.add_argument('--driver-ids', default=None, help='intervalo de ids de motoristas (ex: 1-200)')
+    parser.add_argument('--connections', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--ping-interval', type=float, default=2.0)
+    args = parser.parse_args()
+
+    server = app = db_file = None
+    if args.url:
+        url = args.url
+        first, last = (int(x) for x in (args.driver_ids or f'1-{args.connections}').split('-'))
+        driver_ids = list(range(first, last + 1))[:args.connections]
+    else:
+        server, app, url, passenger_id, db_file = start_local_server(args.connections)
+        driver_ids = list(range(1, args.connections + 1))
+
+    stats = {'lock': threading.Lock(), 'connected': 0, 'failed': 0, 'dropped': 0,
+             'connect_ms': [], 'errors': []}
+    offer_seen = {}
+    threads = [threading.Thread(target=driver_client, daemon=True,
+                                args=(url, driver_id, args.duration, args.ping_interval, stats, offer_seen))
+               for driver_id in driver_ids]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.002)
+
+    # Com todos conectados, criar uma corrida e medir o fan-out da oferta
+    time.sleep(min(args.duration / 3, 5))
+    fanout = None
+    if app is not None:
+        client = app.test_client()
+        published = time.perf_counter()
+        ride = client.post('/api/rides', json={'passenger_id': passenger_id, 'origin': 'A', 'destination': 'B',
+                                               'origin_lat': -23.5, 'origin_lng': -46.6,
+                                               'destination_lat': -23.6, 'destination_lng': -46.7}).json
+        offer_seen[ride['id']] = []
+        time.sleep(2)
+        arrivals = sorted(offer_seen[ride['id']])
+        if arrivals:
+            fanout = (len(arrivals), (arrivals[-1] - published) * 1000)
+
+    for thread in threads:
+        thread.join()
+    if server:
+        server.shutdown()
+        os.unlink(db_file)
+
+    connect_ms = sorted(stats['connect_ms']) or [0]
+    print(f"conexões: {stats['connected']}/{len(driver_ids)} (falhas: {stats['failed']}, "
+          f"quedas: {stats['dropped']}) por {args.duration:.0f} s")
+    print(f"tempo de conexão: p50 {connect_ms[len(connect_ms) // 2]:.1f} ms, máx {connect_ms[-1]:.1f} ms")
+    if fanout:
+        print(f"oferta entregue a {fanout[0]} motoristas em {fanout[1]:.0f} ms")
+    if stats['errors']:
+        print(f"primeiro erro: {stats['errors'][0]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,14 +8,25 @@ from flask_cors import CORS
 from src.models.user import db
 from src.models.ride import Ride
 from src.models.message import Message
+from src.models.outbox import OutboxEvent
 from src.routes.user import user_bp
-from src.routes.ride import ride_bp
+from src.routes.ride import ride_bp, routing_service
 from src.routes.message import message_bp
+from src.routes.driver_gateway import gateway_bp, sock
+from src.services.outbox import OutboxWorker
+from src.services.location_ingest import LocationIngestor
+from src.services.dispatch import DispatchEngine
+from src.services.json_provider import FastJSONProvider
+from src.services.geo import geohash_encode
 
 def create_app():
     app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
     app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 
+    # Serialização das respostas com orjson (se instalado, senão json da stdlib);
+    # datas saem em ISO 8601, formato esperado pelos serializers dos modelos
+    app.json = FastJSONProvider(app)
+
     # Habilitar CORS para GitHub Pages, Replit e desenvolvimento
     allowed_origins = [
         "https://Jonathan0078.github.io",
@@ -26,17 +37,22 @@ def create_app():
         "http://localhost:3000",
         "https://JonathanOliveira.pythonanywhere.com"
     ]
-    CORS(app, origins=allowed_origins, methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"], supports_credentials=True, allow_headers=["Content-Type", "Authorization"])
+    CORS(app, origins=allowed_origins, methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"], supports_credentials=True, allow_headers=["Content-Type", "Authorization"], expose_headers=["X-Next-Cursor"])
 
     # Registrar blueprints
     app.register_blueprint(user_bp, url_prefix='/api')
     app.register_blueprint(ride_bp, url_prefix='/api')
     app.register_blueprint(message_bp, url_prefix='/api')
+    app.register_blueprint(gateway_bp, url_prefix='/api')
+
+    # WebSocket do app do motorista: limite de mensagem e ping de keep-alive
+    app.config['SOCK_SERVER_OPTIONS'] = {'max_message_size': 4096, 'ping_interval': 25}
+    sock.init_app(app)
 
     # Configuração do banco de dados
     database_path = os.path.join(os.path.dirname(__file__), 'database', 'app.db')
     os.makedirs(os.path.dirname(database_path), exist_ok=True)
-    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{database_path}"
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', f"sqlite:///{database_path}")
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
     db.init_app(app)
@@ -56,8 +72,68 @@ def create_app():
             # Colunas já existem ou erro na migração
             pass
 
+        # Coluna geohash para busca de motoristas próximos
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(text('ALTER TABLE users ADD COLUMN geohash VARCHAR(12)'))
+        except Exception:
+            # Coluna já existe
+            pass
+
+        # Preencher o geohash de quem já tinha localização antes da coluna existir
+        # (senão o motorista some de /drivers/nearby até o próximo ping)
+        try:
+            with db.engine.begin() as conn:
+                rows = conn.execute(text(
+                    'SELECT id, latitude, longitude FROM users '
+                    'WHERE geohash IS NULL AND latitude BETWEEN -90 AND 90 AND longitude BETWEEN -180 AND 180'
+                )).all()
+                if rows:
+                    conn.execute(text('UPDATE users SET geohash = :geohash WHERE id = :id'), [
+                        {'id': user_id, 'geohash': geohash_encode(latitude, longitude)}
+                        for user_id, latitude, longitude in rows
+                    ])
+                    print(f"Geohash preenchido para {len(rows)} usuários")
+        except Exception as e:
+            print(f"Erro ao preencher geohash: {e}")
+
+        # create_all não cria índices novos em tabelas já existentes
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    index.create(bind=db.engine, checkfirst=True)
+                except Exception as e:
+                    print(f"Erro ao criar índice {index.name}: {e}")
+
         print("Tabelas criadas/atualizadas com sucesso!")
 
+    # Worker que entrega as notificações gravadas na outbox (GitHub Actions)
+    if os.getenv('OUTBOX_WORKER', '1') != '0':
+        outbox_worker = OutboxWorker(app)
+        app.extensions['outbox_worker'] = outbox_worker
+        outbox_worker.start()
+
+    # Buffer de pings de localização, gravado em lote na tabela users
+    if os.getenv('LOCATION_INGESTOR', '1') != '0':
+        location_ingestor = LocationIngestor(app, flush_interval=float(os.getenv('LOCATION_FLUSH_INTERVAL', '1.0')))
+        app.extensions['location_ingestor'] = location_ingestor
+        location_ingestor.start()
+
+    # Despacho automático: ofertas em lote para os motoristas mais próximos.
+    # Opcional (DISPATCH_ENGINE=1) e só para um único worker: as ofertas ficam
+    # em memória e saem pelo EventHub do processo. A trava em DISPATCH_LOCK_PATH
+    # detecta outros processos com o engine; havendo mais de um (ex: gunicorn
+    # com vários workers), nenhum roda os lotes e as corridas são anunciadas a todos
+    if os.getenv('DISPATCH_ENGINE', '0') == '1':
+        dispatch_engine = DispatchEngine(
+            app,
+            routing_service=routing_service if os.getenv('DISPATCH_OSRM', '0') == '1' else None,
+            window_seconds=float(os.getenv('DISPATCH_WINDOW', '2.0')),
+            lock_path=os.getenv('DISPATCH_LOCK_PATH', os.path.join(os.path.dirname(database_path), 'dispatch.lock'))
+        )
+        app.extensions['dispatch_engine'] = dispatch_engine
+        dispatch_engine.start()
+
     @app.route('/')
     def home():
         return jsonify({
@@ -67,6 +143,9 @@ def create_app():
             "endpoints": {
                 "users": "/api/users",
                 "rides": "/api/rides",
+                "nearby_drivers": "/api/drivers/nearby",
+                "driver_gateway": "/api/ws/driver?driver_id=<id>",
+                "dispatch": "/api/dispatch/stats",
                 "messages": "/api/messages"
             }
         })
@@ -99,6 +178,10 @@ if __name__ == '__main__':
     # Change to backend directory before running
     import os
     os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    # O processo que vigia os arquivos no modo debug não atende requisições:
+    # soltar a trava do despacho para que o processo filho do reloader seja o único
+    if os.environ.get('WERKZEUG_RUN_MAIN') != 'true' and 'dispatch_engine' in app.extensions:
+        app.extensions['dispatch_engine'].stop()
     # For local development
     app.run(host='0.0.0.0', port=5000, debug=True)
 else:
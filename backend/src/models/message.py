@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from src.models.user import db
+from src.models.user import db, user_to_dict
 
 class Message(db.Model):
     __tablename__ = 'messages'
@@ -12,12 +12,22 @@ class Message(db.Model):
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Polling incremental do chat: WHERE ride_id = ? AND id > ?
+        db.Index('ix_messages_ride_id_id', 'ride_id', 'id'),
+    )
+    
     # Relacionamentos
     ride = db.relationship('Ride', backref='messages')
     sender = db.relationship('User', foreign_keys=[sender_id], backref='sent_messages')
     receiver = db.relationship('User', foreign_keys=[receiver_id], backref='received_messages')
     
-    def to_dict(self):
+    def to_dict(self, user_cache=None):
+        """
+        Args:
+            user_cache: Dicionário compartilhado para reaproveitar os dicts de
+                remetente/destinatário ao serializar uma lista de mensagens
+        """
         return {
             'id': self.id,
             'ride_id': self.ride_id,
@@ -25,7 +35,7 @@ class Message(db.Model):
             'receiver_id': self.receiver_id,
             'content': self.content,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'sender': self.sender.to_dict() if self.sender else None,
-            'receiver': self.receiver.to_dict() if self.receiver else None
+            'sender': user_to_dict(self.sender, user_cache),
+            'receiver': user_to_dict(self.receiver, user_cache)
         }
 
@@ -0,0 +1,45 @@
+from datetime import datetime
+from src.models.user import db
+import json
+
+class OutboxEvent(db.Model):
+    """Evento pendente de entrega a um serviço externo (padrão transactional outbox)"""
+    __tablename__ = 'outbox_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(50), nullable=False)  # ex: message_sent
+    payload = db.Column(db.Text, nullable=False)  # JSON do client_payload
+    status = db.Column(db.String(20), default='pending')  # pending, sent, failed, skipped
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_outbox_events_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    def get_payload(self):
+        """Retorna o payload como dicionário"""
+        try:
+            return json.loads(self.payload)
+        except (TypeError, json.JSONDecodeError):
+            return {}
+    
+    def set_payload(self, payload):
+        """Define o payload a partir de um dicionário"""
+        self.payload = json.dumps(payload)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'event_type': self.event_type,
+            'payload': self.get_payload(),
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from src.models.user import db
+from src.models.user import db, user_to_dict
 import json
 
 class Ride(db.Model):
@@ -23,6 +23,14 @@ class Ride(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        # Listagens paginadas por (created_at, id) com e sem filtros
+        db.Index('ix_rides_created_at', 'created_at'),
+        db.Index('ix_rides_status_created_at', 'status', 'created_at'),
+        db.Index('ix_rides_passenger_created_at', 'passenger_id', 'created_at'),
+        db.Index('ix_rides_driver_created_at', 'driver_id', 'created_at'),
+    )
+    
     # Relacionamentos
     passenger = db.relationship('User', foreign_keys=[passenger_id], backref='passenger_rides')
     driver = db.relationship('User', foreign_keys=[driver_id], backref='driver_rides')
@@ -43,7 +51,12 @@ class Ride(db.Model):
         else:
             self.waypoints = None
     
-    def to_dict(self):
+    def to_dict(self, user_cache=None):
+        """
+        Args:
+            user_cache: Dicionário compartilhado para reaproveitar os dicts de
+                passageiro/motorista ao serializar uma lista de corridas
+        """
         return {
             'id': self.id,
             'passenger_id': self.passenger_id,
@@ -58,7 +71,7 @@ class Ride(db.Model):
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'passenger': self.passenger.to_dict() if self.passenger else None,
-            'driver': self.driver.to_dict() if self.driver else None
+            'passenger': user_to_dict(self.passenger, user_cache),
+            'driver': user_to_dict(self.driver, user_cache)
         }
 
@@ -0,0 +1,102 @@
+from operator import attrgetter, itemgetter
+from typing import Callable, Dict, Optional, Sequence
+
+from src.models.user import User
+from src.models.ride import Ride
+from src.models.message import Message
+
+
+def compile_getter(model, fields: Sequence[str]) -> Callable:
+    """
+    Gera uma função que lê vários atributos de uma instância de uma só vez
+
+    Colunas já carregadas ficam no __dict__ da instância e são lidas com um
+    único itemgetter, sem passar pelos descritores do SQLAlchemy; se algum
+    campo não estiver carregado (expirado após commit, relacionamento lazy)
+    usa o attrgetter, que dispara o carregamento normal.
+
+    Args:
+        model: Classe do modelo (só para validar os nomes dos campos)
+        fields: Atributos, na ordem da tupla retornada
+
+    Returns:
+        Função instância -> tupla de valores
+    """
+    missing = [field for field in fields if not hasattr(model, field)]
+    if missing:
+        raise AttributeError(f"{model.__name__} não tem os campos {missing}")
+    loaded = itemgetter(*fields)
+    fallback = attrgetter(*fields)
+
+    def get(instance):
+        try:
+            return loaded(instance.__dict__)
+        except KeyError:
+            return fallback(instance)
+    return get
+
+
+def compile_serializer(model, fields: Sequence[str]) -> Callable:
+    """
+    Gera uma função instância -> dict com os campos, montada uma vez por modelo
+
+    Datas ficam como datetime: quem formata é o FastJSONProvider.
+    """
+    getter = compile_getter(model, fields)
+    fields = tuple(fields)
+    return lambda instance: dict(zip(fields, getter(instance)))
+
+
+_user_fields = compile_serializer(User, (
+    'id', 'username', 'email', 'user_type', 'is_available', 'latitude', 'longitude',
+    'location_updated_at', 'created_at'
+))
+_ride_fields = compile_serializer(Ride, (
+    'id', 'passenger_id', 'driver_id', 'origin', 'destination', 'origin_lat', 'origin_lng',
+    'destination_lat', 'destination_lng'
+))
+_ride_tail = compile_getter(Ride, ('status', 'created_at', 'updated_at', 'passenger', 'driver'))
+_message_fields = compile_serializer(Message, (
+    'id', 'ride_id', 'sender_id', 'receiver_id', 'content', 'created_at'
+))
+_message_users = compile_getter(Message, ('sender', 'receiver'))
+
+
+def serialize_user(user: Optional[User], cache: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Equivalente a User.to_dict() para respostas jsonify (datas como datetime)
+
+    Args:
+        user: Instância de User ou None
+        cache: Dicionário id -> dict compartilhado durante uma serialização em lista
+    """
+    if user is None:
+        return None
+    if cache is None:
+        return _user_fields(user)
+    data = cache.get(user.id)
+    if data is None:
+        data = cache[user.id] = _user_fields(user)
+    return data
+
+
+def serialize_ride(ride: Ride, user_cache: Optional[Dict] = None) -> Dict:
+    """Equivalente a Ride.to_dict() para respostas jsonify (datas como datetime)"""
+    data = _ride_fields(ride)
+    status, created_at, updated_at, passenger, driver = _ride_tail(ride)
+    data['waypoints'] = ride.get_waypoints()
+    data['status'] = status
+    data['created_at'] = created_at
+    data['updated_at'] = updated_at
+    data['passenger'] = serialize_user(passenger, user_cache)
+    data['driver'] = serialize_user(driver, user_cache)
+    return data
+
+
+def serialize_message(message: Message, user_cache: Optional[Dict] = None) -> Dict:
+    """Equivalente a Message.to_dict() para respostas jsonify (datas como datetime)"""
+    data = _message_fields(message)
+    sender, receiver = _message_users(message)
+    data['sender'] = serialize_user(sender, user_cache)
+    data['receiver'] = serialize_user(receiver, user_cache)
+    return data
@@ -14,8 +14,16 @@ class User(db.Model):
     latitude = db.Column(db.Float, nullable=True)  # Localização atual
     longitude = db.Column(db.Float, nullable=True)  # Localização atual
     location_updated_at = db.Column(db.DateTime, nullable=True)  # Última atualização de localização
+    geohash = db.Column(db.String(12), nullable=True)  # Geohash da localização (índice espacial)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Busca de motoristas próximos: filtro por tipo/disponibilidade + intervalo de
+        # geohash; latitude/longitude no índice evitam acessar a tabela
+        db.Index('ix_users_type_available_geohash', 'user_type', 'is_available', 'geohash',
+                 'latitude', 'longitude'),
+    )
+
     def __repr__(self):
         return f'<User {self.username}>'
 
@@ -31,3 +39,24 @@ class User(db.Model):
             'location_updated_at': self.location_updated_at.isoformat() if self.location_updated_at else None,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+
+def user_to_dict(user, cache=None):
+    """
+    Serializa um usuário reaproveitando dicts já gerados na mesma resposta
+
+    Args:
+        user: Instância de User ou None
+        cache: Dicionário id -> dict compartilhado durante uma serialização em lista
+
+    Returns:
+        Dicionário do usuário ou None
+    """
+    if user is None:
+        return None
+    if cache is None:
+        return user.to_dict()
+    data = cache.get(user.id)
+    if data is None:
+        data = cache[user.id] = user.to_dict()
+    return data
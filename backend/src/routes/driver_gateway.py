@@ -0,0 +1,138 @@
+import json
+import time
+from datetime import datetime
+from flask import Blueprint, current_app, request
+from flask_sock import Sock
+from src.models.user import db, User
+from src.models.ride import Ride
+from src.services.geo import geohash_encode, parse_coordinates
+from src.services.events import event_hub, ride_offer, REQUESTED_RIDES_TOPIC
+
+gateway_bp = Blueprint('driver_gateway', __name__)
+sock = Sock()
+
+# Intervalo do loop de leitura; eventos de saída esperam no máximo isso
+GATEWAY_POLL_SECONDS = 0.25
+# Pings de localização mais frequentes que isso são agregados (vale o último)
+MIN_LOCATION_INTERVAL = 0.5
+# Eventos de saída enfileirados por conexão antes de considerar o cliente lento
+OUTBOUND_QUEUE_SIZE = 64
+# Ofertas enviadas ao conectar
+INITIAL_OFFERS_LIMIT = 50
+
+
+@sock.route('/ws/driver', bp=gateway_bp)
+def driver_gateway(ws):
+    """
+    Conexão WebSocket do app do motorista
+
+    Mensagens do cliente (JSON):
+        {"t": "loc", "lat": -23.55, "lng": -46.63}   localização
+        {"t": "avail", "v": true}                      disponibilidade
+        {"t": "decline", "id": 12}                     recusar oferta do despacho
+        {"t": "ping"}                                  keep-alive
+    Mensagens do servidor:
+        {"t": "hello", "driver_id": 7, "avail": true}
+        {"t": "offer", "id": 12, "o": [lat, lng], "d": [lat, lng], "oa": "...", "da": "..."}
+                                                       (ofertas do despacho trazem também "eta" e "ttl")
+        {"t": "taken", "id": 12}
+        {"t": "resync"}                                fila estourou: recarregar ofertas via REST
+        {"t": "pong"} / {"t": "err", "msg": "..."}
+    """
+    driver_id = request.args.get('driver_id', type=int)
+    driver = User.query.get(driver_id) if driver_id else None
+    if not driver or driver.user_type != 'driver':
+        ws.send(json.dumps({'t': 'err', 'msg': 'Motorista não encontrado'}))
+        ws.close()
+        return
+
+    available = bool(driver.is_available)
+    ingestor = current_app.extensions.get('location_ingestor')
+    subscription = event_hub.subscribe([f'user:{driver_id}'], max_queue=OUTBOUND_QUEUE_SIZE)
+    pending_location = None
+    last_location_write = 0.0
+
+    def send(message):
+        ws.send(json.dumps(message, separators=(',', ':')))
+
+    def set_available(value):
+        nonlocal available
+        available = value
+        if available:
+            subscription.add_topic(REQUESTED_RIDES_TOPIC)
+            rides = (Ride.query.filter_by(status='requested')
+                     .order_by(Ride.created_at.desc()).limit(INITIAL_OFFERS_LIMIT).all())
+            for ride in rides:
+                send(ride_offer(ride))
+        else:
+            subscription.remove_topic(REQUESTED_RIDES_TOPIC)
+
+    try:
+        send({'t': 'hello', 'driver_id': driver_id, 'avail': available})
+        if available:
+            set_available(True)
+        db.session.remove()
+
+        while True:
+            raw = ws.receive(timeout=GATEWAY_POLL_SECONDS)
+            if raw is not None:
+                try:
+                    message = json.loads(raw)
+                    kind = message.get('t')
+                    if kind == 'loc':
+                        pending_location = parse_coordinates(message['lat'], message['lng'])
+                    elif kind == 'avail':
+                        value = bool(message.get('v'))
+                        User.query.filter_by(id=driver_id).update({'is_available': value})
+                        db.session.commit()
+                        set_available(value)
+                        db.session.remove()
+                    elif kind == 'decline':
+                        engine = current_app.extensions.get('dispatch_engine')
+                        if engine:
+                            engine.decline(int(message['id']), driver_id)
+                    elif kind == 'ping':
+                        send({'t': 'pong'})
+                    else:
+                        send({'t': 'err', 'msg': f'tipo desconhecido: {kind}'})
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    send({'t': 'err', 'msg': str(e)})
+
+            # Localização: no máximo uma gravação por intervalo, sempre a mais recente
+            now = time.monotonic()
+            if pending_location and now - last_location_write >= MIN_LOCATION_INTERVAL:
+                latitude, longitude = pending_location
+                pending_location = None
+                last_location_write = now
+                if ingestor:
+                    ingestor.mark_known_user(driver_id)
+                    _, _, updated_at = ingestor.record(driver_id, latitude, longitude)
+                else:
+                    updated_at = datetime.utcnow()
+                    User.query.filter_by(id=driver_id).update({
+                        'latitude': latitude, 'longitude': longitude,
+                        'geohash': geohash_encode(latitude, longitude),
+                        'location_updated_at': updated_at
+                    })
+                    db.session.commit()
+                    db.session.remove()
+                event_hub.publish(f'user:{driver_id}', 'location', {
+                    'user_id': driver_id, 'latitude': latitude, 'longitude': longitude,
+                    'updated_at': updated_at.isoformat()
+                })
+
+            # Eventos de saída: se a fila estourou, descartar e pedir resync
+            if subscription.lagged:
+                while subscription.get(timeout=0) is not None:
+                    pass
+                subscription.lagged = False
+                send({'t': 'resync'})
+            while True:
+                event = subscription.get(timeout=0)
+                if event is None:
+                    break
+                if event['event'] in ('offer', 'taken'):
+                    send(event['data'])
+    finally:
+        subscription.close()
+        db.session.remove()
@@ -1,9 +1,11 @@
-from flask import Blueprint, request, jsonify
-import requests
-import os
+from flask import Blueprint, request, jsonify, current_app
 from src.models.user import db, User
 from src.models.ride import Ride
 from src.models.message import Message
+from src.models.serializers import serialize_message
+from src.models.outbox import OutboxEvent
+from src.services.outbox import enqueue_event
+from src.services.events import event_hub
 
 message_bp = Blueprint('message', __name__)
 
@@ -47,15 +49,20 @@ def send_message(ride_id):
         )
         
         db.session.add(message)
+        db.session.flush()
+        
+        # Notificação via GitHub Action gravada na outbox, na mesma transação da
+        # mensagem; o envio é feito pelo worker em background
+        message_data = message.to_dict()
+        enqueue_event('message_sent', message_data)
         db.session.commit()
         
-        # Disparar GitHub Action para notificação
-        try:
-            trigger_github_action(message.to_dict())
-        except Exception as e:
-            print(f"Erro ao disparar GitHub Action: {e}")
+        outbox_worker = current_app.extensions.get('outbox_worker')
+        if outbox_worker:
+            outbox_worker.notify()
+        event_hub.publish(f'ride:{ride_id}', 'message', message_data)
         
-        return jsonify(message.to_dict()), 201
+        return jsonify(message_data), 201
         
     except Exception as e:
         db.session.rollback()
@@ -63,51 +70,48 @@ def send_message(ride_id):
 
 @message_bp.route('/rides/<int:ride_id>/messages', methods=['GET'])
 def get_messages(ride_id):
-    """Obter mensagens de uma corrida"""
+    """Obter mensagens de uma corrida (opcionalmente apenas as posteriores a after_id)"""
     try:
+        after_id = request.args.get('after_id', default=0, type=int)
+        
         # Verificar se a corrida existe
         ride = Ride.query.get(ride_id)
         if not ride:
             return jsonify({'error': 'Corrida não encontrada'}), 404
         
+        # Versão da conversa a partir do índice (ride_id, id), sem carregar mensagens;
+        # mensagens não são editadas, então (maior id, quantidade) identifica o conteúdo
+        last_id, count = (db.session.query(db.func.max(Message.id), db.func.count(Message.id))
+                          .filter(Message.ride_id == ride_id, Message.id > after_id)
+                          .one())
+        etag = f'messages-{ride_id}-{after_id}-{last_id or 0}-{count}'
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        
         # Buscar mensagens da corrida
-        messages = Message.query.filter_by(ride_id=ride_id).order_by(Message.created_at.asc()).all()
+        messages = (Message.query.filter(Message.ride_id == ride_id, Message.id > after_id)
+                    .options(db.selectinload(Message.sender), db.selectinload(Message.receiver))
+                    .order_by(Message.id.asc()).all())
         
-        return jsonify([message.to_dict() for message in messages]), 200
+        user_cache = {}
+        response = jsonify([serialize_message(message, user_cache) for message in messages])
+        response.set_etag(etag, weak=True)
+        # Força o navegador a revalidar com If-None-Match em vez de reutilizar sem perguntar
+        response.headers['Cache-Control'] = 'no-cache'
+        return response, 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def trigger_github_action(message_data):
-    """Disparar GitHub Action para processar mensagem"""
-    # Esta função será implementada quando configurarmos o GitHub Actions
-    # Por enquanto, apenas simula o disparo
-    
-    github_token = os.getenv('GITHUB_TOKEN')
-    if not github_token:
-        print("GITHUB_TOKEN não configurado")
-        return
-    
-    # URL para disparar repository_dispatch
-    url = "https://api.github.com/repos/Jonathan0078/Uber/dispatches"
-    
-    headers = {
-        'Authorization': f'token {github_token}',
-        'Accept': 'application/vnd.github.v3+json',
-        'Content-Type': 'application/json'
-    }
-    
-    payload = {
-        'event_type': 'message_sent',
-        'client_payload': message_data
-    }
-    
+@message_bp.route('/outbox/stats', methods=['GET'])
+def outbox_stats():
+    """Contagem de notificações da outbox por status de entrega"""
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        if response.status_code == 204:
-            print("GitHub Action disparado com sucesso")
-        else:
-            print(f"Erro ao disparar GitHub Action: {response.status_code} - {response.text}")
+        rows = db.session.query(OutboxEvent.status, db.func.count(OutboxEvent.id)).group_by(OutboxEvent.status).all()
+        return jsonify({status: count for status, count in rows}), 200
+        
     except Exception as e:
-        print(f"Erro na requisição para GitHub: {e}")
-
+        return jsonify({'error': str(e)}), 500
@@ -1,13 +1,137 @@
-from flask import Blueprint, request, jsonify
+import os
+import base64
+import json
+import sqlite3
+import threading
+from datetime import datetime
+import time
+from flask import Blueprint, current_app, request, jsonify, Response, stream_with_context
 from src.models.user import db, User
 from src.models.ride import Ride
 from src.models.message import Message
-from src.services.routing import OSRMRoutingService, format_distance, format_duration
-from src.services.geocoding import NominatimGeocodingService
+from src.models.serializers import serialize_ride
+from src.services.routing import OSRMRoutingService, shape_route, shape_precision, format_distance, format_duration
+from src.services.road_graph import LocalGraphBackend
+from src.services.geocoding import NominatimGeocodingService, FallbackGeocodingService
+from src.services.gazetteer import GazetteerGeocodingService
+from src.services.poi_index import PoiIndex
+from src.services.geo import parse_coordinates
+from src.services.cache import TwoTierCache, TTLCache, SQLiteCacheStore
+from src.services.rate_limit import RateGovernor
+from src.services.autocomplete import PlaceAutocompleteIndex
+from src.services.events import event_hub, publish_ride_offer, publish_ride_taken
 
 ride_bp = Blueprint('ride', __name__)
-routing_service = OSRMRoutingService()
-geocoding_service = NominatimGeocodingService()
+
+# Grafo viário local (gerado com python -m src.services.road_graph) usado
+# quando o OSRM está fora do ar ou limitando as requisições
+road_graph_path = os.getenv('ROAD_GRAPH_PATH', os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'database', 'road_graph.npz'))
+# O grafo é carregado na primeira rota que precisar do fallback
+local_routing = LocalGraphBackend(graph_path=road_graph_path) if os.path.exists(road_graph_path) else None
+routing_service = OSRMRoutingService(os.getenv('OSRM_URL', 'http://router.project-osrm.org'),
+                                     fallback_backend=local_routing)
+
+# Cache de geocodificação persistido em SQLite para sobreviver a reinícios do worker
+geocode_cache_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'geocode_cache.db')
+os.makedirs(os.path.dirname(geocode_cache_path), exist_ok=True)
+nominatim_service = NominatimGeocodingService(
+    cache=TwoTierCache(
+        memory=TTLCache(max_entries=4096, ttl=24 * 3600),
+        store=SQLiteCacheStore(geocode_cache_path, table='geocode_cache')
+    ),
+    reverse_cache=TwoTierCache(
+        memory=TTLCache(max_entries=50000, ttl=24 * 3600, max_bytes=16 * 1024 * 1024),
+        store=SQLiteCacheStore(geocode_cache_path, table='reverse_geocode_cache')
+    ),
+    reverse_cell_size_m=float(os.getenv('REVERSE_GEOCODE_CELL_M', '30')),
+    # Política do Nominatim: 1 req/s para a aplicação inteira, então o balde
+    # fica em arquivo e é compartilhado pelos workers da máquina
+    rate_governor=RateGovernor(
+        rate=float(os.getenv('NOMINATIM_RATE', '1.0')),
+        state_path=os.path.join(os.path.dirname(geocode_cache_path), 'nominatim_rate.state')
+    )
+)
+
+# Extrato de endereços offline (gerado com python -m src.services.gazetteer):
+# quando existe, é encadeado com o Nominatim. GEOCODER_PRIMARY=gazetteer
+# consulta o extrato primeiro; nominatim usa o extrato só quando o Nominatim
+# não encontra o endereço ou está fora do ar
+gazetteer_path = os.getenv('GAZETTEER_PATH', os.path.join(os.path.dirname(geocode_cache_path), 'gazetteer.db'))
+geocoding_service = nominatim_service
+if os.path.exists(gazetteer_path):
+    gazetteer_service = GazetteerGeocodingService(gazetteer_path)
+    if os.getenv('GEOCODER_PRIMARY', 'gazetteer') == 'nominatim':
+        geocoding_service = FallbackGeocodingService(nominatim_service, gazetteer_service)
+    else:
+        geocoding_service = FallbackGeocodingService(gazetteer_service, nominatim_service)
+
+# Pontos de interesse do extrato (lugares com categoria) em um índice de grade
+# em memória, carregado na primeira busca: workers que nunca atendem
+# /places/nearby não pagam a carga nem a memória
+poi_index = None
+_poi_index_lock = threading.Lock()
+# Depois de uma carga com erro, as buscas seguem sem o índice até
+# _poi_index_retry_at (time.monotonic) em vez de recarregar o extrato a cada uma
+POI_INDEX_RETRY_SECONDS = 300
+_poi_index_retry_at = 0.0
+_poi_index_error = None
+
+def get_poi_index():
+    """Índice de POIs do extrato (None se não há extrato ou a carga falhou há pouco)"""
+    global poi_index, _poi_index_retry_at, _poi_index_error
+    if poi_index is None and time.monotonic() >= _poi_index_retry_at and os.path.exists(gazetteer_path):
+        with _poi_index_lock:
+            if poi_index is None and time.monotonic() >= _poi_index_retry_at:
+                try:
+                    poi_index = PoiIndex.from_gazetteer(gazetteer_path,
+                                                        cell_size_m=float(os.getenv('POI_CELL_M', '500')))
+                    _poi_index_error = None
+                except sqlite3.Error as e:
+                    _poi_index_retry_at = time.monotonic() + POI_INDEX_RETRY_SECONDS
+                    # O mesmo erro a cada nova tentativa é registrado uma vez só
+                    if str(e) != _poi_index_error:
+                        print(f"Erro ao carregar o índice de POIs (nova tentativa em "
+                              f"{POI_INDEX_RETRY_SECONDS}s): {e}")
+                    _poi_index_error = str(e)
+    return poi_index
+
+def load_autocomplete_entries():
+    """Origens/destinos das corridas (com a frequência) e endereços do cache de geocodificação"""
+    for address, lat, lng in ((Ride.origin, Ride.origin_lat, Ride.origin_lng),
+                              (Ride.destination, Ride.destination_lat, Ride.destination_lng)):
+        rows = (db.session.query(address, db.func.max(lat), db.func.max(lng), db.func.count(Ride.id))
+                .group_by(address))
+        for row in rows:
+            yield tuple(row)
+    if nominatim_service.cache.store is not None:
+        for _, result in nominatim_service.cache.store.items('search:'):
+            if result:
+                yield result['display_name'], result['latitude'], result['longitude'], 0
+
+# Sugestões de endereço por prefixo, servidas da memória de cada worker
+autocomplete_index = PlaceAutocompleteIndex(
+    loader=load_autocomplete_entries,
+    refresh_seconds=float(os.getenv('AUTOCOMPLETE_REFRESH', '300'))
+)
+MAX_AUTOCOMPLETE_RESULTS = 20
+
+# Limites de GET /places/nearby
+MAX_NEARBY_RADIUS = 50000
+MAX_NEARBY_RESULTS = 50
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Server-Sent Events: intervalo de heartbeat e duração máxima de uma conexão
+SSE_HEARTBEAT_SECONDS = 15
+SSE_MAX_STREAM_SECONDS = 300
+
+# Pares origem x destino aceitos por POST /routes/matrix
+MAX_MATRIX_CELLS = 250000
+
+# Prazo total para geocodificar os endereços de uma nova corrida
+GEOCODE_DEADLINE_SECONDS = float(os.getenv('GEOCODE_DEADLINE', '4.0'))
 
 @ride_bp.route('/rides', methods=['POST'])
 def create_ride():
@@ -30,17 +154,33 @@ def create_ride():
         destination_lat = data.get('destination_lat')
         destination_lng = data.get('destination_lng')
         
-        if not origin_lat or not origin_lng:
-            origin_coords = geocoding_service.geocode_address(data['origin'])
-            if origin_coords:
-                origin_lat = origin_coords['latitude']
-                origin_lng = origin_coords['longitude']
+        waypoints = data.get('waypoints') or []
         
+        # Origem, destino e waypoints só com endereço são consultados em
+        # paralelo; o que não ficar pronto no prazo segue sem coordenadas
+        lookups = []
+        if not origin_lat or not origin_lng:
+            lookups.append(('origin', data['origin']))
         if not destination_lat or not destination_lng:
-            destination_coords = geocoding_service.geocode_address(data['destination'])
-            if destination_coords:
-                destination_lat = destination_coords['latitude']
-                destination_lng = destination_coords['longitude']
+            lookups.append(('destination', data['destination']))
+        for index, waypoint in enumerate(waypoints):
+            if isinstance(waypoint, dict) and waypoint.get('address') and \
+                    (waypoint.get('lat') is None or waypoint.get('lng') is None):
+                lookups.append((index, waypoint['address']))
+        
+        if lookups:
+            results = geocoding_service.geocode_many([address for _, address in lookups],
+                                                     deadline=GEOCODE_DEADLINE_SECONDS)
+            for (target, _), coords in zip(lookups, results):
+                if not coords:
+                    continue
+                if target == 'origin':
+                    origin_lat, origin_lng = coords['latitude'], coords['longitude']
+                elif target == 'destination':
+                    destination_lat, destination_lng = coords['latitude'], coords['longitude']
+                else:
+                    waypoints[target] = {**waypoints[target], 'lat': coords['latitude'],
+                                         'lng': coords['longitude']}
         
         # Criar nova corrida
         ride = Ride(
@@ -56,12 +196,15 @@ def create_ride():
         
         # Adicionar waypoints se fornecidos
         if 'waypoints' in data:
-            ride.set_waypoints(data['waypoints'])
+            ride.set_waypoints(waypoints)
         
         db.session.add(ride)
         db.session.commit()
+        announce_ride(ride)
+        autocomplete_index.add(ride.origin, ride.origin_lat, ride.origin_lng)
+        autocomplete_index.add(ride.destination, ride.destination_lat, ride.destination_lng)
         
-        return jsonify(ride.to_dict()), 201
+        return jsonify(serialize_ride(ride)), 201
         
     except Exception as e:
         db.session.rollback()
@@ -97,16 +240,45 @@ def update_ride_route(ride_id):
         
         db.session.commit()
         
-        return jsonify(ride.to_dict()), 200
+        return jsonify(serialize_ride(ride)), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def route_options():
+    """
+    Opções de formato da rota vindas da query string
+
+    geometry=geojson|polyline|polyline6, tolerance=<metros> (Douglas-Peucker)
+    e steps=true para incluir as instruções passo a passo.
+
+    Raises:
+        ValueError: Formato de geometria desconhecido ou tolerância não finita
+    """
+    options = {
+        'geometry': request.args.get('geometry', 'geojson'),
+        'tolerance_m': max(request.args.get('tolerance', 0.0, type=float), 0.0),
+        'steps': request.args.get('steps', 'false').lower() in ('1', 'true', 'yes')
+    }
+    # Validar antes de consultar o OSRM
+    shape_precision(options['geometry'], options['tolerance_m'])
+    return options
+
 @ride_bp.route('/rides/<int:ride_id>/calculate-route', methods=['POST'])
 def calculate_ride_route(ride_id):
-    """Calcular rota da corrida usando OSRM"""
+    """
+    Calcular rota da corrida usando OSRM
+
+    Query string (opcional): geometry=geojson|polyline|polyline6,
+    tolerance=<metros> e steps=true (por padrão os passos não são enviados).
+    """
     try:
+        try:
+            options = route_options()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         ride = Ride.query.get(ride_id)
         if not ride:
             return jsonify({'error': 'Corrida não encontrada'}), 404
@@ -133,10 +305,12 @@ def calculate_ride_route(ride_id):
         if not route_data:
             return jsonify({'error': 'Não foi possível calcular a rota'}), 500
         
+        shaped_route = shape_route(route_data, **options)
+        
         # Formatar resposta
         response = {
             'ride_id': ride_id,
-            'route': route_data,
+            'route': shaped_route,
             'formatted_distance': format_distance(route_data['distance']),
             'formatted_duration': format_duration(route_data['duration']),
             'coordinates': coordinates
@@ -149,8 +323,17 @@ def calculate_ride_route(ride_id):
 
 @ride_bp.route('/rides/<int:ride_id>/distance-to-driver', methods=['POST'])
 def calculate_distance_to_driver(ride_id):
-    """Calcular distância do motorista ao destino da corrida"""
+    """
+    Calcular distância do motorista ao destino da corrida
+
+    Aceita as mesmas opções de geometria de calculate-route na query string.
+    """
     try:
+        try:
+            options = route_options()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         data = request.get_json()
         
         ride = Ride.query.get(ride_id)
@@ -182,6 +365,8 @@ def calculate_distance_to_driver(ride_id):
         if not route_data:
             return jsonify({'error': 'Não foi possível calcular a distância'}), 500
         
+        shaped_route = shape_route(route_data, **options)
+        
         response = {
             'ride_id': ride_id,
             'driver_to_destination': {
@@ -189,15 +374,45 @@ def calculate_distance_to_driver(ride_id):
                 'duration': route_data['duration'],
                 'formatted_distance': format_distance(route_data['distance']),
                 'formatted_duration': format_duration(route_data['duration']),
-                'geometry': route_data['geometry']
+                'geometry': shaped_route['geometry']
             }
         }
+        if 'geometry_format' in shaped_route:
+            response['driver_to_destination']['geometry_format'] = shaped_route['geometry_format']
         
         return jsonify(response), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def announce_ride(ride):
+    """
+    Oferece uma corrida 'requested' aos motoristas
+    
+    Com o despacho automático ativo, a corrida entra no próximo lote do
+    engine e é oferecida só ao motorista escolhido; sem ele (desligado,
+    pausado por haver vários workers ou sem coordenadas de embarque) é
+    anunciada a todos os motoristas disponíveis.
+    """
+    engine = current_app.extensions.get('dispatch_engine')
+    if engine and engine.is_active() and ride.origin_lat is not None and ride.origin_lng is not None:
+        return
+    publish_ride_offer(ride)
+
+def publish_ride_status(ride):
+    """Publica a mudança de status da corrida (SSE e gateway de motoristas)"""
+    event_hub.publish(f'ride:{ride.id}', 'status', {
+        'ride_id': ride.id,
+        'status': ride.status,
+        'driver_id': ride.driver_id,
+        'updated_at': ride.updated_at.isoformat() if ride.updated_at else None
+    })
+    # Gateway de motoristas: retirar ou (re)ofertar a corrida
+    if ride.status == 'requested':
+        announce_ride(ride)
+    else:
+        publish_ride_taken(ride)
+
 @ride_bp.route('/rides/<int:ride_id>/accept', methods=['POST'])
 def accept_ride(ride_id):
     """Motorista aceita uma corrida"""
@@ -212,21 +427,30 @@ def accept_ride(ride_id):
         if not driver or driver.user_type != 'driver':
             return jsonify({'error': 'Motorista não encontrado'}), 404
         
-        # Buscar a corrida
-        ride = Ride.query.get(ride_id)
-        if not ride:
+        # Leitura rápida: corridas já aceitas são recusadas sem disputar a
+        # escrita no banco
+        current_status = db.session.query(Ride.status).filter_by(id=ride_id).scalar()
+        if current_status is None:
             return jsonify({'error': 'Corrida não encontrada'}), 404
+        if current_status != 'requested':
+            return jsonify({'error': 'Corrida não está mais disponível para aceitar'}), 409
+        
+        # Aceitar a corrida com um UPDATE condicional: só um motorista consegue
+        # mudar o status de 'requested' para 'accepted', mesmo em paralelo
+        result = db.session.execute(
+            db.update(Ride)
+            .where(Ride.id == ride_id, Ride.status == 'requested')
+            .values(driver_id=data['driver_id'], status='accepted', updated_at=datetime.utcnow())
+        )
+        db.session.commit()
         
-        if ride.status != 'requested':
-            return jsonify({'error': 'Corrida não está disponível para aceitar'}), 400
-        
-        # Aceitar a corrida
-        ride.driver_id = data['driver_id']
-        ride.status = 'accepted'
+        if result.rowcount != 1:
+            return jsonify({'error': 'Corrida não está mais disponível para aceitar'}), 409
         
-        db.session.commit()
+        ride = Ride.query.get(ride_id)
+        publish_ride_status(ride)
         
-        return jsonify(ride.to_dict()), 200
+        return jsonify(serialize_ride(ride)), 200
         
     except Exception as e:
         db.session.rollback()
@@ -251,21 +475,37 @@ def update_ride_status(ride_id):
         
         ride.status = data['status']
         db.session.commit()
+        publish_ride_status(ride)
         
-        return jsonify(ride.to_dict()), 200
+        return jsonify(serialize_ride(ride)), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def encode_cursor(ride):
+    """Cursor opaco com a posição (created_at, id) da última corrida da página"""
+    raw = json.dumps([ride.created_at.isoformat(), ride.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decodifica um cursor gerado por encode_cursor"""
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    created_at, ride_id = json.loads(raw)
+    return datetime.fromisoformat(created_at), int(ride_id)
+
 @ride_bp.route('/rides', methods=['GET'])
 def get_rides():
-    """Listar corridas com filtros opcionais"""
+    """Listar corridas com filtros opcionais e paginação por cursor"""
     try:
         # Filtros opcionais
         passenger_id = request.args.get('passenger_id', type=int)
         driver_id = request.args.get('driver_id', type=int)
         status = request.args.get('status')
+        limit = request.args.get('limit', default=DEFAULT_PAGE_SIZE, type=int)
+        cursor = request.args.get('cursor')
+        
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
         
         query = Ride.query
         
@@ -276,9 +516,31 @@ def get_rides():
         if status:
             query = query.filter_by(status=status)
         
-        rides = query.order_by(Ride.created_at.desc()).all()
-        
-        return jsonify([ride.to_dict() for ride in rides]), 200
+        # Keyset: continuar estritamente depois da última corrida da página anterior
+        if cursor:
+            try:
+                cursor_created_at, cursor_id = decode_cursor(cursor)
+            except (ValueError, TypeError):
+                return jsonify({'error': 'cursor inválido'}), 400
+            query = query.filter(db.or_(
+                Ride.created_at < cursor_created_at,
+                db.and_(Ride.created_at == cursor_created_at, Ride.id < cursor_id)
+            ))
+        
+        # Carregar passageiros e motoristas em lote (evita 1 + 2N consultas)
+        rides = (query.options(db.selectinload(Ride.passenger), db.selectinload(Ride.driver))
+                 .order_by(Ride.created_at.desc(), Ride.id.desc())
+                 .limit(limit + 1).all())
+        
+        has_more = len(rides) > limit
+        rides = rides[:limit]
+        
+        user_cache = {}
+        response = jsonify([serialize_ride(ride, user_cache) for ride in rides])
+        # O corpo continua sendo uma lista; o cursor da próxima página vai no cabeçalho
+        if has_more:
+            response.headers['X-Next-Cursor'] = encode_cursor(rides[-1])
+        return response, 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -291,11 +553,115 @@ def get_ride(ride_id):
         if not ride:
             return jsonify({'error': 'Corrida não encontrada'}), 404
         
-        return jsonify(ride.to_dict()), 200
+        return jsonify(serialize_ride(ride)), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def format_sse(event):
+    """Formata um evento do hub no protocolo text/event-stream"""
+    return f"id: {event_hub.format_event_id(event['id'])}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+@ride_bp.route('/rides/<int:ride_id>/events', methods=['GET'])
+def ride_events(ride_id):
+    """Stream SSE com status, mensagens e localização do motorista da corrida"""
+    try:
+        ride = Ride.query.get(ride_id)
+        if not ride:
+            return jsonify({'error': 'Corrida não encontrada'}), 404
+        
+        driver_id = ride.driver_id
+        # EventSource envia Last-Event-ID ao reconectar; o parâmetro cobre a primeira conexão
+        received_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        last_event_id = event_hub.parse_event_id(received_id) if received_id else None
+        # Id de outra época (outro worker ou restart): os eventos perdidos não
+        # estão neste hub, então o cliente precisa recarregar o estado
+        resync = bool(received_id) and last_event_id is None
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    def stream():
+        nonlocal driver_id
+        topics = [f'ride:{ride_id}']
+        if driver_id:
+            topics.append(f'user:{driver_id}')
+        # Ao pedir resync, os eventos anteriores já estão no estado que o
+        # cliente vai recarregar; os publicados depois chegam pela inscrição
+        resync_id = event_hub.last_id() if resync else None
+        # Inscrever antes do replay para não perder eventos publicados entre os dois
+        subscription = event_hub.subscribe(topics)
+        sent_up_to = last_event_id or resync_id or 0
+        deadline = time.monotonic() + SSE_MAX_STREAM_SECONDS
+        try:
+            yield f"retry: 3000\n: conectado à corrida {ride_id}\n\n"
+            if resync:
+                # Com id da época atual, para a próxima reconexão não repetir o resync
+                yield f"id: {event_hub.format_event_id(resync_id)}\nevent: resync\ndata: {{}}\n\n"
+            elif last_event_id is not None:
+                for event in event_hub.replay(subscription.topics, last_event_id):
+                    sent_up_to = event['id']
+                    yield format_sse(event)
+            
+            while time.monotonic() < deadline:
+                event = subscription.get(timeout=SSE_HEARTBEAT_SECONDS)
+                if subscription.lagged:
+                    # Cliente lento: pedir que recarregue o estado pela API REST
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                if event is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                if event['id'] <= sent_up_to:
+                    continue
+                
+                # Motorista atribuído: passar a receber também a localização dele
+                if event['event'] == 'status' and event['data'].get('driver_id') and event['data']['driver_id'] != driver_id:
+                    driver_id = event['data']['driver_id']
+                    subscription.add_topic(f'user:{driver_id}')
+                
+                sent_up_to = event['id']
+                yield format_sse(event)
+        finally:
+            subscription.close()
+    
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@ride_bp.route('/routes/matrix', methods=['POST'])
+def calculate_eta_matrix():
+    """
+    Matriz de tempos e distâncias entre origens e destinos
+    
+    Corpo: {"sources": [{"lat": .., "lng": ..}], "destinations": [...]}
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or 'sources' not in data or 'destinations' not in data:
+            return jsonify({'error': 'sources e destinations são obrigatórios'}), 400
+        if not data['sources'] or not data['destinations']:
+            return jsonify({'error': 'sources e destinations não podem ser vazios'}), 400
+        if len(data['sources']) * len(data['destinations']) > MAX_MATRIX_CELLS:
+            return jsonify({'error': f'Máximo de {MAX_MATRIX_CELLS} pares por matriz'}), 400
+        
+        sources = [(float(p['lng']), float(p['lat'])) for p in data['sources']]
+        destinations = [(float(p['lng']), float(p['lat'])) for p in data['destinations']]
+        matrix = routing_service.calculate_eta_matrix(sources, destinations, data.get('profile', 'driving'))
+        
+        return jsonify({
+            'durations': matrix['durations'].round(1).tolist(),
+            'distances': matrix['distances'].round(1).tolist(),
+            'estimated': matrix['estimated'].tolist()
+        }), 200
+        
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Coordenada inválida: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @ride_bp.route('/geocode', methods=['POST'])
 def geocode_address():
     """Geocodificar um endereço"""
@@ -334,3 +700,105 @@ def reverse_geocode():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@ride_bp.route('/places/autocomplete', methods=['GET'])
+def autocomplete_places():
+    """Sugestões de endereço para o texto digitado (q), priorizando lugares perto de lat/lng"""
+    try:
+        limit = min(request.args.get('limit', 8, type=int), MAX_AUTOCOMPLETE_RESULTS)
+        latitude = longitude = None
+        if 'lat' in request.args or 'lng' in request.args:
+            try:
+                latitude, longitude = parse_coordinates(request.args.get('lat'), request.args.get('lng'))
+            except (TypeError, ValueError) as e:
+                return jsonify({'error': f'Coordenadas inválidas: {e}'}), 400
+        autocomplete_index.ensure_fresh(current_app._get_current_object())
+        results = autocomplete_index.search(
+            request.args.get('q', ''),
+            latitude=latitude,
+            longitude=longitude,
+            limit=limit
+        )
+        return jsonify(results), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@ride_bp.route('/places/nearby', methods=['GET'])
+def nearby_places():
+    """
+    Pontos de interesse perto de lat/lng
+    
+    Filtra por nome ou tipo de lugar (q, ex: "farmácia") e/ou por categorias
+    OSM separadas por vírgula (category, ex: amenity=fuel,amenity=parking).
+    Usa o índice local de POIs; sem ele (ou sem resultados para q), o
+    geocodificador configurado.
+    """
+    try:
+        if 'lat' not in request.args or 'lng' not in request.args:
+            return jsonify({'error': 'Latitude e longitude são obrigatórias'}), 400
+        try:
+            latitude, longitude = parse_coordinates(request.args['lat'], request.args['lng'])
+        except ValueError as e:
+            return jsonify({'error': f'Coordenadas inválidas: {e}'}), 400
+        
+        query = request.args.get('q', '').strip()
+        categories = [category.strip() for category in request.args.get('category', '').split(',')
+                      if category.strip()]
+        if not query and not categories:
+            return jsonify({'error': 'Informe o termo de busca (q) ou a categoria'}), 400
+        radius = request.args.get('radius', 1000, type=float)
+        limit = request.args.get('limit', 10, type=int)
+        if not radius > 0:
+            return jsonify({'error': 'radius deve ser maior que zero'}), 400
+        if limit <= 0:
+            return jsonify({'error': 'limit deve ser maior que zero'}), 400
+        radius = min(radius, MAX_NEARBY_RADIUS)
+        limit = min(limit, MAX_NEARBY_RESULTS)
+        
+        results = []
+        index = get_poi_index()
+        if index is not None:
+            results = index.search_nearby(latitude, longitude, query, radius, categories, limit)
+        if not results and query and not categories:
+            results = geocoding_service.search_nearby(latitude, longitude, query, radius)[:limit]
+        
+        return jsonify(results), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@ride_bp.route('/geocode/cache-stats', methods=['GET'])
+def geocode_cache_stats():
+    """Estatísticas do cache de geocodificação (hits, misses, evictions)"""
+    return jsonify(geocoding_service.cache_stats()), 200
+
+@ride_bp.route('/routes/cache-stats', methods=['GET'])
+def route_cache_stats():
+    """Estatísticas do cache de rotas (taxa de acerto e memória)"""
+    return jsonify(routing_service.cache_stats()), 200
+
+@ride_bp.route('/rides/<int:ride_id>/decline', methods=['POST'])
+def decline_ride(ride_id):
+    """Motorista recusa a oferta de corrida recebida do despacho automático"""
+    try:
+        data = request.get_json()
+        
+        if 'driver_id' not in data:
+            return jsonify({'error': 'driver_id é obrigatório'}), 400
+        
+        engine = current_app.extensions.get('dispatch_engine')
+        if not engine or not engine.decline(ride_id, data['driver_id']):
+            return jsonify({'error': 'Nenhuma oferta pendente desta corrida para o motorista'}), 404
+        
+        return jsonify({'message': 'Oferta recusada'}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@ride_bp.route('/dispatch/stats', methods=['GET'])
+def dispatch_stats():
+    """Estatísticas do despacho automático (ofertas, ETA médio, último lote)"""
+    engine = current_app.extensions.get('dispatch_engine')
+    if not engine:
+        return jsonify({'error': 'Despacho automático desativado'}), 404
+    return jsonify(engine.stats()), 200
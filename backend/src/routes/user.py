@@ -1,13 +1,24 @@
-from flask import Blueprint, request, jsonify
-from datetime import datetime
+import math
+from flask import Blueprint, request, jsonify, current_app
+from datetime import datetime, timedelta, timezone
 from src.models.user import db, User
+from src.models.serializers import serialize_user
+import numpy as np
+from src.services.geo import haversine_many, geohash_encode, geohash_cover, parse_coordinates
+from src.services.location_ingest import bulk_update_locations
+from src.services.events import event_hub
+
+MAX_LOCATION_BATCH = 5000
+# Diferença de relógio tolerada em ts no futuro (um ping de 2030 congelaria
+# a posição do motorista, pois todos os pings reais seriam 'stale')
+MAX_LOCATION_CLOCK_SKEW = timedelta(seconds=30)
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/users', methods=['GET'])
 def get_users():
     users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    return jsonify([serialize_user(user) for user in users])
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -38,7 +49,7 @@ def create_user():
         )
         db.session.add(user)
         db.session.commit()
-        return jsonify(user.to_dict()), 201
+        return jsonify(serialize_user(user)), 201
 
     except Exception as e:
         db.session.rollback()
@@ -52,7 +63,7 @@ def get_user(user_id):
         if not user:
             return jsonify({'error': 'Usuário não encontrado'}), 404
 
-        return jsonify(user.to_dict()), 200
+        return jsonify(serialize_user(user)), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -86,7 +97,7 @@ def update_user(user_id):
             user.is_available = data['is_available']
 
         db.session.commit()
-        return jsonify(user.to_dict())
+        return jsonify(serialize_user(user))
 
     except Exception as e:
         db.session.rollback()
@@ -98,30 +109,66 @@ def delete_user(user_id):
         user = User.query.get_or_404(user_id)
         db.session.delete(user)
         db.session.commit()
+
+        ingestor = current_app.extensions.get('location_ingestor')
+        if ingestor:
+            ingestor.forget_user(user_id)
         return '', 204
 
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def publish_location(user_id, latitude, longitude, updated_at):
+    """Publica a nova localização para os clientes SSE que acompanham o usuário"""
+    event_hub.publish(f'user:{user_id}', 'location', {
+        'user_id': user_id,
+        'latitude': latitude,
+        'longitude': longitude,
+        'updated_at': updated_at.isoformat()
+    })
+
 @user_bp.route('/users/<int:user_id>/location', methods=['PUT'])
 def update_user_location(user_id):
     """Atualizar localização do usuário"""
     try:
         data = request.get_json()
 
-        if not all(k in data for k in ('latitude', 'longitude')):
+        if not isinstance(data, dict) or not all(k in data for k in ('latitude', 'longitude')):
             return jsonify({'error': 'Latitude e longitude são obrigatórias'}), 400
+        try:
+            latitude, longitude = parse_coordinates(data['latitude'], data['longitude'])
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Coordenadas inválidas: {e}'}), 400
+
+        ingestor = current_app.extensions.get('location_ingestor')
+        if ingestor:
+            # Caminho rápido: o ping fica em memória e é gravado em lote pelo ingestor
+            if not ingestor.is_known_user(user_id):
+                if db.session.query(User.id).filter_by(id=user_id).first() is None:
+                    return jsonify({'error': 'Usuário não encontrado'}), 404
+                ingestor.mark_known_user(user_id)
+
+            latitude, longitude, updated_at = ingestor.record(user_id, latitude, longitude)
+            publish_location(user_id, latitude, longitude, updated_at)
+            return jsonify({
+                'message': 'Localização atualizada com sucesso',
+                'latitude': latitude,
+                'longitude': longitude,
+                'updated_at': updated_at.isoformat()
+            }), 200
 
         user = User.query.get(user_id)
         if not user:
             return jsonify({'error': 'Usuário não encontrado'}), 404
 
-        user.latitude = data['latitude']
-        user.longitude = data['longitude']
+        user.latitude = latitude
+        user.longitude = longitude
+        user.geohash = geohash_encode(user.latitude, user.longitude)
         user.location_updated_at = datetime.utcnow()
 
         db.session.commit()
+        publish_location(user_id, user.latitude, user.longitude, user.location_updated_at)
 
         return jsonify({
             'message': 'Localização atualizada com sucesso',
@@ -142,6 +189,20 @@ def get_user_location(user_id):
         if not user:
             return jsonify({'error': 'Usuário não encontrado'}), 404
 
+        # Posição em memória, se o usuário enviou pings a este worker e ela é
+        # mais nova que a do banco (com vários workers, os pings enviados aos
+        # outros chegam aqui pelo banco depois do flush deles)
+        ingestor = current_app.extensions.get('location_ingestor')
+        current = ingestor.get(user_id) if ingestor else None
+        if current and (user.location_updated_at is None or current[2] >= user.location_updated_at):
+            latitude, longitude, updated_at = current
+            return jsonify({
+                'user_id': user_id,
+                'latitude': latitude,
+                'longitude': longitude,
+                'updated_at': updated_at.isoformat()
+            }), 200
+
         if not user.latitude or not user.longitude:
             return jsonify({'error': 'Localização não disponível'}), 404
 
@@ -153,4 +214,157 @@ def get_user_location(user_id):
         }), 200
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@user_bp.route('/drivers/nearby', methods=['GET'])
+def get_nearby_drivers():
+    """Listar os motoristas disponíveis mais próximos de um ponto"""
+    try:
+        latitude = request.args.get('lat', type=float)
+        longitude = request.args.get('lng', type=float)
+        radius = request.args.get('radius', default=5000, type=float)
+        limit = request.args.get('limit', default=10, type=int)
+
+        if latitude is None or longitude is None:
+            return jsonify({'error': 'Parâmetros lat e lng são obrigatórios'}), 400
+        try:
+            latitude, longitude = parse_coordinates(latitude, longitude)
+        except ValueError:
+            return jsonify({'error': 'Coordenadas inválidas'}), 400
+        # NaN passaria por comparações como radius <= 0
+        if not math.isfinite(radius) or not 0 < radius <= 50000:
+            return jsonify({'error': 'radius deve estar entre 0 e 50000 metros'}), 400
+        limit = max(1, min(limit, 100))
+
+        # Prefiltro pelo índice (user_type, is_available, geohash): uma busca de
+        # intervalo por célula geohash que cobre o raio, unidas com UNION ALL
+        # para que cada célula use o índice
+        cell_queries = [
+            db.select(User.id, User.latitude, User.longitude)
+            .where(User.user_type == 'driver', User.is_available == True,
+                   User.geohash >= cell, User.geohash < cell + '~')
+            for cell in geohash_cover(latitude, longitude, radius)
+        ]
+        rows = db.session.execute(db.union_all(*cell_queries)).all()
+
+        # Distância exata (vetorizada) e ordenação apenas sobre os candidatos
+        candidates = []
+        if rows:
+            driver_ids, driver_lats, driver_lngs = (np.array(column) for column in zip(*rows))
+            distances = haversine_many(latitude, longitude, driver_lats, driver_lngs)
+            inside = np.flatnonzero(distances <= radius)
+            nearest = inside[np.argsort(distances[inside], kind='stable')[:limit]]
+            candidates = [(float(distances[i]), int(driver_ids[i])) for i in nearest]
+
+        drivers = {user.id: user for user in User.query.filter(User.id.in_([d for _, d in candidates])).all()}
+        return jsonify([
+            {**serialize_user(drivers[driver_id]), 'distance': round(distance, 1)}
+            for distance, driver_id in candidates
+        ]), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def parse_location_timestamp(value):
+    """
+    Converte ts (epoch em segundos ou ISO 8601) em datetime UTC sem fuso
+
+    ts um pouco no futuro (relógio do aparelho adiantado) vira o horário atual,
+    para não marcar como 'stale' os pings seguintes.
+
+    Raises:
+        ValueError: Formato inválido ou ts além de MAX_LOCATION_CLOCK_SKEW no futuro
+    """
+    now = datetime.utcnow()
+    if value is None:
+        return now
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        parsed = datetime.fromtimestamp(value, tz=timezone.utc).replace(tzinfo=None)
+    else:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    if parsed > now + MAX_LOCATION_CLOCK_SKEW:
+        raise ValueError('ts está no futuro')
+    return min(parsed, now)
+
+@user_bp.route('/locations/batch', methods=['POST'])
+def update_locations_batch():
+    """Atualizar a localização de vários usuários em uma única transação"""
+    try:
+        data = request.get_json()
+        items = data.get('locations') if isinstance(data, dict) else data
+
+        if not isinstance(items, list):
+            return jsonify({'error': 'Envie uma lista de {user_id, latitude, longitude, ts}'}), 400
+        if len(items) > MAX_LOCATION_BATCH:
+            return jsonify({'error': f'Máximo de {MAX_LOCATION_BATCH} itens por lote'}), 400
+
+        # Validar itens e manter apenas o ping mais recente de cada usuário
+        results = [None] * len(items)
+        latest = {}
+        for index, item in enumerate(items):
+            try:
+                if not isinstance(item, dict):
+                    raise TypeError('Cada item deve ser um objeto {user_id, latitude, longitude, ts}')
+                user_id = int(item['user_id'])
+                latitude, longitude = parse_coordinates(item['latitude'], item['longitude'])
+                ts = parse_location_timestamp(item.get('ts'))
+            except (KeyError, TypeError, ValueError, OverflowError, OSError) as e:
+                # OverflowError/OSError: epoch fora do intervalo de datetime
+                results[index] = {'user_id': item.get('user_id') if isinstance(item, dict) else None,
+                                  'status': 'invalid', 'error': str(e)}
+                continue
+
+            previous = latest.get(user_id)
+            if previous is not None and previous[3] > ts:
+                results[index] = {'user_id': user_id, 'status': 'stale'}
+                continue
+            if previous is not None:
+                results[previous[0]] = {'user_id': user_id, 'status': 'stale'}
+            latest[user_id] = (index, latitude, longitude, ts)
+
+        # Timestamps atuais em uma única consulta, para descartar pings antigos
+        ingestor = current_app.extensions.get('location_ingestor')
+        current = dict(db.session.query(User.id, User.location_updated_at)
+                       .filter(User.id.in_(list(latest))).all())
+
+        records = {}
+        for user_id, (index, latitude, longitude, ts) in latest.items():
+            if user_id not in current:
+                results[index] = {'user_id': user_id, 'status': 'not_found'}
+                continue
+            known_ts = current[user_id]
+            buffered = ingestor.get(user_id) if ingestor else None
+            if buffered and (known_ts is None or buffered[2] > known_ts):
+                known_ts = buffered[2]
+            if known_ts is not None and known_ts > ts:
+                results[index] = {'user_id': user_id, 'status': 'stale'}
+                continue
+            records[user_id] = (latitude, longitude, ts)
+            results[index] = {'user_id': user_id, 'status': 'updated', 'updated_at': ts.isoformat()}
+
+        bulk_update_locations(db.session.connection(), records)
+        db.session.commit()
+
+        for user_id, record in records.items():
+            if ingestor:
+                ingestor.remember(user_id, record)
+            publish_location(user_id, *record)
+
+        return jsonify({
+            'updated': len(records),
+            'results': results
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@user_bp.route('/locations/stats', methods=['GET'])
+def get_location_stats():
+    """Contadores do buffer de pings de localização"""
+    ingestor = current_app.extensions.get('location_ingestor')
+    if not ingestor:
+        return jsonify({'error': 'Ingestão em lote desativada'}), 404
+    return jsonify(ingestor.stats()), 200
@@ -0,0 +1,321 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.services.cache import normalize_address
+from src.services.geo import haversine_many
+
+# Textos com menos caracteres que isso não são buscados (casariam com quase tudo)
+MIN_QUERY_LENGTH = 2
+# Prefixos com até MAX_SCAN chaves têm todos os lugares ranqueados; acima disso
+# só os PREFIX_CANDIDATES mais frequentes (calculados uma vez e guardados) e,
+# com a posição do usuário, os CELL_CANDIDATES mais frequentes de cada célula
+# de CELL_DEGREES ao redor dele
+MAX_SCAN = 256
+PREFIX_CANDIDATES = 64
+MAX_PREFIX_CACHE = 50000
+CELL_DEGREES = 0.05
+CELL_CANDIDATES = 16
+MAX_CELL_PREFIX_CACHE = 5000
+# Tamanho máximo de cada chave (e do texto buscado)
+MAX_KEY_LENGTH = 64
+# Distância (km) que pesa o mesmo que multiplicar a frequência por e (~2,7)
+PROXIMITY_SCALE_KM = 5.0
+_KEY_END = '\U0010ffff'
+
+# (endereço, latitude, longitude, frequência)
+AutocompleteEntry = Tuple[str, Optional[float], Optional[float], int]
+
+
+def _search_text(text: str) -> str:
+    """Palavras normalizadas (sem acento, minúsculas, sem pontuação) separadas por espaço"""
+    return ' '.join(re.findall(r'\w+', normalize_address(text)))
+
+
+class _Place:
+    __slots__ = ('display_name', 'latitude', 'longitude', 'count')
+
+    def __init__(self, display_name: str, latitude: Optional[float], longitude: Optional[float], count: int):
+        self.display_name = display_name
+        self.latitude = latitude
+        self.longitude = longitude
+        self.count = count
+
+
+class PlaceAutocompleteIndex:
+    """
+    Índice de prefixos em memória para autocompletar endereços
+
+    Cada lugar entra na lista ordenada uma vez por palavra, com o texto
+    normalizado a partir dela ("avenida paulista 1578", "paulista 1578",
+    "1578"), então tanto "aven" quanto "paulista 15" encontram o lugar com
+    dois bisects. Os candidatos são ordenados pela frequência (quantas
+    corridas usaram o endereço) e pela distância até o usuário.
+
+    Em prefixos com muitas chaves, os mais frequentes esconderiam lugares
+    próximos e menos usados; por isso os candidatos incluem também os mais
+    frequentes das células (~5 km) ao redor do usuário.
+
+    Endereços novos (add) vão para uma segunda lista ordenada, pequena,
+    que entra na principal na próxima recarga; inserir na principal
+    moveria milhões de referências a cada corrida.
+    """
+
+    def __init__(self, loader: Optional[Callable[[], Iterable[AutocompleteEntry]]] = None,
+                 refresh_seconds: float = 300):
+        """
+        Args:
+            loader: Função que devolve os endereços conhecidos (executada no
+                contexto da aplicação em ensure_fresh)
+            refresh_seconds: Idade máxima do índice antes de recarregar em
+                background (outros workers também criam corridas)
+        """
+        self.loader = loader
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._keys: List[str] = []
+        self._ids: List[int] = []
+        self._recent_keys: List[str] = []
+        self._recent_ids: List[int] = []
+        self._places: List[_Place] = []
+        self._by_name: Dict[str, int] = {}
+        # Prefixo -> lugares mais frequentes entre as chaves da lista principal
+        self._top: Dict[str, List[int]] = {}
+        # Prefixo -> célula -> lugares mais frequentes da célula
+        self._top_by_cell: Dict[str, Dict[Tuple[int, int], List[int]]] = {}
+        self._refreshing = False
+        # Serializa a primeira carga: requisições simultâneas esperam a mesma
+        self._first_load_lock = threading.Lock()
+        self.loaded_at: Optional[float] = None
+        self.queries = 0
+
+    @staticmethod
+    def _cell(latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / CELL_DEGREES), math.floor(longitude / CELL_DEGREES)
+
+    @staticmethod
+    def _word_keys(text: str) -> List[str]:
+        """Chaves do lugar: o texto a partir de cada palavra"""
+        starts = [0] + [match.end() for match in re.finditer(' ', text)]
+        return [text[start:start + MAX_KEY_LENGTH] for start in starts]
+
+    def load(self, entries: Iterable[AutocompleteEntry]) -> int:
+        """
+        Reconstrói o índice (endereços repetidos somam as frequências)
+
+        Returns:
+            Número de lugares no índice
+        """
+        places: List[_Place] = []
+        by_name: Dict[str, int] = {}
+        for display_name, latitude, longitude, count in entries:
+            text = _search_text(display_name or '')
+            if not text:
+                continue
+            place_id = by_name.get(text)
+            if place_id is None:
+                by_name[text] = len(places)
+                places.append(_Place(display_name, latitude, longitude, count))
+                continue
+            place = places[place_id]
+            place.count += count
+            if place.latitude is None:
+                place.latitude, place.longitude = latitude, longitude
+
+        pairs = sorted((key, place_id) for text, place_id in by_name.items() for key in self._word_keys(text))
+        with self._lock:
+            self._keys = [key for key, _ in pairs]
+            self._ids = [place_id for _, place_id in pairs]
+            self._recent_keys, self._recent_ids = [], []
+            self._places = places
+            self._by_name = by_name
+            self._top = {}
+            self._top_by_cell = {}
+            self.loaded_at = time.time()
+        return len(places)
+
+    def add(self, display_name: str, latitude: Optional[float] = None,
+            longitude: Optional[float] = None, count: int = 1) -> None:
+        """Registra um uso do endereço (ex: origem de uma nova corrida)"""
+        text = _search_text(display_name or '')
+        if not text:
+            return
+        with self._lock:
+            place_id = self._by_name.get(text)
+            if place_id is None:
+                place_id = self._by_name[text] = len(self._places)
+                self._places.append(_Place(display_name, latitude, longitude, count))
+                for key in self._word_keys(text):
+                    position = bisect.bisect_left(self._recent_keys, key)
+                    self._recent_keys.insert(position, key)
+                    self._recent_ids.insert(position, place_id)
+                return
+            place = self._places[place_id]
+            place.count += count
+            if place.latitude is None:
+                place.latitude, place.longitude = latitude, longitude
+            # Manter as listas de mais frequentes dos prefixos do lugar
+            cell = self._cell(place.latitude, place.longitude) if place.latitude is not None else None
+            for key in self._word_keys(text):
+                for length in range(MIN_QUERY_LENGTH, len(key) + 1):
+                    self._promote(self._top.get(key[:length]), place_id)
+                    by_cell = self._top_by_cell.get(key[:length])
+                    if by_cell is not None and cell is not None:
+                        self._promote(by_cell.setdefault(cell, []), place_id, CELL_CANDIDATES)
+
+    def _promote(self, top: Optional[List[int]], place_id: int, size: Optional[int] = None) -> None:
+        """Coloca o lugar na lista de mais frequentes se ele superar o mais fraco (chamar com o lock)"""
+        if top is None or place_id in top:
+            return
+        if size is not None and len(top) < size:
+            top.append(place_id)
+            return
+        weakest = min(top, key=lambda other: self._places[other].count)
+        if self._places[weakest].count < self._places[place_id].count:
+            top[top.index(weakest)] = place_id
+
+    def ensure_fresh(self, app) -> None:
+        """Carrega o índice na primeira consulta e o recarrega em background quando velho"""
+        if self.loader is None:
+            return
+        if self.loaded_at is None:
+            with self._first_load_lock:
+                if self.loaded_at is None:
+                    self._reload(app)
+            return
+        if time.time() - self.loaded_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._reload, args=(app,), name='autocomplete-refresh', daemon=True).start()
+
+    def _reload(self, app) -> None:
+        try:
+            with app.app_context():
+                self.load(self.loader())
+        except Exception as e:
+            print(f"Erro ao carregar o índice de autocompletar: {e}")
+            self.loaded_at = time.time()  # tentar de novo só no próximo intervalo
+        finally:
+            self._refreshing = False
+
+    def _cell_tops(self, prefix: str, start: int, end: int) -> Dict[Tuple[int, int], List[int]]:
+        """Mais frequentes de cada célula entre as chaves [start, end) do prefixo (chamar com o lock)"""
+        by_cell = self._top_by_cell.get(prefix)
+        if by_cell is None:
+            if len(self._top_by_cell) >= MAX_CELL_PREFIX_CACHE:
+                self._top_by_cell.clear()
+            places = self._places
+            grouped: Dict[Tuple[int, int], List[int]] = {}
+            for place_id in set(self._ids[start:end]):
+                place = places[place_id]
+                if place.latitude is not None:
+                    grouped.setdefault(self._cell(place.latitude, place.longitude), []).append(place_id)
+            by_cell = self._top_by_cell[prefix] = {
+                cell: heapq.nlargest(CELL_CANDIDATES, ids, key=lambda place_id: places[place_id].count)
+                for cell, ids in grouped.items()
+            }
+        return by_cell
+
+    def _candidates(self, prefix: str, cell: Optional[Tuple[int, int]] = None) -> List[int]:
+        """
+        Lugares com alguma chave começando com prefix (chamar com o lock)
+
+        Args:
+            cell: Célula do usuário; em prefixos grandes inclui os mais
+                frequentes dela e das vizinhas
+        """
+        start = bisect.bisect_left(self._keys, prefix)
+        end = bisect.bisect_left(self._keys, prefix + _KEY_END, start)
+        if end - start <= MAX_SCAN:
+            found = set(self._ids[start:end])
+        else:
+            found = self._top.get(prefix)
+            if found is None:
+                if len(self._top) >= MAX_PREFIX_CACHE:
+                    self._top.clear()
+                places = self._places
+                found = self._top[prefix] = heapq.nlargest(
+                    PREFIX_CANDIDATES, set(self._ids[start:end]), key=lambda place_id: places[place_id].count)
+            found = set(found)
+            if cell is not None:
+                by_cell = self._cell_tops(prefix, start, end)
+                row, col = cell
+                for d_row in (-1, 0, 1):
+                    for d_col in (-1, 0, 1):
+                        found.update(by_cell.get((row + d_row, col + d_col), ()))
+        start = bisect.bisect_left(self._recent_keys, prefix)
+        end = bisect.bisect_left(self._recent_keys, prefix + _KEY_END, start)
+        found.update(self._recent_ids[start:min(end, start + MAX_SCAN)])
+        return list(found)
+
+    def search(self, query: str, latitude: Optional[float] = None,
+               longitude: Optional[float] = None, limit: int = 8) -> List[Dict]:
+        """
+        Sugestões para o texto digitado
+
+        Args:
+            query: Texto digitado (prefixo de qualquer palavra do endereço)
+            latitude: Latitude do usuário (opcional, para priorizar lugares
+                próximos; validada pelo chamador, ver parse_coordinates)
+            longitude: Longitude do usuário
+            limit: Máximo de sugestões
+
+        Returns:
+            Lugares com display_name, latitude, longitude, count e, com a
+            posição do usuário, distance (metros)
+        """
+        prefix = _search_text(query)[:MAX_KEY_LENGTH]
+        if len(prefix) < MIN_QUERY_LENGTH:
+            return []
+        located_user = latitude is not None and longitude is not None
+        cell = self._cell(latitude, longitude) if located_user else None
+        with self._lock:
+            self.queries += 1
+            places = [self._places[place_id] for place_id in self._candidates(prefix, cell)]
+
+        distances = [None] * len(places)
+        located = [i for i, place in enumerate(places) if place.latitude is not None]
+        if not located_user or not located:
+            # Sem posição o log da frequência ordena igual à própria frequência
+            best = sorted(range(len(places)), key=lambda i: (-places[i].count, places[i].display_name))[:limit]
+        else:
+            scores = [math.log1p(place.count) for place in places]
+            meters = haversine_many(latitude, longitude, [places[i].latitude for i in located],
+                                    [places[i].longitude for i in located])
+            for i, distance in zip(located, meters.tolist()):
+                distances[i] = distance
+                scores[i] -= distance / 1000 / PROXIMITY_SCALE_KM
+            # Lugares sem coordenadas não têm como ser próximos: vêm depois dos localizados
+            best = sorted(range(len(places)),
+                          key=lambda i: (distances[i] is None, -scores[i], places[i].display_name))[:limit]
+
+        results = []
+        for i in best:
+            place = places[i]
+            result = {
+                'display_name': place.display_name,
+                'latitude': place.latitude,
+                'longitude': place.longitude,
+                'count': place.count
+            }
+            if distances[i] is not None:
+                result['distance'] = round(distances[i], 1)
+            results.append(result)
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            'places': len(self._places),
+            'keys': len(self._keys) + len(self._recent_keys),
+            'cached_prefixes': len(self._top),
+            'cached_cell_prefixes': len(self._top_by_cell),
+            'queries': self.queries,
+            'loaded_at': self.loaded_at
+        }
@@ -0,0 +1,340 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_MISSING = object()
+
+
+def normalize_address(address: str) -> str:
+    """
+    Normaliza texto de endereço para uso como chave de cache
+
+    Remove acentos, ignora maiúsculas/minúsculas e colapsa espaços, de forma que
+    "Aeroporto  de Guarulhos" e "aeroporto de guarulhos" compartilhem a mesma chave.
+
+    Args:
+        address: Endereço digitado pelo usuário
+
+    Returns:
+        Endereço normalizado
+    """
+    text = unicodedata.normalize('NFKD', address)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = text.casefold()
+    text = re.sub(r'\s*,\s*', ', ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip(' ,')
+
+
+def grid_cell_key(latitude: float, longitude: float, cell_size_m: float = 30) -> str:
+    """
+    Quantiza coordenadas em uma célula de grade de tamanho aproximadamente fixo
+
+    Leituras de GPS a poucos metros de distância caem na mesma célula e
+    compartilham a mesma chave de cache.
+
+    Args:
+        latitude: Latitude
+        longitude: Longitude
+        cell_size_m: Lado da célula em metros
+
+    Returns:
+        Chave da célula (ex: "30:-78123:-155210")
+    """
+    lat_step = cell_size_m / 111320
+    row = math.floor(latitude / lat_step)
+    # Largura da célula em longitude usa a latitude central da linha, para que
+    # todos os pontos da mesma linha usem o mesmo passo
+    row_lat = (row + 0.5) * lat_step
+    lng_step = cell_size_m / (111320 * max(math.cos(math.radians(row_lat)), 1e-6))
+    col = math.floor(longitude / lng_step)
+    return f"{cell_size_m:g}:{row}:{col}"
+
+
+def approximate_size(key: str, value: Any) -> int:
+    """Estimativa barata do tamanho em bytes de uma entrada de cache"""
+    return len(key) + len(json.dumps(value, default=str))
+
+
+class TTLCache:
+    """Cache LRU em memória com expiração por TTL (thread-safe)"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600,
+                 max_bytes: Optional[int] = None):
+        """
+        Args:
+            max_entries: Número máximo de entradas antes de descartar a menos usada
+            ttl: Tempo de vida de cada entrada em segundos
+            max_bytes: Limite aproximado de memória (ver approximate_size)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._data: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at, size = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: str, default: Any = None) -> Any:
+        """Como get, mas sem contar hit/miss nem alterar a ordem LRU"""
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            return default
+        return entry[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        size = approximate_size(key, value) if self.max_bytes is not None else 0
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            self._data[key] = (value, expires_at, size)
+            self.bytes += size
+            while len(self._data) > self.max_entries or (
+                    self.max_bytes is not None and self.bytes > self.max_bytes and len(self._data) > 1):
+                _, evicted = self._data.popitem(last=False)
+                self.bytes -= evicted[2]
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._data),
+            'max_entries': self.max_entries,
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_ratio': self.hits / total if total else 0.0
+        }
+
+
+class SQLiteCacheStore:
+    """Armazenamento persistente de cache em uma tabela SQLite"""
+
+    def __init__(self, path: str, table: str = 'cache_entries'):
+        """
+        Args:
+            path: Caminho do arquivo SQLite
+            table: Nome da tabela usada para as entradas
+        """
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {table} ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT value, expires_at FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return _MISSING
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), time.time() + ttl)
+            )
+            self._conn.commit()
+
+    def items(self, prefix: str = '') -> List[Tuple[str, Any]]:
+        """Entradas não expiradas cujas chaves começam com prefix"""
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT key, value FROM {self.table} WHERE key >= ? AND key < ? AND expires_at >= ?',
+                (prefix, prefix + '\U0010ffff', time.time())
+            ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                f'DELETE FROM {self.table} WHERE expires_at < ?', (time.time(),)
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+
+class _Flight:
+    """Carga em andamento de uma chave (single-flight)"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class TwoTierCache:
+    """
+    Cache em dois níveis: LRU em memória (L1) na frente de uma tabela SQLite (L2)
+
+    Entradas encontradas apenas no L2 são promovidas ao L1, então um worker
+    reiniciado volta a responder da memória após o primeiro acesso.
+    Chamadas simultâneas de get_or_load para a mesma chave compartilham uma
+    única execução do loader (single-flight).
+    """
+
+    def __init__(self, memory: Optional[TTLCache] = None,
+                 store: Optional[SQLiteCacheStore] = None,
+                 store_ttl: float = 30 * 24 * 3600):
+        """
+        Args:
+            memory: Cache em memória (padrão: TTLCache com 1024 entradas)
+            store: Armazenamento persistente opcional
+            store_ttl: Tempo de vida das entradas persistidas em segundos
+        """
+        self.memory = memory if memory is not None else TTLCache()
+        self.store = store
+        self.store_ttl = store_ttl
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _Flight] = {}
+        self.store_hits = 0
+        self.loads = 0
+        self.load_time = 0.0
+        self.coalesced = 0
+
+    def get(self, key: str) -> Any:
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING or self.store is None:
+            return value
+
+        value = self.store.get(key)
+        if value is not _MISSING:
+            with self._lock:
+                self.store_hits += 1
+            self.memory.set(key, value)
+        return value
+
+    def _peek(self, key: str) -> Any:
+        value = self.memory.peek(key, _MISSING)
+        if value is _MISSING and self.store is not None:
+            value = self.store.get(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.store is not None:
+            try:
+                self.store.set(key, value, self.store_ttl)
+            except sqlite3.Error as e:
+                print(f"Erro ao persistir cache: {e}")
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        Retorna o valor em cache ou executa o loader e armazena o resultado
+
+        Resultados None não são armazenados, pois indicam tanto "não encontrado"
+        quanto falhas de rede temporárias. Se a chave já está sendo carregada
+        por outra thread, espera e devolve o mesmo resultado (ou exceção).
+        """
+        value = self.get(key)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            # A carga anterior pode ter terminado entre o get acima e o lock: o
+            # líder grava o valor antes de liberar a chave. A releitura não entra
+            # nas estatísticas, pois esta consulta já contou como miss
+            value = self._peek(key)
+            if value is not _MISSING:
+                flight.value = value
+                return value
+
+            started = time.perf_counter()
+            value = loader()
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.loads += 1
+                self.load_time += elapsed
+
+            if value is not None:
+                self.set(key, value)
+            flight.value = value
+            return value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def stats(self) -> Dict:
+        stats = self.memory.stats()
+        hits = stats['hits'] + self.store_hits
+        total = stats['hits'] + stats['misses']
+        avg_load = self.load_time / self.loads if self.loads else 0.0
+        stats.update({
+            'memory_hits': stats['hits'],
+            'store_hits': self.store_hits,
+            'hits': hits,
+            'misses': total - hits,
+            'hit_ratio': hits / total if total else 0.0,
+            'persistent': self.store is not None,
+            'coalesced': self.coalesced,
+            'avg_load_seconds': avg_load,
+            'estimated_saved_seconds': hits * avg_load
+        })
+        return stats
@@ -0,0 +1,558 @@
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava de arquivo, sem verificação entre processos
+    fcntl = None
+
+from src.models.user import db, User
+from src.models.ride import Ride
+from src.services.geo import haversine_distance, haversine_pairwise, METERS_PER_DEGREE
+from src.services.events import event_hub, ride_offer, publish_ride_offer
+
+# Custo usado para pares motorista/corrida fora do alcance (finito para o
+# algoritmo húngaro, que não lida com infinito)
+UNREACHABLE = 1e9
+
+# Ponto (latitude, longitude)
+Point = Tuple[float, float]
+
+
+def hungarian(cost: Sequence[Sequence[float]]) -> List[Tuple[int, int]]:
+    """
+    Atribuição de custo mínimo (algoritmo húngaro, O(n² m))
+
+    Aceita matrizes retangulares; cada linha e cada coluna aparece no máximo
+    uma vez no resultado.
+
+    Args:
+        cost: Matriz de custos [linha][coluna]
+
+    Returns:
+        Lista de pares (linha, coluna)
+    """
+    rows = len(cost)
+    cols = len(cost[0]) if rows else 0
+    if not rows or not cols:
+        return []
+    transposed = rows > cols
+    if transposed:
+        cost = [list(column) for column in zip(*cost)]
+        rows, cols = cols, rows
+
+    # Potenciais u/v e p[j] = linha atribuída à coluna j (índices a partir de 1)
+    u = [0.0] * (rows + 1)
+    v = [0.0] * (cols + 1)
+    p = [0] * (cols + 1)
+    way = [0] * (cols + 1)
+    for i in range(1, rows + 1):
+        p[0] = i
+        j0 = 0
+        minv = [math.inf] * (cols + 1)
+        used = [False] * (cols + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = cost[i0 - 1]
+            ui0 = u[i0]
+            delta = math.inf
+            j1 = 0
+            for j in range(1, cols + 1):
+                if not used[j]:
+                    current = row[j - 1] - ui0 - v[j]
+                    if current < minv[j]:
+                        minv[j] = current
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(cols + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    pairs = [(p[j] - 1, j - 1) for j in range(1, cols + 1) if p[j]]
+    if transposed:
+        pairs = [(col, row) for row, col in pairs]
+    return sorted(pairs)
+
+
+def greedy_assignment(edges: List[Tuple[float, int, int]]) -> List[Tuple[int, int]]:
+    """
+    Atribuição gulosa: pares mais baratos primeiro
+
+    Args:
+        edges: Arestas (custo, linha, coluna)
+
+    Returns:
+        Lista de pares (linha, coluna)
+    """
+    used_rows = set()
+    used_cols = set()
+    pairs = []
+    for _, row, col in sorted(edges):
+        if row not in used_rows and col not in used_cols:
+            used_rows.add(row)
+            used_cols.add(col)
+            pairs.append((row, col))
+    return pairs
+
+
+class DriverGrid:
+    """
+    Grade lat/lng em memória com as posições dos motoristas de um lote
+
+    A busca percorre anéis de células a partir da célula do ponto e para
+    assim que os k mais próximos estão garantidos (todos dentro da distância
+    já coberta pelos anéis), então o custo depende da densidade local e não
+    do raio máximo.
+    """
+
+    def __init__(self, drivers: Sequence[Point], cell_size_m: float = 300):
+        self.drivers = drivers
+        self.cell_size_m = cell_size_m
+        self.cell_lat = cell_size_m / METERS_PER_DEGREE
+        max_abs_lat = max((abs(lat) for lat, _ in drivers), default=0.0)
+        # Células largas o bastante em longitude na latitude mais alta do lote
+        self.cell_lng = self.cell_lat / max(math.cos(math.radians(min(max_abs_lat, 89.0))), 1e-6)
+        self.cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for index, (lat, lng) in enumerate(drivers):
+            self.cells[self._cell(lat, lng)].append(index)
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / self.cell_lat), math.floor(longitude / self.cell_lng)
+
+    def _ring(self, row: int, col: int, ring: int):
+        if ring == 0:
+            yield row, col
+            return
+        for dc in range(-ring, ring + 1):
+            yield row - ring, col + dc
+            yield row + ring, col + dc
+        for dr in range(-ring + 1, ring):
+            yield row + dr, col - ring
+            yield row + dr, col + ring
+
+    def nearest(self, latitude: float, longitude: float, k: int, max_distance_m: float,
+                excluded: Iterable[int] = ()) -> List[Tuple[float, int]]:
+        """
+        Os k motoristas mais próximos dentro de max_distance_m
+
+        Returns:
+            Lista de (distância em metros, índice do motorista), crescente
+        """
+        row, col = self._cell(latitude, longitude)
+        max_ring = math.ceil(max_distance_m / self.cell_size_m)
+        # Triagem com a aproximação equirretangular (erro desprezível na escala
+        # de uma cidade); haversine só para os k escolhidos
+        lng_scale = math.cos(math.radians(latitude))
+        max_squared = (max_distance_m / METERS_PER_DEGREE) ** 2
+        found = []
+        for ring in range(max_ring + 1):
+            for cell in self._ring(row, col, ring):
+                for index in self.cells.get(cell, ()):
+                    lat, lng = self.drivers[index]
+                    squared = (lat - latitude) ** 2 + ((lng - longitude) * lng_scale) ** 2
+                    if squared <= max_squared and index not in excluded:
+                        found.append((squared, index))
+            # Os anéis 0..ring cobrem pelo menos ring * cell_size_m ao redor do ponto
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= (ring * self.cell_lat) ** 2:
+                    break
+        else:
+            found.sort()
+        nearest = []
+        for _, index in found[:k]:
+            distance = haversine_distance(latitude, longitude, *self.drivers[index])
+            if distance <= max_distance_m:
+                nearest.append((distance, index))
+        return sorted(nearest)
+
+
+class DispatchEngine:
+    """
+    Despacho automático de corridas para motoristas próximos
+
+    A cada janela (window_seconds) o engine junta as corridas 'requested'
+    ainda sem oferta e os motoristas disponíveis e livres, calcula o tempo
+    estimado de cada motorista até cada embarque e resolve a atribuição:
+    algoritmo húngaro para lotes pequenos (ótimo global) e guloso sobre os k
+    motoristas mais próximos de cada corrida para lotes grandes. Cada
+    motorista escolhido recebe uma oferta no tópico user:<id> (entregue
+    pelo gateway WebSocket); o aceite continua sendo o POST /accept atômico.
+
+    Ofertas não aceitas em offer_ttl segundos (ou recusadas) voltam para o
+    lote e o motorista não recebe a mesma corrida de novo. Depois de
+    broadcast_after_rounds ofertas sem aceite a corrida também é anunciada
+    para todos os motoristas disponíveis.
+
+    O estado das ofertas fica em memória neste worker e as ofertas saem pelo
+    EventHub do processo, que só alcança os motoristas conectados a ele: com
+    vários workers o engine não funciona. Com lock_path cada processo segura
+    uma trava compartilhada (lockf) no arquivo e só roda os lotes enquanto
+    consegue promovê-la a exclusiva, isto é, enquanto é o único processo com
+    o engine; havendo outros, nenhum roda e announce_ride volta a anunciar
+    as corridas a todos os motoristas.
+    """
+
+    def __init__(self, app, routing_service=None, window_seconds: float = 2.0,
+                 max_pickup_m: float = 5000, speed_mps: float = 8.3, detour_factor: float = 1.3,
+                 candidates_per_ride: int = 8, hungarian_max_size: int = 150,
+                 offer_ttl: float = 15.0,
+                 broadcast_after_rounds: int = 3, max_batch: int = 10000,
+                 lock_path: Optional[str] = None):
+        """
+        Args:
+            app: Aplicação Flask (para abrir o contexto do banco)
+            routing_service: OSRMRoutingService para tempos reais por estrada;
+                None usa apenas a estimativa por distância em linha reta
+            window_seconds: Janela de coleta de pedidos entre dois lotes
+            max_pickup_m: Distância máxima em linha reta até o embarque
+            speed_mps: Velocidade média usada na estimativa (8.3 m/s ≈ 30 km/h)
+            detour_factor: Razão média entre distância por estrada e em linha reta
+            candidates_per_ride: Motoristas considerados por corrida no modo guloso
+            hungarian_max_size: Maior dimensão do lote resolvida com o algoritmo húngaro
+            offer_ttl: Segundos para o motorista aceitar antes da oferta expirar
+            broadcast_after_rounds: Ofertas sem aceite antes de anunciar a todos
+            max_batch: Corridas consideradas por lote
+            lock_path: Arquivo de trava usado para detectar outros processos
+                com o engine; com mais de um, nenhum roda os lotes (None: não
+                verifica)
+        """
+        self.app = app
+        self.routing_service = routing_service
+        self.window_seconds = window_seconds
+        self.max_pickup_m = max_pickup_m
+        self.speed_mps = speed_mps
+        self.detour_factor = detour_factor
+        self.candidates_per_ride = candidates_per_ride
+        self.hungarian_max_size = hungarian_max_size
+        self.offer_ttl = offer_ttl
+        self.broadcast_after_rounds = broadcast_after_rounds
+        self.max_batch = max_batch
+        self.lock_path = lock_path if fcntl is not None else None
+        self._lock_fd: Optional[int] = None
+        self._lock_fd_lock = threading.Lock()
+        self._active = False
+        self._lock = threading.Lock()
+        # ride_id -> (driver_id, expira_em, eta)
+        self._offers: Dict[int, Tuple[int, float, float]] = {}
+        self._declined: Dict[int, Set[int]] = defaultdict(set)
+        self._rounds: Dict[int, int] = defaultdict(int)
+        self._broadcast: Set[int] = set()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.cycles = 0
+        self.offers_sent = 0
+        self.offers_expired = 0
+        self.eta_total = 0.0
+        self.last_batch: Dict = {}
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        if self.lock_path is not None and self._lock_fd is None:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.lockf(fd, fcntl.LOCK_SH)
+            self._lock_fd = fd
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='dispatch-engine', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        with self._lock_fd_lock:
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)  # fechar o descritor libera a trava
+                self._lock_fd = None
+
+    def is_active(self) -> bool:
+        """
+        True se o engine está rodando e é o único processo com o engine
+
+        A trava compartilhada só pode ser promovida a exclusiva quando nenhum
+        outro processo a segura; em seguida ela volta a ser compartilhada.
+        """
+        if not (self._thread and self._thread.is_alive()):
+            return False
+        if self.lock_path is None:
+            return True
+        with self._lock_fd_lock:
+            if self._lock_fd is None:
+                return False
+            try:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_SH)
+            return True
+
+    def _deactivate(self) -> None:
+        """Outro processo iniciou o engine: descarta as ofertas e anuncia as corridas a todos"""
+        with self._lock:
+            self._offers.clear()
+            self._declined.clear()
+            self._rounds.clear()
+            self._broadcast.clear()
+        print("Despacho automático pausado: há mais de um processo com DISPATCH_ENGINE=1")
+        with self.app.app_context():
+            try:
+                rides = (Ride.query.filter(Ride.status == 'requested', Ride.driver_id.is_(None))
+                         .order_by(Ride.created_at).limit(self.max_batch).all())
+                for ride in rides:
+                    publish_ride_offer(ride)
+            finally:
+                db.session.remove()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            # Janela de coleta; recusas acordam o engine antes do fim
+            self._wakeup.wait(self.window_seconds)
+            self._wakeup.clear()
+            if self._stopping.is_set():
+                break
+            try:
+                active = self.is_active()
+                was_active, self._active = self._active, active
+                if active:
+                    self.run_once()
+                elif was_active:
+                    self._deactivate()
+            except Exception as e:
+                print(f"Erro no despacho de corridas: {e}")
+
+    def estimate_eta(self, driver: Point, pickup: Point) -> float:
+        """Tempo estimado até o embarque, em segundos, pela distância em linha reta"""
+        return haversine_distance(driver[0], driver[1], pickup[0], pickup[1]) * self.detour_factor / self.speed_mps
+
+    def _osrm_costs(self, drivers: Sequence[Point], pickups: Sequence[Point]) -> Optional[np.ndarray]:
+        """Matriz motorista x embarque com durações por estrada (None sem OSRM)"""
+        if self.routing_service is None:
+            return None
+        matrix = self.routing_service.calculate_eta_matrix([(lng, lat) for lat, lng in drivers],
+                                                           [(lng, lat) for lat, lng in pickups])
+        return matrix['durations']
+
+    def match(self, pickups: Sequence[Point], drivers: Sequence[Point],
+              excluded: Optional[Dict[int, Set[int]]] = None) -> List[Tuple[int, int, float]]:
+        """
+        Escolhe um motorista para cada embarque
+
+        Args:
+            pickups: Pontos de embarque
+            drivers: Posições dos motoristas livres
+            excluded: Índices de motoristas proibidos por índice de embarque
+
+        Returns:
+            Lista de (índice do embarque, índice do motorista, eta em segundos)
+        """
+        if not pickups or not drivers:
+            return []
+        excluded = excluded or {}
+        grid = DriverGrid(drivers)
+
+        # Candidatos: os k motoristas mais próximos de cada embarque, dentro do raio
+        candidates: Dict[int, List[Tuple[float, int]]] = {}
+        for ride_index, pickup in enumerate(pickups):
+            nearby = grid.nearest(pickup[0], pickup[1], self.candidates_per_ride, self.max_pickup_m,
+                                  excluded.get(ride_index, ()))
+            if nearby:
+                candidates[ride_index] = [(distance * self.detour_factor / self.speed_mps, driver_index)
+                                          for distance, driver_index in nearby]
+        if not candidates:
+            return []
+
+        ride_indexes = sorted(candidates)
+        driver_indexes = sorted({driver_index for nearby in candidates.values() for _, driver_index in nearby})
+        if max(len(ride_indexes), len(driver_indexes)) > self.hungarian_max_size:
+            edges = [(eta, ride_index, driver_index)
+                     for ride_index, nearby in candidates.items() for eta, driver_index in nearby]
+            etas = {(ride_index, driver_index): eta for eta, ride_index, driver_index in edges}
+            assignment = [(ride_index, driver_index, etas[ride_index, driver_index])
+                          for ride_index, driver_index in greedy_assignment(edges)]
+
+            # Segunda rodada para as corridas cujos k candidatos foram todos
+            # escolhidos por outras, com os motoristas que sobraram
+            taken = {driver_index for _, driver_index, _ in assignment}
+            matched = {ride_index for ride_index, _, _ in assignment}
+            edges = []
+            for ride_index in ride_indexes:
+                if ride_index in matched:
+                    continue
+                pickup = pickups[ride_index]
+                nearby = grid.nearest(pickup[0], pickup[1], self.candidates_per_ride, self.max_pickup_m,
+                                      taken | set(excluded.get(ride_index, ())))
+                edges.extend((distance * self.detour_factor / self.speed_mps, ride_index, driver_index)
+                             for distance, driver_index in nearby)
+            etas = {(ride_index, driver_index): eta for eta, ride_index, driver_index in edges}
+            assignment.extend((ride_index, driver_index, etas[ride_index, driver_index])
+                              for ride_index, driver_index in greedy_assignment(edges))
+            return assignment
+
+        # Lote pequeno: matriz completa entre os candidatos (tempos do OSRM
+        # quando disponível) e atribuição ótima
+        driver_points = np.array([drivers[d] for d in driver_indexes], dtype=float)
+        pickup_points = np.array([pickups[r] for r in ride_indexes], dtype=float)
+        distances = haversine_pairwise(driver_points[:, :1], driver_points[:, 1:],
+                                       pickup_points[:, 0], pickup_points[:, 1])
+        costs = self._osrm_costs([drivers[d] for d in driver_indexes], [pickups[r] for r in ride_indexes])
+        if costs is None:
+            costs = distances * self.detour_factor / self.speed_mps
+        costs[distances > self.max_pickup_m] = UNREACHABLE
+        column = {ride_index: col for col, ride_index in enumerate(ride_indexes)}
+        row = {driver_index: r for r, driver_index in enumerate(driver_indexes)}
+        for ride_index, banned in excluded.items():
+            for driver_index in banned:
+                if ride_index in column and driver_index in row:
+                    costs[row[driver_index], column[ride_index]] = UNREACHABLE
+        return [(ride_indexes[c], driver_indexes[r], float(costs[r, c]))
+                for r, c in hungarian(costs.tolist()) if costs[r, c] < UNREACHABLE]
+
+    def decline(self, ride_id: int, driver_id: int) -> bool:
+        """Motorista recusou a oferta; a corrida volta para o próximo lote"""
+        with self._lock:
+            offer = self._offers.get(ride_id)
+            if not offer or offer[0] != driver_id:
+                return False
+            self._release(ride_id, driver_id)
+        self._wakeup.set()
+        return True
+
+    def _release(self, ride_id: int, driver_id: int) -> None:
+        self._offers.pop(ride_id, None)
+        self._declined[ride_id].add(driver_id)
+        self._rounds[ride_id] += 1
+        event_hub.publish(f'user:{driver_id}', 'taken', {'t': 'taken', 'id': ride_id})
+
+    def _forget(self, ride_id: int) -> None:
+        self._offers.pop(ride_id, None)
+        self._declined.pop(ride_id, None)
+        self._rounds.pop(ride_id, None)
+        self._broadcast.discard(ride_id)
+
+    def _driver_positions(self) -> Dict[int, Point]:
+        """Motoristas disponíveis com posição conhecida, sem corrida em andamento"""
+        busy = {driver_id for (driver_id,) in db.session.query(Ride.driver_id)
+                .filter(Ride.status.in_(('accepted', 'in_progress')), Ride.driver_id.isnot(None))}
+        rows = (db.session.query(User.id, User.latitude, User.longitude)
+                .filter(User.user_type == 'driver', User.is_available == True,
+                        User.latitude.isnot(None), User.longitude.isnot(None)))
+        ingestor = self.app.extensions.get('location_ingestor')
+        positions = {}
+        for driver_id, latitude, longitude in rows:
+            if driver_id in busy:
+                continue
+            latest = ingestor.get(driver_id) if ingestor else None
+            positions[driver_id] = (latest[0], latest[1]) if latest else (latitude, longitude)
+        return positions
+
+    def run_once(self) -> int:
+        """
+        Executa um lote de despacho
+
+        Returns:
+            Número de ofertas enviadas
+        """
+        with self.app.app_context():
+            try:
+                started = time.perf_counter()
+                now = time.monotonic()
+                rides = (Ride.query
+                         .filter(Ride.status == 'requested', Ride.driver_id.is_(None),
+                                 Ride.origin_lat.isnot(None), Ride.origin_lng.isnot(None))
+                         .order_by(Ride.created_at)
+                         .limit(self.max_batch)
+                         .all())
+                open_ids = {ride.id for ride in rides}
+
+                to_broadcast = []
+                with self._lock:
+                    # Corridas aceitas/canceladas ou ofertas vencidas
+                    for ride_id in list(self._offers):
+                        driver_id, expires_at, _ = self._offers[ride_id]
+                        if ride_id not in open_ids:
+                            self._forget(ride_id)
+                        elif expires_at <= now:
+                            self._release(ride_id, driver_id)
+                            self.offers_expired += 1
+                    for ride_id in list(self._rounds):
+                        if ride_id not in open_ids:
+                            self._forget(ride_id)
+                    offered_drivers = {offer[0] for offer in self._offers.values()}
+                    pending = [ride for ride in rides if ride.id not in self._offers]
+                    for ride in pending:
+                        if (self._rounds.get(ride.id, 0) >= self.broadcast_after_rounds
+                                and ride.id not in self._broadcast):
+                            self._broadcast.add(ride.id)
+                            to_broadcast.append(ride)
+                    declined = {ride.id: set(self._declined.get(ride.id, ())) for ride in pending}
+
+                for ride in to_broadcast:
+                    publish_ride_offer(ride)
+
+                positions = {driver_id: point for driver_id, point in self._driver_positions().items()
+                             if driver_id not in offered_drivers}
+                driver_ids = list(positions)
+                driver_index = {driver_id: index for index, driver_id in enumerate(driver_ids)}
+                excluded = {
+                    ride_index: {driver_index[d] for d in declined[ride.id] if d in driver_index}
+                    for ride_index, ride in enumerate(pending) if declined[ride.id]
+                }
+                assignment = self.match([(ride.origin_lat, ride.origin_lng) for ride in pending],
+                                        [positions[driver_id] for driver_id in driver_ids], excluded)
+
+                expires_at = time.monotonic() + self.offer_ttl
+                for ride_index, index, eta in assignment:
+                    ride = pending[ride_index]
+                    driver_id = driver_ids[index]
+                    with self._lock:
+                        self._offers[ride.id] = (driver_id, expires_at, eta)
+                    event_hub.publish(f'user:{driver_id}', 'offer',
+                                      {**ride_offer(ride), 'eta': round(eta), 'ttl': self.offer_ttl})
+
+                self.cycles += 1
+                self.offers_sent += len(assignment)
+                self.eta_total += sum(eta for _, _, eta in assignment)
+                self.last_batch = {
+                    'rides': len(pending),
+                    'drivers': len(driver_ids),
+                    'offers': len(assignment),
+                    'match_ms': round((time.perf_counter() - started) * 1000, 1)
+                }
+                return len(assignment)
+            finally:
+                db.session.remove()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            outstanding = len(self._offers)
+        return {
+            'active': self._active,
+            'cycles': self.cycles,
+            'offers_sent': self.offers_sent,
+            'offers_expired': self.offers_expired,
+            'outstanding_offers': outstanding,
+            'avg_pickup_eta_seconds': round(self.eta_total / self.offers_sent, 1) if self.offers_sent else None,
+            'last_batch': self.last_batch
+        }
@@ -0,0 +1,213 @@
+import itertools
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+
+class Subscription:
+    """Fila de eventos de um cliente inscrito em um ou mais tópicos"""
+
+    def __init__(self, hub: 'EventHub', topics: Iterable[str], max_queue: int = 256):
+        self.hub = hub
+        self.topics = set(topics)
+        self.queue: 'queue.Queue[Dict]' = queue.Queue(maxsize=max_queue)
+        # Eventos descartados porque o cliente não consumiu a fila a tempo
+        self.lagged = False
+
+    def deliver(self, event: Dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.lagged = True
+
+    def get(self, timeout: float) -> Optional[Dict]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def add_topic(self, topic: str) -> None:
+        self.hub.add_topic(self, topic)
+
+    def remove_topic(self, topic: str) -> None:
+        self.hub.remove_topic(self, topic)
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    """
+    Pub/sub em processo para eventos de corridas (status, mensagens, localização)
+
+    Cada tópico guarda os últimos eventos publicados para que clientes que
+    reconectam com Last-Event-ID recebam o que perderam. Os ids são
+    crescentes dentro do processo e vão para o cliente prefixados pela época
+    do hub (ex: "3f9a1c2e-42"), sorteada a cada inicialização: com vários
+    workers, ou depois de um restart, o id recebido é de outra época e o
+    cliente deve recarregar o estado pela API REST (ver parse_event_id).
+
+    O histórico de um tópico sem inscritos é descartado history_ttl segundos
+    depois do último inscrito sair (ou do primeiro evento, se nunca teve).
+    """
+
+    def __init__(self, history_size: int = 200, history_ttl: float = 300,
+                 sweep_interval: float = 60):
+        """
+        Args:
+            history_size: Eventos mantidos por tópico para replay
+            history_ttl: Segundos que o histórico de um tópico sem inscritos é mantido
+            sweep_interval: Intervalo mínimo entre duas limpezas de tópicos ociosos
+        """
+        self.history_size = history_size
+        self.history_ttl = history_ttl
+        self.sweep_interval = sweep_interval
+        self.epoch = uuid.uuid4().hex[:8]
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, set] = {}
+        self._history: Dict[str, deque] = {}
+        # Tópico com histórico e sem inscritos -> desde quando (monotonic)
+        self._idle_since: Dict[str, float] = {}
+        self._next_sweep = time.monotonic() + sweep_interval
+        self.topics_evicted = 0
+
+    def format_event_id(self, event_id: int) -> str:
+        """Id do evento como enviado ao cliente (época-sequência)"""
+        return f'{self.epoch}-{event_id}'
+
+    def parse_event_id(self, text: str) -> Optional[int]:
+        """
+        Sequência de um id recebido do cliente (Last-Event-ID)
+
+        Returns:
+            Sequência, ou None se o id é inválido ou de outra época (outro
+            worker ou antes de um restart): os eventos perdidos não podem ser
+            recuperados deste hub
+        """
+        epoch, _, sequence = text.partition('-')
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def last_id(self) -> int:
+        """Sequência do último evento publicado"""
+        with self._lock:
+            return self._last_id
+
+    def publish(self, topic: str, event_type: str, data: Dict) -> Dict:
+        """
+        Publica um evento para todos os inscritos no tópico
+
+        Args:
+            topic: Tópico (ex: "ride:12", "user:7")
+            event_type: Nome do evento SSE (ex: "status", "message", "location")
+            data: Dados serializáveis em JSON
+
+        Returns:
+            Evento publicado (com id)
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._next_sweep:
+                self._sweep(now)
+            event = {'id': next(self._ids), 'topic': topic, 'event': event_type, 'data': data}
+            self._last_id = event['id']
+            history = self._history.get(topic)
+            if history is None:
+                history = self._history[topic] = deque(maxlen=self.history_size)
+            history.append(event)
+            subscribers = list(self._subscribers.get(topic, ()))
+            if not subscribers:
+                self._idle_since.setdefault(topic, now)
+        for subscription in subscribers:
+            subscription.deliver(event)
+        return event
+
+    def _sweep(self, now: float) -> None:
+        """Descarta o histórico dos tópicos ociosos há mais de history_ttl (com o lock)"""
+        self._next_sweep = now + self.sweep_interval
+        expired = [topic for topic, since in self._idle_since.items() if now - since >= self.history_ttl]
+        for topic in expired:
+            del self._idle_since[topic]
+            self._history.pop(topic, None)
+        self.topics_evicted += len(expired)
+
+    def _add_subscriber(self, topic: str, subscription: Subscription) -> None:
+        self._subscribers.setdefault(topic, set()).add(subscription)
+        self._idle_since.pop(topic, None)
+
+    def _remove_subscriber(self, topic: str, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[topic]
+                if topic in self._history:
+                    self._idle_since[topic] = time.monotonic()
+
+    def subscribe(self, topics: Iterable[str], max_queue: int = 256) -> Subscription:
+        subscription = Subscription(self, topics, max_queue)
+        with self._lock:
+            for topic in subscription.topics:
+                self._add_subscriber(topic, subscription)
+        return subscription
+
+    def add_topic(self, subscription: Subscription, topic: str) -> None:
+        with self._lock:
+            subscription.topics.add(topic)
+            self._add_subscriber(topic, subscription)
+
+    def remove_topic(self, subscription: Subscription, topic: str) -> None:
+        with self._lock:
+            subscription.topics.discard(topic)
+            self._remove_subscriber(topic, subscription)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            for topic in subscription.topics:
+                self._remove_subscriber(topic, subscription)
+
+    def replay(self, topics: Iterable[str], last_event_id: int) -> List[Dict]:
+        """Eventos dos tópicos com id maior que last_event_id, em ordem"""
+        with self._lock:
+            events = [event for topic in topics for event in self._history.get(topic, ())
+                      if event['id'] > last_event_id]
+        return sorted(events, key=lambda event: event['id'])
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len({s for subscribers in self._subscribers.values() for s in subscribers})
+
+
+# Hub compartilhado pelas rotas deste worker
+event_hub = EventHub()
+
+# Tópico com as corridas aguardando motorista (ofertas do gateway de motoristas)
+REQUESTED_RIDES_TOPIC = 'rides:requested'
+
+
+def ride_offer(ride) -> Dict:
+    """Oferta de corrida no formato compacto do gateway de motoristas"""
+    return {
+        't': 'offer',
+        'id': ride.id,
+        'o': [ride.origin_lat, ride.origin_lng],
+        'd': [ride.destination_lat, ride.destination_lng],
+        'oa': ride.origin,
+        'da': ride.destination
+    }
+
+
+def publish_ride_offer(ride) -> None:
+    """Publica uma corrida aguardando motorista para os motoristas disponíveis"""
+    event_hub.publish(REQUESTED_RIDES_TOPIC, 'offer', ride_offer(ride))
+
+
+def publish_ride_taken(ride) -> None:
+    """Avisa os motoristas que a corrida não está mais disponível"""
+    event_hub.publish(REQUESTED_RIDES_TOPIC, 'taken', {'t': 'taken', 'id': ride.id})
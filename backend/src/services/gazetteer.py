@@ -0,0 +1,473 @@
+import csv
+import math
+import os
+import re
+import sqlite3
+import threading
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.services.cache import normalize_address
+from src.services.geo import bounding_box, haversine_many
+
+# Raios tentados (m) na geocodificação reversa, do menor para o maior
+REVERSE_RADII_M = (50, 200, 1000)
+# Candidatos do FTS avaliados por consulta de geocodificação direta
+SEARCH_CANDIDATES = 50
+# search_nearby: termos em até NEARBY_TEXT_CANDIDATES lugares são buscados no FTS
+# e filtrados pela distância; termos mais comuns são conferidos na caixa do raio
+NEARBY_TEXT_CANDIDATES = 500
+NEARBY_BOX_CANDIDATES = 5000
+# Termos presentes em mais lugares que isso ("sao", "paulo", "rua") ficam fora
+# do MATCH, porque o FTS5 leria a lista inteira de cada um; são conferidos
+# nos candidatos trazidos pelos termos raros
+COMMON_TERM_DOCS = 20000
+VERIFY_CANDIDATES = 500
+
+_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS places ('
+    'id INTEGER PRIMARY KEY, display_name TEXT NOT NULL, name TEXT, road TEXT, house_number TEXT, '
+    'suburb TEXT, city TEXT, postcode TEXT, category TEXT, latitude REAL NOT NULL, longitude REAL NOT NULL, '
+    'search TEXT NOT NULL)',
+    # Índice textual sem cópia do conteúdo: o rowid aponta para places.id
+    "CREATE VIRTUAL TABLE IF NOT EXISTS places_fts USING fts5("
+    "search, content='', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    # Colunas auxiliares (+): coordenadas exatas (a caixa do R*Tree é float32) e
+    # termos normalizados, para filtrar pela caixa sem ler a tabela places
+    'CREATE VIRTUAL TABLE IF NOT EXISTS places_rtree USING rtree('
+    'id, min_lat, max_lat, min_lng, max_lng, +latitude, +longitude, +search)',
+    # Quantos lugares têm cada termo (o fts5vocab calcula isso lendo o índice inteiro)
+    'CREATE TABLE IF NOT EXISTS places_terms (term TEXT PRIMARY KEY, documents INTEGER NOT NULL) WITHOUT ROWID',
+]
+
+ADDRESS_FIELDS = ('road', 'house_number', 'suburb', 'city', 'postcode')
+
+
+def format_display_name(record: Dict) -> str:
+    """Nome no formato brasileiro: "Nome, Rua X, 123, Bairro, Cidade, CEP" """
+    parts = [record.get('name'), record.get('road'), record.get('house_number'),
+             record.get('suburb'), record.get('city'), record.get('postcode')]
+    return ', '.join(str(part) for part in parts if part)
+
+
+def address_tokens(text: str) -> List[str]:
+    """Palavras normalizadas (sem acento, minúsculas) do texto, como no índice FTS"""
+    return re.findall(r'\w+', normalize_address(text))
+
+
+def _lng_ranges(min_lng: float, max_lng: float) -> List[Tuple[float, float]]:
+    """Faixas de longitude da caixa (duas quando atravessa o antimeridiano)"""
+    if min_lng <= max_lng:
+        return [(min_lng, max_lng)]
+    return [(min_lng, 180.0), (-180.0, max_lng)]
+
+
+def build_gazetteer(path: str, records: Iterable[Dict], batch_size: int = 20000) -> int:
+    """
+    Cria (ou completa) o banco do gazetteer a partir de registros de endereço
+
+    Args:
+        path: Arquivo SQLite de saída
+        records: Dicionários com latitude, longitude e opcionalmente name,
+            road, house_number, suburb, city, postcode e category
+        batch_size: Registros por transação
+
+    Returns:
+        Número de registros gravados
+    """
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    for statement in _SCHEMA:
+        conn.execute(statement)
+    next_id = (conn.execute('SELECT MAX(id) FROM places').fetchone()[0] or 0) + 1
+
+    count = 0
+    places, texts, boxes = [], [], []
+
+    def flush():
+        conn.executemany('INSERT INTO places VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', places)
+        conn.executemany('INSERT INTO places_fts (rowid, search) VALUES (?, ?)', texts)
+        conn.executemany('INSERT INTO places_rtree VALUES (?, ?, ?, ?, ?, ?, ?, ?)', boxes)
+        conn.commit()
+        places.clear()
+        texts.clear()
+        boxes.clear()
+
+    for record in records:
+        place_id = next_id + count
+        latitude, longitude = float(record['latitude']), float(record['longitude'])
+        display_name = format_display_name(record)
+        search = ' '.join(address_tokens(display_name))
+        places.append((place_id, display_name, record.get('name'),
+                       *(record.get(field) for field in ADDRESS_FIELDS),
+                       record.get('category'), latitude, longitude, search))
+        texts.append((place_id, search))
+        boxes.append((place_id, latitude, latitude, longitude, longitude, latitude, longitude, search))
+        count += 1
+        if len(places) >= batch_size:
+            flush()
+    flush()
+    conn.execute("INSERT INTO places_fts (places_fts) VALUES ('optimize')")
+    conn.execute('CREATE VIRTUAL TABLE temp.places_vocab USING fts5vocab(main, places_fts, row)')
+    conn.execute('DELETE FROM places_terms')
+    conn.execute('INSERT INTO places_terms SELECT term, doc FROM temp.places_vocab')
+    conn.commit()
+    conn.close()
+    return count
+
+
+def records_from_osm(path: str) -> Iterator[Dict]:
+    """
+    Endereços e lugares com nome de um extrato OSM em XML (.osm)
+
+    Nós e vias com addr:street ou name viram registros; vias usam o centro
+    dos seus nós.
+    """
+    coordinates: Dict[int, Tuple[float, float]] = {}
+    for _, element in ET.iterparse(path, events=('end',)):
+        if element.tag not in ('node', 'way'):
+            continue
+        tags = {tag.get('k'): tag.get('v') for tag in element.iter('tag')}
+        if element.tag == 'node':
+            latitude, longitude = float(element.get('lat')), float(element.get('lon'))
+            coordinates[int(element.get('id'))] = (latitude, longitude)
+        else:
+            points = [coordinates[int(nd.get('ref'))] for nd in element.iter('nd')
+                      if int(nd.get('ref')) in coordinates]
+            if not points:
+                element.clear()
+                continue
+            latitude = sum(lat for lat, _ in points) / len(points)
+            longitude = sum(lng for _, lng in points) / len(points)
+        road = tags.get('addr:street')
+        name = tags.get('name') if element.tag == 'node' or 'highway' not in tags else None
+        if road or name:
+            category = next((f'{key}={tags[key]}' for key in ('amenity', 'shop', 'tourism', 'leisure')
+                             if key in tags), None)
+            yield {
+                'latitude': latitude, 'longitude': longitude, 'name': name, 'road': road,
+                'house_number': tags.get('addr:housenumber'),
+                'suburb': tags.get('addr:suburb'), 'city': tags.get('addr:city'),
+                'postcode': tags.get('addr:postcode'), 'category': category
+            }
+        element.clear()
+
+
+def records_from_csv(path: str) -> Iterator[Dict]:
+    """Endereços de um CSV no formato OpenAddresses (LON, LAT, NUMBER, STREET, ...)"""
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            row = {key.upper(): value for key, value in row.items()}
+            yield {
+                'latitude': row['LAT'], 'longitude': row['LON'], 'road': row.get('STREET') or None,
+                'house_number': row.get('NUMBER') or None, 'suburb': row.get('DISTRICT') or None,
+                'city': row.get('CITY') or None, 'postcode': row.get('POSTCODE') or None
+            }
+
+
+class GazetteerGeocodingService:
+    """
+    Geocodificação offline a partir de um extrato de endereços em SQLite
+
+    Mesma interface do NominatimGeocodingService (geocode_address,
+    geocode_many, reverse_geocode, search_nearby, cache_stats). A busca por
+    texto usa um índice FTS5 (tokens sem acento, com prefixo no último
+    termo) e a reversa/nearby um índice R*Tree, então as consultas são
+    locais e levam poucos milissegundos mesmo com milhões de endereços.
+    O banco é gerado com build_gazetteer (ou python -m src.services.gazetteer).
+    """
+
+    def __init__(self, path: str, max_reverse_distance_m: float = REVERSE_RADII_M[-1]):
+        """
+        Args:
+            path: Arquivo SQLite gerado por build_gazetteer
+            max_reverse_distance_m: Distância máxima do endereço devolvido
+                pela geocodificação reversa
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self.max_reverse_distance_m = max_reverse_distance_m
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        """Conexão somente leitura por thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA mmap_size=268435456')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, found: bool) -> None:
+        with self._lock:
+            self.lookups += 1
+            self.hits += found
+
+    def cache_stats(self) -> Dict:
+        return {'backend': 'gazetteer', 'lookups': self.lookups, 'hits': self.hits}
+
+    @staticmethod
+    def _match_expression(tokens: List[str], prefix: bool = False) -> str:
+        """
+        Expressão MATCH com todos os termos (prefix: o último também como prefixo)
+
+        Prefixos custam bem mais que termos exatos (o FTS junta as listas de
+        todos os termos que começam com eles), por isso só são usados quando
+        a busca exata não encontra nada.
+        """
+        quoted = [f'"{token}"' for token in tokens]
+        if prefix:
+            quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def _document_counts(self, tokens: List[str]) -> Dict[str, int]:
+        return dict(self._conn().execute(
+            f"SELECT term, documents FROM places_terms WHERE term IN ({','.join('?' * len(tokens))})", tokens
+        ).fetchall())
+
+    def _prefix_documents(self, prefix: str) -> int:
+        """Soma dos lugares de cada termo com o prefixo (máximo de lugares com ele)"""
+        return self._conn().execute(
+            'SELECT COALESCE(SUM(documents), 0) FROM places_terms WHERE term >= ? AND term < ?',
+            (prefix, prefix + '\U0010ffff')
+        ).fetchone()[0]
+
+    def _search(self, tokens: List[str], prefix: bool = False,
+                limit: int = SEARCH_CANDIDATES) -> List[sqlite3.Row]:
+        """
+        Lugares com todos os termos (prefix: o último também como prefixo)
+
+        Só os termos raros vão para o MATCH; os comuns (COMMON_TERM_DOCS) e o
+        prefixo, quando há termos raros, são conferidos nos candidatos.
+        """
+        exact = tokens[:-1] if prefix else tokens
+        counts = self._document_counts(exact) if exact else {}
+        if any(token not in counts for token in exact):
+            return []  # termo que não existe no extrato
+        ranked = sorted(set(exact), key=counts.get)
+        selective = [token for token in ranked if counts[token] <= COMMON_TERM_DOCS]
+        # Prefixo no MATCH só quando nenhum termo exato é raro o bastante;
+        # sozinho se ele for raro, senão junto com o termo exato mais raro
+        match_prefix = prefix and not selective
+        if not selective and not (prefix and self._prefix_documents(tokens[-1]) <= COMMON_TERM_DOCS):
+            selective = ranked[:1]
+        check = [token for token in ranked if token not in selective]
+        check_prefix = prefix and not match_prefix
+
+        # Sem ORDER BY rank: o bm25 pontuaria todos os documentos com os
+        # termos; os candidatos são ordenados em _best
+        expression = self._match_expression(selective + ([tokens[-1]] if match_prefix else []), match_prefix)
+        cursor = self._conn().execute(
+            'SELECT p.* FROM places_fts JOIN places p ON p.id = places_fts.rowid '
+            'WHERE places_fts MATCH ? LIMIT ?',
+            (expression, max(limit, VERIFY_CANDIDATES) if check or check_prefix else limit)
+        )
+        if not (check or check_prefix):
+            return cursor.fetchall()
+        rows = []
+        for row in cursor:
+            found = set(row['search'].split())
+            if all(token in found for token in check) and (
+                    not check_prefix or any(term.startswith(tokens[-1]) for term in found)):
+                rows.append(row)
+                if len(rows) >= limit:
+                    break
+        return rows
+
+    @staticmethod
+    def _best(rows: List[sqlite3.Row], tokens: List[str]) -> sqlite3.Row:
+        """Candidato com o número pedido e com menos termos além dos buscados"""
+        numbers = {token for token in tokens if token.isdigit()}
+        return min(rows, key=lambda row: (row['house_number'] not in numbers,
+                                          len(row['search'].split())))
+
+    @staticmethod
+    def _address(row: sqlite3.Row) -> Dict:
+        return {field: row[field] for field in ADDRESS_FIELDS if row[field]}
+
+    def geocode_address(self, address: str) -> Optional[Dict]:
+        """
+        Converte endereço em coordenadas
+
+        Se nenhum lugar tiver todos os termos, tenta de novo sem os números
+        que não existem no extrato (ex: o número da casa) e devolve a rua.
+        """
+        tokens = address_tokens(address)
+        rows = []
+        if tokens:
+            # Termos exatos primeiro (endereço completo), depois sem os números
+            # desconhecidos (número fora do extrato) e só então com prefixo (texto digitado pela metade)
+            known = self._document_counts(tokens)
+            words = [token for token in tokens if token in known or not token.isdigit()]
+            attempts = [(tokens, False)]
+            if words and len(words) < len(tokens):
+                attempts.append((words, False))
+            if not tokens[-1].isdigit():
+                attempts.append((tokens, True))
+            for attempt, prefix in attempts:
+                rows = self._search(attempt, prefix)
+                if rows:
+                    break
+        self._count(bool(rows))
+        if not rows:
+            return None
+        row = self._best(rows, tokens)
+        return {
+            'latitude': row['latitude'],
+            'longitude': row['longitude'],
+            'display_name': row['display_name'],
+            'address': self._address(row),
+            'importance': 0
+        }
+
+    def geocode_many(self, addresses: List[str], deadline: float) -> List[Optional[Dict]]:
+        """Geocodifica vários endereços (consultas locais: o prazo não é usado)"""
+        return [self.geocode_address(address) for address in addresses]
+
+    def _within_box(self, latitude: float, longitude: float, radius_m: float,
+                    words: List[str] = (), prefix: Optional[str] = None,
+                    limit: int = 500, nearest: bool = False) -> List[Tuple[int, float, float]]:
+        """
+        (id, latitude, longitude) dos lugares na caixa envolvente do raio
+
+        Args:
+            words: Termos que o lugar precisa ter
+            prefix: Prefixo de algum termo do lugar
+            nearest: Ordenar pela distância (aproximação plana) antes do
+                LIMIT, para que o corte não descarte os lugares mais próximos
+        """
+        min_lat, min_lng, max_lat, max_lng = bounding_box(latitude, longitude, radius_m)
+        # Termos conferidos no próprio R*Tree (coluna auxiliar search)
+        text = ''.join(" AND instr(' ' || search || ' ', ?)" for _ in words)
+        params = [f' {word} ' for word in words]
+        if prefix:
+            text += " AND instr(' ' || search, ?)"
+            params.append(f' {prefix}')
+        lng_scale = math.cos(math.radians(latitude)) ** 2
+        rows = []
+        for low, high in _lng_ranges(min_lng, max_lng):
+            order, order_params = '', []
+            if nearest:
+                # Na faixa do outro lado do antimeridiano o ponto é deslocado 360°
+                reference = longitude
+                if longitude > high:
+                    reference -= 360
+                elif longitude < low:
+                    reference += 360
+                order = ' ORDER BY (latitude - ?) * (latitude - ?) + (longitude - ?) * (longitude - ?) * ?'
+                order_params = [latitude, latitude, reference, reference, lng_scale]
+            rows.extend(self._conn().execute(
+                'SELECT id, latitude, longitude FROM places_rtree '
+                f'WHERE max_lat >= ? AND min_lat <= ? AND max_lng >= ? AND min_lng <= ?{text}{order} LIMIT ?',
+                (min_lat, max_lat, low, high, *params, *order_params, limit)
+            ).fetchall())
+        return rows
+
+    def _places(self, ids: List[int]) -> Dict[int, sqlite3.Row]:
+        rows = self._conn().execute(f"SELECT * FROM places WHERE id IN ({','.join('?' * len(ids))})", ids)
+        return {row['id']: row for row in rows}
+
+    def reverse_geocode(self, latitude: float, longitude: float) -> Optional[Dict]:
+        """
+        Converte coordenadas no endereço mais próximo do extrato
+
+        Procura em caixas crescentes (REVERSE_RADII_M) até encontrar
+        candidatos e escolhe o mais próximo pela distância haversine. Se o
+        mais próximo da caixa está fora do raio (no canto), o lugar mais
+        próximo de todos está a no máximo essa distância: basta uma caixa
+        desse tamanho, em vez da próxima da lista.
+        """
+        for radius in REVERSE_RADII_M:
+            radius = min(radius, self.max_reverse_distance_m)
+            candidates = self._within_box(latitude, longitude, radius, nearest=True)
+            if candidates:
+                distances = haversine_many(latitude, longitude, [c[1] for c in candidates],
+                                           [c[2] for c in candidates])
+                best = int(distances.argmin())
+                if radius < distances[best] <= self.max_reverse_distance_m:
+                    radius = float(distances[best]) + 1
+                    candidates = self._within_box(latitude, longitude, radius, nearest=True)
+                    distances = haversine_many(latitude, longitude, [c[1] for c in candidates],
+                                               [c[2] for c in candidates])
+                    best = int(distances.argmin())
+                if distances[best] <= radius:
+                    row = self._places([candidates[best][0]])[candidates[best][0]]
+                    self._count(True)
+                    return {
+                        'display_name': row['display_name'],
+                        'address': self._address(row),
+                        'latitude': latitude,
+                        'longitude': longitude
+                    }
+            if radius >= self.max_reverse_distance_m:
+                break
+        self._count(False)
+        return None
+
+    def _text_documents(self, words: List[str], prefix: str) -> int:
+        """Estimativa (máximo) de lugares com todos os termos e o prefixo"""
+        counts = self._document_counts(words) if words else {}
+        if len(counts) < len(set(words)):
+            return 0
+        documents = min(counts.values(), default=None)
+        if documents is not None and documents <= NEARBY_TEXT_CANDIDATES:
+            return documents
+        prefixed = self._prefix_documents(prefix)
+        return prefixed if documents is None else min(documents, prefixed)
+
+    def search_nearby(self, latitude: float, longitude: float,
+                      query: str, radius: int = 1000) -> List[Dict]:
+        """
+        Busca lugares do extrato cujo nome/endereço contém os termos, dentro do raio
+
+        Termos raros (ex: "hospital") são buscados no FTS e os lugares
+        encontrados filtrados pela distância; termos comuns (ex: "rua") são
+        conferidos nos lugares da caixa envolvente do raio (R*Tree).
+
+        Returns:
+            Até 10 lugares ordenados pela distância (campo distance, em metros)
+        """
+        tokens = address_tokens(query)
+        if not tokens:
+            return []
+        *words, last = tokens
+        documents = self._text_documents(words, last)
+        if not documents:
+            return []
+        if documents <= NEARBY_TEXT_CANDIDATES:
+            rows = self._search(tokens, prefix=True, limit=NEARBY_TEXT_CANDIDATES)
+            candidates = [(row['id'], row['latitude'], row['longitude']) for row in rows]
+        else:
+            candidates = self._within_box(latitude, longitude, radius, words, last, limit=NEARBY_BOX_CANDIDATES)
+        if not candidates:
+            return []
+        distances = haversine_many(latitude, longitude, [c[1] for c in candidates], [c[2] for c in candidates])
+        nearest = sorted((float(d), c[0]) for c, d in zip(candidates, distances) if d <= radius)[:10]
+        if not nearest:
+            return []
+        rows = self._places([place_id for _, place_id in nearest])
+        return [
+            {
+                'latitude': rows[place_id]['latitude'],
+                'longitude': rows[place_id]['longitude'],
+                'display_name': rows[place_id]['display_name'],
+                'address': self._address(rows[place_id]),
+                'importance': 0,
+                'distance': round(distance, 1)
+            }
+            for distance, place_id in nearest
+        ]
+
+if __name__ == '__main__':
+    # Conversão offline: python -m src.services.gazetteer extrato.osm|enderecos.csv gazetteer.db
+    import sys
+    source = sys.argv[1]
+    records = records_from_csv(source) if source.lower().endswith('.csv') else records_from_osm(source)
+    count = build_gazetteer(sys.argv[2], records)
+    print(f"{count} endereços salvos em {sys.argv[2]}")
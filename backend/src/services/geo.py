@@ -0,0 +1,376 @@
+import math
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = 111320
+
+_GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_GEOHASH_INDEX = {c: i for i, c in enumerate(_GEOHASH_BASE32)}
+
+# Precisão usada para os geohashes gravados em users.geohash (~5 m)
+GEOHASH_STORAGE_PRECISION = 9
+
+# Escalar ou array de coordenadas em graus
+Coordinates = Union[float, np.ndarray, List[float]]
+
+
+def parse_coordinates(latitude, longitude) -> Tuple[float, float]:
+    """
+    Converte e valida um par de coordenadas recebido de um cliente
+
+    Returns:
+        (latitude, longitude) como float
+
+    Raises:
+        TypeError: Valor ausente (None) ou de tipo não numérico
+        ValueError: Valor não numérico, não finito (NaN, inf) ou fora de
+            [-90, 90] / [-180, 180]
+    """
+    if isinstance(latitude, bool) or isinstance(longitude, bool):
+        raise TypeError('coordenadas devem ser números')
+    latitude, longitude = float(latitude), float(longitude)
+    if not (math.isfinite(latitude) and math.isfinite(longitude)):
+        raise ValueError('coordenadas devem ser finitas')
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        raise ValueError('coordenadas fora do intervalo')
+    return latitude, longitude
+
+
+def haversine_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """
+    Distância de grande círculo entre dois pontos
+
+    Returns:
+        Distância em metros
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_many(latitude: float, longitude: float,
+                   latitudes: Coordinates, longitudes: Coordinates) -> np.ndarray:
+    """
+    Distâncias de grande círculo de um ponto a um array de pontos (vetorizado)
+
+    Args:
+        latitude: Latitude do ponto de referência
+        longitude: Longitude do ponto de referência
+        latitudes: Latitudes dos pontos (array ou lista)
+        longitudes: Longitudes dos pontos (array ou lista)
+
+    Returns:
+        Array de distâncias em metros
+    """
+    return haversine_pairwise(latitude, longitude, latitudes, longitudes)
+
+
+def haversine_pairwise(lat1: Coordinates, lng1: Coordinates,
+                       lat2: Coordinates, lng2: Coordinates) -> np.ndarray:
+    """
+    Distâncias de grande círculo elemento a elemento, com broadcasting do NumPy
+
+    Com lat1/lng1 em forma (n, 1) e lat2/lng2 em forma (m,) o resultado é a
+    matriz n x m de distâncias.
+
+    Returns:
+        Array de distâncias em metros
+    """
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.subtract(lng2, lng1))
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def bearing(lat1: Coordinates, lng1: Coordinates,
+            lat2: Coordinates, lng2: Coordinates) -> Union[float, np.ndarray]:
+    """
+    Rumo inicial de (lat1, lng1) para (lat2, lng2), vetorizado
+
+    Returns:
+        Graus a partir do norte, sentido horário, em [0, 360)
+    """
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dlambda = np.radians(np.subtract(lng2, lng1))
+    y = np.sin(dlambda) * np.cos(phi2)
+    x = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(dlambda)
+    return np.degrees(np.arctan2(y, x)) % 360
+
+
+def bounding_box(latitude: float, longitude: float,
+                 radius_m: float) -> Tuple[float, float, float, float]:
+    """
+    Menor caixa lat/lng que contém o círculo de raio radius_m
+
+    A largura em longitude usa a latitude de maior afastamento do círculo
+    (não a do centro), e a caixa cobre todas as longitudes quando o círculo
+    contém um polo. A longitude mínima pode ser maior que a máxima quando a
+    caixa atravessa o antimeridiano.
+
+    Returns:
+        Tupla (min_lat, min_lng, max_lat, max_lng)
+    """
+    angular = radius_m / EARTH_RADIUS_M
+    phi = math.radians(latitude)
+    min_phi = phi - angular
+    max_phi = phi + angular
+    if min_phi <= -math.pi / 2 or max_phi >= math.pi / 2:
+        return (max(math.degrees(min_phi), -90.0), -180.0,
+                min(math.degrees(max_phi), 90.0), 180.0)
+    dlambda = math.asin(min(1.0, math.sin(angular) / math.cos(phi)))
+    min_lng = (longitude - math.degrees(dlambda) + 180) % 360 - 180
+    max_lng = (longitude + math.degrees(dlambda) + 180) % 360 - 180
+    return math.degrees(min_phi), min_lng, math.degrees(max_phi), max_lng
+
+
+def within_radius(latitude: float, longitude: float, latitudes: Coordinates,
+                  longitudes: Coordinates, radius_m: float) -> np.ndarray:
+    """
+    Máscara booleana dos pontos a até radius_m do centro (vetorizado)
+
+    Descarta primeiro pela caixa envolvente e calcula a haversine apenas
+    para os pontos dentro dela.
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    min_lat, min_lng, max_lat, max_lng = bounding_box(latitude, longitude, radius_m)
+    mask = (latitudes >= min_lat) & (latitudes <= max_lat)
+    if min_lng <= max_lng:
+        mask &= (longitudes >= min_lng) & (longitudes <= max_lng)
+    else:
+        mask &= (longitudes >= min_lng) | (longitudes <= max_lng)
+    candidates = np.flatnonzero(mask)
+    if candidates.size:
+        mask[candidates] = haversine_many(latitude, longitude, latitudes[candidates],
+                                          longitudes[candidates]) <= radius_m
+    return mask
+
+
+def geohash_encode(latitude: float, longitude: float,
+                   precision: int = GEOHASH_STORAGE_PRECISION) -> str:
+    """
+    Codifica coordenadas em geohash
+
+    Geohashes com prefixo comum estão na mesma célula, então um índice B-tree
+    sobre a coluna responde consultas por área com buscas de intervalo.
+
+    Args:
+        latitude: Latitude
+        longitude: Longitude
+        precision: Número de caracteres
+
+    Returns:
+        Geohash (ex: "6gyf4bf0r")
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """
+    Retorna a caixa de uma célula geohash
+
+    Returns:
+        Tupla (min_lat, min_lng, max_lat, max_lng)
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _GEOHASH_INDEX[char]
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """Altura e largura, em graus, de uma célula geohash com a precisão dada"""
+    lat_bits = (5 * precision) // 2
+    lng_bits = 5 * precision - lat_bits
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def geohash_cover(latitude: float, longitude: float, radius_m: float,
+                  max_cells: int = 32) -> List[str]:
+    """
+    Células geohash que cobrem a caixa envolvente de um círculo
+
+    Usa a maior precisão que cobre a caixa com no máximo max_cells células,
+    para que cada célula vire uma busca de intervalo curta no índice.
+
+    Args:
+        latitude: Latitude do centro
+        longitude: Longitude do centro
+        radius_m: Raio em metros
+        max_cells: Número máximo de células retornadas
+
+    Returns:
+        Lista de prefixos geohash distintos
+    """
+    min_lat, min_lng, max_lat, max_lng = bounding_box(latitude, longitude, radius_m)
+    # Meia largura em longitude (a caixa pode atravessar o antimeridiano)
+    dlng = 180.0 if (min_lng, max_lng) == (-180.0, 180.0) else (max_lng - min_lng) % 360 / 2
+
+    for precision in range(GEOHASH_STORAGE_PRECISION, 0, -1):
+        cell_lat, cell_lng = geohash_cell_size(precision)
+        first_row = math.floor((min_lat + 90) / cell_lat)
+        last_row = min(math.floor((max_lat + 90) / cell_lat), round(180 / cell_lat) - 1)
+        first_col = math.floor((longitude - dlng + 180) / cell_lng)
+        last_col = math.floor((longitude + dlng + 180) / cell_lng)
+        if (last_row - first_row + 1) * (last_col - first_col + 1) <= max_cells or precision == 1:
+            break
+
+    cells = []
+    for row in range(first_row, last_row + 1):
+        lat = -90 + (row + 0.5) * cell_lat
+        for col in range(first_col, last_col + 1):
+            # Normaliza a longitude para atravessar o antimeridiano
+            lng = (-180 + (col + 0.5) * cell_lng + 180) % 360 - 180
+            cell = geohash_encode(lat, lng, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+# Trechos com mais pontos que isso são avaliados com numpy no Douglas-Peucker
+_DP_VECTOR_MIN = 64
+
+
+def douglas_peucker(points: Sequence[Tuple[float, float]], tolerance_m: float) -> List[Tuple[float, float]]:
+    """
+    Simplifica uma linha (Douglas-Peucker) mantendo o desvio abaixo da tolerância
+
+    As distâncias são calculadas em uma projeção equirretangular local (em
+    metros), precisa o bastante na escala de uma rota urbana ou regional.
+
+    Args:
+        points: Pontos (latitude, longitude)
+        tolerance_m: Desvio máximo permitido em metros
+
+    Returns:
+        Subconjunto dos pontos, sempre incluindo o primeiro e o último
+    """
+    if len(points) < 3 or tolerance_m <= 0:
+        return list(points)
+    array = np.asarray(points, dtype=float)
+    reference_lat = math.radians(float(array[:, 0].mean()))
+    y = array[:, 0] * METERS_PER_DEGREE
+    x = array[:, 1] * METERS_PER_DEGREE * math.cos(reference_lat)
+
+    keep = np.zeros(len(array), dtype=bool)
+    keep[0] = keep[-1] = True
+    xs, ys = x.tolist(), y.tolist()
+    stack = [(0, len(array) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx, dy = xs[end] - xs[start], ys[end] - ys[start]
+        length_sq = dx * dx + dy * dy
+        if end - start > _DP_VECTOR_MIN:
+            px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+            if length_sq == 0:
+                distances = np.hypot(px, py)
+            else:
+                # Distância até o segmento (não à reta), para linhas que voltam
+                t = np.clip((px * dx + py * dy) / length_sq, 0.0, 1.0)
+                distances = np.hypot(px - t * dx, py - t * dy)
+            index = int(np.argmax(distances))
+            farthest, split = float(distances[index]), start + 1 + index
+        else:
+            # Trechos curtos: laço simples sai mais barato que as chamadas ao numpy
+            farthest, split = -1.0, start
+            x0, y0 = xs[start], ys[start]
+            for i in range(start + 1, end):
+                px, py = xs[i] - x0, ys[i] - y0
+                t = 0.0 if length_sq == 0 else min(max((px * dx + py * dy) / length_sq, 0.0), 1.0)
+                distance = math.hypot(px - t * dx, py - t * dy)
+                if distance > farthest:
+                    farthest, split = distance, i
+        if farthest > tolerance_m:
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return [tuple(point) for point in array[keep].tolist()]
+
+
+def encode_polyline(points: Sequence[Tuple[float, float]], precision: int = 5) -> str:
+    """
+    Codifica pontos no formato Encoded Polyline (Google/OSRM)
+
+    Args:
+        points: Pontos (latitude, longitude)
+        precision: Casas decimais (5 = padrão do Google, 6 = polyline6 do OSRM)
+
+    Returns:
+        String codificada
+    """
+    if len(points) == 0:
+        return ''
+    # Inteiros escalados, diferenças entre pontos consecutivos e zigzag (sinal no bit 0)
+    scaled = np.round(np.asarray(points, dtype=float) * 10 ** precision).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=0).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+    # Blocos de 5 bits, do menos significativo; todos menos o último com o bit 0x20
+    chunks = (values[:, None] >> (5 * np.arange(7))) & 0x1f
+    lengths = 1 + ((values[:, None] >> (5 * np.arange(1, 7))) != 0).sum(axis=1)
+    position = np.arange(7)[None, :]
+    chunks = chunks | np.where(position < lengths[:, None] - 1, 0x20, 0)
+    return (chunks[position < lengths[:, None]] + 63).astype(np.uint8).tobytes().decode('ascii')
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> List[Tuple[float, float]]:
+    """Decodifica uma Encoded Polyline em pontos (latitude, longitude)"""
+    factor = 10 ** precision
+    points = []
+    index = lat = lng = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / factor, lng / factor))
+    return points
@@ -1,27 +1,223 @@
 
 import requests
-from typing import Optional, Dict, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Optional, Dict, List, Tuple, Union
+from src.services.http_client import DEFAULT_TIMEOUT, get_session
+from src.services.cache import TwoTierCache, TTLCache, normalize_address, grid_cell_key
+from src.services.geo import bounding_box, haversine_many
+from src.services.rate_limit import RateGovernor
+
+# Pausa após um 429 do Nominatim sem Retry-After, em segundos
+RATE_LIMITED_BACKOFF = 30.0
+# Status do Nominatim tratados como falha transitória (nova tentativa)
+RETRY_STATUSES = (500, 502, 503, 504)
 
 class NominatimGeocodingService:
     """Serviço de geocodificação usando OpenStreetMap Nominatim"""
     
-    def __init__(self, user_agent: str = "uber-app/1.0"):
+    def __init__(self, user_agent: str = "uber-app/1.0", cache: Optional[TwoTierCache] = None,
+                 reverse_cache: Optional[TwoTierCache] = None, reverse_cell_size_m: float = 30,
+                 session: Optional[requests.Session] = None,
+                 timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT,
+                 max_workers: int = 4, max_pending: int = 32,
+                 rate_governor: Optional[RateGovernor] = None, retries: int = 2,
+                 backoff_factor: float = 0.3,
+                 nearby_cache: Optional[TwoTierCache] = None):
+        """
+        Args:
+            user_agent: User-Agent enviado ao Nominatim
+            cache: Cache de resultados de geocode_address (padrão: apenas em memória)
+            reverse_cache: Cache de reverse_geocode por célula de grade
+                (padrão: apenas em memória, limitado a ~8 MB)
+            reverse_cell_size_m: Tamanho da célula usada como chave da
+                geocodificação reversa, em metros (recomendado 20-50)
+            max_workers: Consultas simultâneas de geocode_many (todas as
+                requisições do worker compartilham o mesmo pool)
+            max_pending: Consultas de geocode_many em execução ou na fila do
+                pool; acima disso os endereços novos ficam sem resultado
+            rate_governor: Limitador aplicado a toda requisição ao Nominatim
+                (política de uso: no máximo 1 requisição por segundo)
+            retries: Novas tentativas em erros de conexão e status 5xx. São
+                feitas aqui, e não pelo urllib3 (a sessão padrão não repete),
+                para que cada tentativa passe pelo rate_governor
+            backoff_factor: Fator do backoff exponencial entre tentativas
+            nearby_cache: Cache de search_nearby por célula de grade e termo
+                (padrão: apenas em memória, 1 hora)
+        """
         self.base_url = "https://nominatim.openstreetmap.org"
         self.user_agent = user_agent
         self.headers = {
             'User-Agent': self.user_agent
         }
+        self.cache = cache if cache is not None else TwoTierCache()
+        self.reverse_cache = reverse_cache if reverse_cache is not None else TwoTierCache(
+            memory=TTLCache(max_entries=50000, ttl=24 * 3600, max_bytes=8 * 1024 * 1024)
+        )
+        self.nearby_cache = nearby_cache if nearby_cache is not None else TwoTierCache(
+            memory=TTLCache(max_entries=10000, ttl=3600)
+        )
+        self.reverse_cell_size_m = reverse_cell_size_m
+        self.session = session if session is not None else get_session('nominatim', retries=0)
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self.rate_governor = rate_governor
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
     
-    def geocode_address(self, address: str) -> Optional[Dict]:
+    def cache_stats(self) -> Dict:
+        """Retorna contadores de hit/miss/eviction dos caches de geocodificação"""
+        return {
+            'geocode': self.cache.stats(),
+            'reverse_geocode': self.reverse_cache.stats(),
+            'search_nearby': self.nearby_cache.stats(),
+            'rate_governor': self.rate_governor.stats() if self.rate_governor else None
+        }
+    
+    def _throttle(self, deadline: Optional[float] = None) -> bool:
+        """
+        Espera a vez na fila do limitador; False se a espera seria longa demais
+
+        Args:
+            deadline: Instante (time.monotonic) em que o chamador desiste;
+                a espera pelo token não passa dele
+        """
+        if self.rate_governor is None:
+            return True
+        max_wait = None
+        if deadline is not None:
+            max_wait = min(self.rate_governor.max_wait, deadline - time.monotonic())
+            if max_wait <= 0:
+                return False
+        if self.rate_governor.acquire(max_wait=max_wait):
+            return True
+        print("Fila de requisições ao Nominatim cheia, consulta descartada")
+        return False
+    
+    def _request_timeout(self, deadline: Optional[float] = None) -> Union[float, Tuple[float, float]]:
+        """Timeout da requisição, limitado ao que resta até deadline"""
+        if deadline is None:
+            return self.timeout
+        remaining = max(deadline - time.monotonic(), 0.1)
+        if isinstance(self.timeout, tuple):
+            return tuple(min(value, remaining) for value in self.timeout)
+        return min(self.timeout, remaining)
+    
+    def _get(self, path: str, params: Dict, deadline: Optional[float] = None) -> Optional[requests.Response]:
+        """
+        GET no Nominatim em que toda tentativa (inclusive as repetições) passa
+        pelo limitador
+
+        Returns:
+            Resposta com status de sucesso, ou None se o limitador recusou
+
+        Raises:
+            requests.RequestException: Erro de rede ou status de erro na última tentativa
+        """
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff_factor * 2 ** (attempt - 1))
+            if not self._throttle(deadline):
+                return None
+            try:
+                response = self.session.get(f"{self.base_url}{path}", params=params,
+                                            headers=self.headers, timeout=self._request_timeout(deadline))
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                continue
+            self._raise_for_status(response)
+            return response
+    
+    def _raise_for_status(self, response: requests.Response) -> None:
+        """raise_for_status que, em um 429, pausa o limitador pelo Retry-After"""
+        if response.status_code == 429 and self.rate_governor is not None:
+            try:
+                seconds = float(response.headers.get('Retry-After', RATE_LIMITED_BACKOFF))
+            except ValueError:
+                seconds = RATE_LIMITED_BACKOFF
+            self.rate_governor.penalize(seconds)
+        response.raise_for_status()
+    
+    def geocode_address(self, address: str, deadline: Optional[float] = None) -> Optional[Dict]:
         """
         Converte endereço em coordenadas
         
         Args:
             address: Endereço para geocodificar
+            deadline: Instante (time.monotonic) em que o chamador desiste da
+                consulta ao Nominatim (padrão: sem prazo)
             
         Returns:
             Dicionário com coordenadas ou None se não encontrado
         """
+        key = f"search:{normalize_address(address)}"
+        return self.cache.get_or_load(key, lambda: self._fetch_geocode(address, deadline))
+    
+    def _lookup_executor(self) -> ThreadPoolExecutor:
+        """Pool limitado para geocode_many (criado sob demanda)"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='geocode')
+            return self._executor
+    
+    def geocode_many(self, addresses: List[str], deadline: float) -> List[Optional[Dict]]:
+        """
+        Geocodifica vários endereços em paralelo com um prazo total
+        
+        Endereços repetidos são consultados uma única vez. Consultas que não
+        terminam dentro do prazo ficam como None na resposta: as que ainda
+        estão na fila do pool são canceladas e as que já começaram não
+        esperam o limitador além do prazo (o que chegar vai para o cache).
+        Com max_pending consultas pendentes no pool, novos endereços ficam
+        como None sem entrar na fila.
+        
+        As consultas ao Nominatim continuam espaçadas pelo rate_governor
+        (1 req/s pela política de uso); o paralelismo vale para acertos de
+        cache e para esperar todas dentro de um único prazo.
+        
+        Args:
+            addresses: Endereços para geocodificar
+            deadline: Tempo máximo de espera por todas as consultas, em segundos
+            
+        Returns:
+            Coordenadas de cada endereço, na mesma ordem (None se não
+            encontrado ou fora do prazo)
+        """
+        executor = self._lookup_executor()
+        expires_at = time.monotonic() + deadline
+        futures = {}
+        for address in addresses:
+            key = normalize_address(address)
+            if key in futures:
+                continue
+            if not self._pending.acquire(blocking=False):
+                print("Pool de geocodificação cheio, endereço sem consulta")
+                futures[key] = None
+                continue
+            future = executor.submit(self.geocode_address, address, expires_at)
+            future.add_done_callback(lambda _: self._pending.release())
+            futures[key] = future
+        submitted = [future for future in futures.values() if future is not None]
+        done, not_done = wait(submitted, timeout=max(expires_at - time.monotonic(), 0))
+        for future in not_done:
+            future.cancel()
+        
+        results = []
+        for address in addresses:
+            future = futures[normalize_address(address)]
+            results.append(future.result() if future in done else None)
+        return results
+    
+    def _fetch_geocode(self, address: str, deadline: Optional[float] = None) -> Optional[Dict]:
+        """Consulta o Nominatim para geocode_address (sem cache)"""
         try:
             params = {
                 'q': address,
@@ -30,13 +226,9 @@ class NominatimGeocodingService:
                 'limit': 1
             }
             
-            response = requests.get(
-                f"{self.base_url}/search",
-                params=params,
-                headers=self.headers,
-                timeout=10
-            )
-            response.raise_for_status()
+            response = self._get("/search", params, deadline)
+            if response is None:
+                return None
             
             data = response.json()
             
@@ -70,6 +262,16 @@ class NominatimGeocodingService:
         Returns:
             Dicionário com endereço ou None se não encontrado
         """
+        key = f"reverse:{grid_cell_key(latitude, longitude, self.reverse_cell_size_m)}"
+        result = self.reverse_cache.get_or_load(key, lambda: self._fetch_reverse(latitude, longitude))
+        if result is None:
+            return None
+        
+        # A célula é compartilhada por pontos vizinhos: devolver as coordenadas pedidas
+        return {**result, 'latitude': latitude, 'longitude': longitude}
+    
+    def _fetch_reverse(self, latitude: float, longitude: float) -> Optional[Dict]:
+        """Consulta o Nominatim para reverse_geocode (sem cache)"""
         try:
             params = {
                 'lat': latitude,
@@ -78,13 +280,9 @@ class NominatimGeocodingService:
                 'addressdetails': 1
             }
             
-            response = requests.get(
-                f"{self.base_url}/reverse",
-                params=params,
-                headers=self.headers,
-                timeout=10
-            )
-            response.raise_for_status()
+            response = self._get("/reverse", params)
+            if response is None:
+                return None
             
             data = response.json()
             
@@ -110,6 +308,11 @@ class NominatimGeocodingService:
         """
         Busca pontos de interesse próximos
         
+        Resultados ficam em cache por célula de grade de ~1/10 do raio: a
+        consulta ao Nominatim usa a caixa do raio acrescida de duas células,
+        que cobre o raio de qualquer ponto da mesma célula, e a distância é
+        recalculada a partir do ponto pedido.
+        
         Args:
             latitude: Latitude central
             longitude: Longitude central
@@ -119,47 +322,105 @@ class NominatimGeocodingService:
         Returns:
             Lista de pontos encontrados
         """
+        cell = max(self.reverse_cell_size_m, radius / 10)
+        key = f"nearby:{grid_cell_key(latitude, longitude, cell)}:{radius:g}:{normalize_address(query)}"
+        items = self.nearby_cache.get_or_load(
+            key, lambda: self._fetch_nearby(latitude, longitude, query, radius + 2 * cell))
+        if not items:
+            return []
+        
+        # A caixa inclui os cantos fora do círculo: filtrar pelo raio e
+        # ordenar pela distância
+        distances = haversine_many(latitude, longitude,
+                                   [item['latitude'] for item in items], [item['longitude'] for item in items])
+        results = [{**item, 'distance': round(float(distance), 1)}
+                   for item, distance in zip(items, distances) if distance <= radius]
+        return sorted(results, key=lambda r: r['distance'])[:10]
+    
+    def _fetch_nearby(self, latitude: float, longitude: float,
+                      query: str, radius: float) -> Optional[List[Dict]]:
+        """Consulta o Nominatim para search_nearby (sem cache; None em caso de erro)"""
         try:
-            # Calcular boundingbox aproximado
-            lat_offset = radius / 111320  # 1 grau lat ≈ 111320 metros
-            lon_offset = radius / (111320 * abs(latitude))
+            # Caixa envolvente do raio (largura em longitude corrigida pela latitude)
+            min_lat, min_lng, max_lat, max_lng = bounding_box(latitude, longitude, radius)
             
-            viewbox = f"{longitude - lon_offset},{latitude + lat_offset},{longitude + lon_offset},{latitude - lat_offset}"
+            viewbox = f"{min_lng},{max_lat},{max_lng},{min_lat}"
             
             params = {
                 'q': query,
                 'format': 'json',
                 'addressdetails': 1,
-                'limit': 10,
+                'limit': 20,
                 'viewbox': viewbox,
                 'bounded': 1
             }
             
-            response = requests.get(
-                f"{self.base_url}/search",
-                params=params,
-                headers=self.headers,
-                timeout=10
-            )
-            response.raise_for_status()
+            response = self._get("/search", params)
+            if response is None:
+                return None
             
             data = response.json()
             
-            results = []
-            for item in data:
-                results.append({
+            return [
+                {
                     'latitude': float(item['lat']),
                     'longitude': float(item['lon']),
                     'display_name': item['display_name'],
                     'address': item.get('address', {}),
                     'importance': item.get('importance', 0)
-                })
-            
-            return results
+                }
+                for item in data
+            ]
             
         except requests.RequestException as e:
             print(f"Erro na busca nearby: {e}")
-            return []
+            return None
         except Exception as e:
             print(f"Erro inesperado na busca nearby: {e}")
-            return []
+            return None
+
+
+class FallbackGeocodingService:
+    """
+    Encadeia dois geocodificadores: consulta o primário e, quando ele não
+    encontra o endereço, o secundário (ex: gazetteer offline -> Nominatim)
+    """
+    
+    def __init__(self, primary, fallback):
+        """
+        Args:
+            primary: Geocodificador consultado primeiro
+            fallback: Geocodificador usado quando o primário não encontra
+        """
+        self.primary = primary
+        self.fallback = fallback
+    
+    def cache_stats(self) -> Dict:
+        return {
+            'primary': self.primary.cache_stats(),
+            'fallback': self.fallback.cache_stats()
+        }
+    
+    def geocode_address(self, address: str) -> Optional[Dict]:
+        return self.primary.geocode_address(address) or self.fallback.geocode_address(address)
+    
+    def geocode_many(self, addresses: List[str], deadline: float) -> List[Optional[Dict]]:
+        """Como geocode_address, em lote; o secundário recebe o que sobrar do prazo"""
+        started = time.monotonic()
+        results = self.primary.geocode_many(addresses, deadline)
+        missing = [i for i, result in enumerate(results) if result is None]
+        remaining = deadline - (time.monotonic() - started)
+        if missing and remaining > 0:
+            found = self.fallback.geocode_many([addresses[i] for i in missing], remaining)
+            for i, result in zip(missing, found):
+                results[i] = result
+        return results
+    
+    def reverse_geocode(self, latitude: float, longitude: float) -> Optional[Dict]:
+        return (self.primary.reverse_geocode(latitude, longitude)
+                or self.fallback.reverse_geocode(latitude, longitude))
+    
+    def search_nearby(self, latitude: float, longitude: float,
+                      query: str, radius: int = 1000) -> List[Dict]:
+        return (self.primary.search_nearby(latitude, longitude, query, radius)
+                or self.fallback.search_nearby(latitude, longitude, query, radius))
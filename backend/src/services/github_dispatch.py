@@ -0,0 +1,53 @@
+import os
+from typing import Dict
+from src.services.http_client import get_session
+
+
+class DispatchSkipped(Exception):
+    """O disparo não foi feito por falta de configuração (ex: GITHUB_TOKEN)"""
+
+
+class DispatchError(Exception):
+    """Falha ao disparar o evento; pode ser tentado novamente"""
+
+
+def dispatch_github_event(event_type: str, client_payload: Dict) -> None:
+    """
+    Dispara um repository_dispatch no GitHub Actions
+
+    Args:
+        event_type: Tipo do evento (ex: "message_sent")
+        client_payload: Dados enviados ao workflow
+
+    Raises:
+        DispatchSkipped: GITHUB_TOKEN não configurado
+        DispatchError: Erro de rede ou resposta diferente de 204
+    """
+    github_token = os.getenv('GITHUB_TOKEN')
+    if not github_token:
+        raise DispatchSkipped("GITHUB_TOKEN não configurado")
+    
+    # URL para disparar repository_dispatch
+    api_url = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+    url = f"{api_url}/repos/Jonathan0078/Uber/dispatches"
+    
+    headers = {
+        'Authorization': f'token {github_token}',
+        'Accept': 'application/vnd.github.v3+json',
+        'Content-Type': 'application/json'
+    }
+    
+    payload = {
+        'event_type': event_type,
+        'client_payload': client_payload
+    }
+    
+    session = get_session('github', pool_size=4)
+    timeout = (float(os.getenv('GITHUB_CONNECT_TIMEOUT', '3.05')), float(os.getenv('GITHUB_READ_TIMEOUT', '10')))
+    try:
+        response = session.post(url, json=payload, headers=headers, timeout=timeout)
+    except Exception as e:
+        raise DispatchError(f"Erro na requisição para GitHub: {e}") from e
+    
+    if response.status_code != 204:
+        raise DispatchError(f"Erro ao disparar GitHub Action: {response.status_code} - {response.text}")
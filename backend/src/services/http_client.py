@@ -0,0 +1,81 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Timeout padrão (conexão, leitura) em segundos
+DEFAULT_TIMEOUT: Tuple[float, float] = (3.05, 10)
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def build_session(pool_size: int = 10, retries: int = 2, backoff_factor: float = 0.3,
+                  status_forcelist: Tuple[int, ...] = (500, 502, 503, 504),
+                  headers: Optional[Dict[str, str]] = None) -> requests.Session:
+    """
+    Cria uma requests.Session com pool de conexões keep-alive e retry com backoff
+
+    Só métodos idempotentes são repetidos: um POST que expirou depois de
+    processado pelo servidor seria executado duas vezes (a outbox já repete
+    os disparos com backoff). 429 não entra no retry automático, que
+    ignoraria o limitador de taxa do chamador.
+
+    Args:
+        pool_size: Conexões mantidas abertas por host
+        retries: Número de novas tentativas em erros de conexão e status transitórios
+        backoff_factor: Fator do backoff exponencial entre tentativas
+        status_forcelist: Status HTTP que disparam nova tentativa
+        headers: Cabeçalhos padrão da sessão
+
+    Returns:
+        Sessão configurada
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+        allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=retry, pool_block=False)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def get_session(name: str, **kwargs) -> requests.Session:
+    """
+    Retorna a sessão compartilhada de um serviço, criando-a na primeira chamada
+
+    O pool de conexões do urllib3 é thread-safe, então a mesma sessão é usada
+    por todas as threads do worker.
+
+    Args:
+        name: Nome do serviço (ex: "nominatim", "osrm", "github")
+        **kwargs: Argumentos repassados a build_session na criação
+
+    Returns:
+        Sessão compartilhada
+    """
+    session = _sessions.get(name)
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = build_session(**kwargs)
+            _sessions[name] = session
+        return session
@@ -0,0 +1,67 @@
+import json
+from datetime import date, datetime
+from typing import Any, Union
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele o json da stdlib é usado
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Tipos que nem orjson nem json serializam diretamente"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'tolist'):  # escalares e arrays numpy
+        return value.tolist()
+    return DefaultJSONProvider.default(value)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Provider JSON do Flask que usa orjson quando instalado
+
+    Datas e horas são serializadas nativamente em ISO 8601 (o mesmo formato
+    de datetime.isoformat() usado nos to_dict dos modelos), então os
+    serializadores dos modelos podem devolver os objetos datetime direto.
+    Sem orjson, ou para valores que ele não aceita (ex: inteiros acima de
+    64 bits), cai no json da stdlib com o mesmo tratamento de datas.
+    """
+
+    default = staticmethod(_default)
+
+    def _orjson_options(self, indent: bool = False) -> int:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is not None and set(kwargs) <= {'default'}:
+            try:
+                return orjson.dumps(obj, default=kwargs.get('default', _default),
+                                    option=self._orjson_options()).decode()
+            except TypeError:
+                pass
+        kwargs.setdefault('default', _default)
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        if orjson is not None:
+            try:
+                body = orjson.dumps(obj, default=_default, option=self._orjson_options(indent))
+                return self._app.response_class(body, mimetype=self.mimetype)
+            except TypeError:
+                pass
+        return super().response(obj)
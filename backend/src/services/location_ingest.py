@@ -0,0 +1,208 @@
+import atexit
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text, bindparam, DateTime
+
+from src.models.user import db
+from src.services.geo import geohash_encode
+
+# (latitude, longitude, atualizado_em)
+LocationRecord = Tuple[float, float, datetime]
+
+_FLUSH_SQL = text(
+    'UPDATE users SET latitude = :latitude, longitude = :longitude, geohash = :geohash, '
+    'location_updated_at = :updated_at '
+    'WHERE id = :user_id AND (location_updated_at IS NULL OR location_updated_at <= :updated_at)'
+).bindparams(bindparam('updated_at', type_=DateTime))
+
+
+def bulk_update_locations(conn, records: Dict[int, LocationRecord]) -> None:
+    """
+    Grava posições na tabela users com um único UPDATE em lote (executemany)
+
+    Linhas cujo location_updated_at já é mais recente não são alteradas.
+
+    Args:
+        conn: Conexão SQLAlchemy dentro de uma transação
+        records: Posição por user_id
+    """
+    params = [
+        {
+            'user_id': user_id,
+            'latitude': latitude,
+            'longitude': longitude,
+            'geohash': geohash_encode(latitude, longitude),
+            'updated_at': updated_at
+        }
+        for user_id, (latitude, longitude, updated_at) in records.items()
+    ]
+    if params:
+        conn.execute(_FLUSH_SQL, params)
+
+
+class LocationIngestor:
+    """
+    Buffer em memória para pings de localização de alta frequência
+
+    Cada ping apenas substitui a última posição do usuário em um dicionário.
+    Uma thread em background grava periodicamente as posições pendentes na
+    tabela users com um único UPDATE em lote (executemany), de modo que N
+    pings do mesmo motorista entre dois flushes custam uma única escrita.
+    Leituras da posição atual são servidas a partir da memória.
+
+    Posições já gravadas e sem ping há mais de retain_seconds saem da
+    memória (a leitura volta a ser pelo banco), junto com a marcação de
+    usuário conhecido, para que o buffer não cresça com todo usuário já visto.
+    """
+
+    def __init__(self, app, flush_interval: float = 1.0, retain_seconds: float = 300):
+        """
+        Args:
+            app: Aplicação Flask (para abrir o contexto do banco)
+            flush_interval: Intervalo entre gravações em lote, em segundos
+            retain_seconds: Tempo que uma posição já gravada fica em memória
+                depois do último ping
+        """
+        self.app = app
+        self.flush_interval = flush_interval
+        self.retain_seconds = retain_seconds
+        self._next_prune = time.monotonic() + retain_seconds / 10
+        self._lock = threading.Lock()
+        self._latest: Dict[int, LocationRecord] = {}
+        self._pending: Dict[int, LocationRecord] = {}
+        self._known_users = set()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.pings = 0
+        self.flushed_rows = 0
+        self.flushes = 0
+        self.pruned = 0
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='location-ingestor', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Erro ao gravar localizações: {e}")
+
+    def is_known_user(self, user_id: int) -> bool:
+        return user_id in self._known_users
+
+    def mark_known_user(self, user_id: int) -> None:
+        self._known_users.add(user_id)
+
+    def forget_user(self, user_id: int) -> None:
+        """Descarta o estado de um usuário removido"""
+        with self._lock:
+            self._known_users.discard(user_id)
+            self._latest.pop(user_id, None)
+            self._pending.pop(user_id, None)
+
+    def record(self, user_id: int, latitude: float, longitude: float,
+               updated_at: Optional[datetime] = None) -> LocationRecord:
+        """
+        Registra um ping de localização
+
+        Pings mais antigos que a posição já conhecida são ignorados.
+
+        Returns:
+            Posição atual do usuário após o ping
+        """
+        record = (latitude, longitude, updated_at or datetime.utcnow())
+        with self._lock:
+            self.pings += 1
+            current = self._latest.get(user_id)
+            if current is not None and current[2] > record[2]:
+                return current
+            self._latest[user_id] = record
+            self._pending[user_id] = record
+        return record
+
+    def remember(self, user_id: int, record: LocationRecord) -> None:
+        """Atualiza a posição em memória com um valor já gravado no banco"""
+        with self._lock:
+            current = self._latest.get(user_id)
+            if current is None or current[2] <= record[2]:
+                self._latest[user_id] = record
+            self._known_users.add(user_id)
+
+    def get(self, user_id: int) -> Optional[LocationRecord]:
+        """Posição atual conhecida em memória (None se não houver ping neste worker)"""
+        return self._latest.get(user_id)
+
+    def prune(self) -> int:
+        """
+        Descarta as posições gravadas sem ping há mais de retain_seconds
+
+        Returns:
+            Número de usuários descartados
+        """
+        self._next_prune = time.monotonic() + self.retain_seconds / 10
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retain_seconds)
+        with self._lock:
+            idle = [user_id for user_id, record in self._latest.items()
+                    if record[2] < cutoff and user_id not in self._pending]
+            for user_id in idle:
+                del self._latest[user_id]
+            # Conhecido só enquanto tem posição em memória: depois disso o
+            # próximo ping confirma de novo no banco que o usuário existe
+            self._known_users.intersection_update(self._latest)
+            self.pruned += len(idle)
+        return len(idle)
+
+    def flush(self) -> int:
+        """
+        Grava as posições pendentes em um único UPDATE em lote
+
+        Returns:
+            Número de usuários gravados
+        """
+        if time.monotonic() >= self._next_prune:
+            self.prune()
+        with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    bulk_update_locations(conn, pending)
+        except Exception:
+            # Devolve ao buffer o que não foi sobrescrito por pings mais novos
+            with self._lock:
+                for user_id, record in pending.items():
+                    self._pending.setdefault(user_id, record)
+            raise
+
+        self.flushes += 1
+        self.flushed_rows += len(pending)
+        return len(pending)
+
+    def stats(self) -> Dict:
+        return {
+            'pings': self.pings,
+            'pending': len(self._pending),
+            'tracked_users': len(self._latest),
+            'known_users': len(self._known_users),
+            'pruned': self.pruned,
+            'flushes': self.flushes,
+            'flushed_rows': self.flushed_rows
+        }
@@ -0,0 +1,181 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from src.models.user import db
+from src.models.outbox import OutboxEvent
+from src.services.github_dispatch import dispatch_github_event, DispatchSkipped
+
+
+def enqueue_event(event_type: str, payload: Dict) -> OutboxEvent:
+    """
+    Adiciona um evento à outbox na sessão atual
+
+    O evento só é gravado no commit da transação do chamador, junto com as
+    demais alterações (ex: a Message que originou a notificação).
+    """
+    event = OutboxEvent(event_type=event_type, status='pending', attempts=0,
+                        next_attempt_at=datetime.utcnow())
+    event.set_payload(payload)
+    db.session.add(event)
+    return event
+
+
+class OutboxWorker:
+    """
+    Worker em background que entrega os eventos da outbox
+
+    Cada ciclo reserva um lote de eventos pendentes, dispara cada um e grava o
+    resultado logo em seguida, com um UPDATE condicionado ao lease: se outro
+    worker reservou o evento depois que o lease venceu, o resultado deste é
+    descartado. Eventos que não cabem mais no lease (dispatch_timeout) são
+    devolvidos em vez de entregues. Falhas são reagendadas com backoff
+    exponencial até max_attempts; depois disso o evento fica como 'failed'.
+    """
+
+    def __init__(self, app, dispatcher: Callable[[str, Dict], None] = dispatch_github_event,
+                 batch_size: int = 20, poll_interval: float = 2.0, max_attempts: int = 8,
+                 backoff_base: float = 2.0, backoff_max: float = 300.0, lease_seconds: float = 60.0,
+                 dispatch_timeout: float = 15.0):
+        """
+        Args:
+            app: Aplicação Flask (para abrir o contexto do banco)
+            dispatcher: Função que entrega um evento; lança exceção em falha
+            batch_size: Eventos reservados por ciclo
+            poll_interval: Intervalo máximo entre ciclos em segundos
+            max_attempts: Tentativas antes de marcar o evento como 'failed'
+            backoff_base: Espera após a primeira falha em segundos (dobra a cada tentativa)
+            backoff_max: Espera máxima entre tentativas em segundos
+            lease_seconds: Tempo de reserva de um evento; se o worker morrer no
+                meio do envio, o evento volta a ficar disponível depois disso
+            dispatch_timeout: Duração máxima de uma entrega (timeouts de conexão
+                e leitura do dispatcher); deve ser menor que lease_seconds
+        """
+        if dispatch_timeout >= lease_seconds:
+            raise ValueError("lease_seconds deve ser maior que dispatch_timeout")
+        self.app = app
+        self.dispatcher = dispatcher
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.dispatch_timeout = dispatch_timeout
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='outbox-worker', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def notify(self) -> None:
+        """Acorda o worker imediatamente (chamado após gravar um novo evento)"""
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                processed = self.run_once()
+            except Exception as e:
+                print(f"Erro no worker da outbox: {e}")
+                processed = 0
+            # Lote cheio: provavelmente há mais eventos, continuar sem esperar
+            if processed < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _backoff(self, attempts: int) -> timedelta:
+        delay = min(self.backoff_base * (2 ** max(attempts - 1, 0)), self.backoff_max)
+        return timedelta(seconds=delay)
+
+    def _claim_batch(self):
+        """Reserva um lote de eventos pendentes, estendendo next_attempt_at pelo lease"""
+        now = datetime.utcnow()
+        candidates = (OutboxEvent.query
+                      .filter(OutboxEvent.status == 'pending', OutboxEvent.next_attempt_at <= now)
+                      .order_by(OutboxEvent.id)
+                      .limit(self.batch_size)
+                      .all())
+        if not candidates:
+            return []
+
+        lease_until = now + timedelta(seconds=self.lease_seconds)
+        claimed = []
+        for event in candidates:
+            # UPDATE condicional: outro worker pode ter reservado o mesmo evento
+            result = db.session.execute(
+                db.update(OutboxEvent)
+                .where(OutboxEvent.id == event.id,
+                       OutboxEvent.status == 'pending',
+                       OutboxEvent.next_attempt_at == event.next_attempt_at)
+                .values(next_attempt_at=lease_until, attempts=OutboxEvent.attempts + 1)
+            )
+            if result.rowcount == 1:
+                claimed.append(event.id)
+        db.session.commit()
+        return OutboxEvent.query.filter(OutboxEvent.id.in_(claimed)).order_by(OutboxEvent.id).all()
+
+    def _deliver(self, event_id: int, event_type: str, payload: Dict, attempts: int) -> Dict:
+        """Dispara um evento e devolve as colunas a gravar com o resultado"""
+        try:
+            self.dispatcher(event_type, payload)
+            return {'status': 'sent', 'sent_at': datetime.utcnow(), 'last_error': None}
+        except DispatchSkipped as e:
+            return {'status': 'skipped', 'last_error': str(e)}
+        except Exception as e:
+            print(f"Erro ao entregar evento {event_id} da outbox: {e}")
+            if attempts >= self.max_attempts:
+                return {'status': 'failed', 'last_error': str(e)}
+            return {'last_error': str(e), 'next_attempt_at': datetime.utcnow() + self._backoff(attempts)}
+
+    def _leased(self, event_ids, lease_until: datetime):
+        """UPDATE restrito aos eventos ainda reservados por este lease"""
+        return (db.update(OutboxEvent)
+                .where(OutboxEvent.id.in_(event_ids),
+                       OutboxEvent.status == 'pending',
+                       OutboxEvent.next_attempt_at == lease_until))
+
+    def run_once(self) -> int:
+        """
+        Executa um ciclo do worker
+
+        Returns:
+            Número de eventos processados
+        """
+        with self.app.app_context():
+            try:
+                # O next_attempt_at gravado na reserva identifica o lease
+                batch = [(event.id, event.event_type, event.get_payload(), event.attempts, event.next_attempt_at)
+                         for event in self._claim_batch()]
+                for index, (event_id, event_type, payload, attempts, lease_until) in enumerate(batch):
+                    if datetime.utcnow() + timedelta(seconds=self.dispatch_timeout) > lease_until:
+                        # Lease acabando: devolver o resto do lote sem contar a tentativa
+                        db.session.execute(
+                            self._leased([item[0] for item in batch[index:]], lease_until)
+                            .values(next_attempt_at=datetime.utcnow(), attempts=OutboxEvent.attempts - 1)
+                        )
+                        db.session.commit()
+                        return index
+
+                    values = self._deliver(event_id, event_type, payload, attempts)
+                    result = db.session.execute(self._leased([event_id], lease_until).values(**values))
+                    db.session.commit()
+                    if result.rowcount != 1:
+                        print(f"Evento {event_id} da outbox foi reservado por outro worker; resultado descartado")
+                return len(batch)
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
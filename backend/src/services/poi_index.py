@@ -0,0 +1,207 @@
+import math
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from src.services.gazetteer import ADDRESS_FIELDS, address_tokens, format_display_name
+from src.services.geo import METERS_PER_DEGREE, bounding_box, haversine_many
+
+# Termos comuns de busca -> categorias OSM (chave=valor) de records_from_osm
+CATEGORY_ALIASES = {
+    'hospital': ('amenity=hospital', 'amenity=clinic'),
+    'pronto socorro': ('amenity=hospital', 'amenity=clinic'),
+    'farmacia': ('amenity=pharmacy',),
+    'drogaria': ('amenity=pharmacy',),
+    'posto': ('amenity=fuel',),
+    'posto de gasolina': ('amenity=fuel',),
+    'posto de combustivel': ('amenity=fuel',),
+    'restaurante': ('amenity=restaurant',),
+    'lanchonete': ('amenity=fast_food',),
+    'cafe': ('amenity=cafe',),
+    'bar': ('amenity=bar', 'amenity=pub'),
+    'padaria': ('shop=bakery',),
+    'mercado': ('shop=supermarket', 'shop=convenience'),
+    'supermercado': ('shop=supermarket',),
+    'shopping': ('shop=mall',),
+    'banco': ('amenity=bank',),
+    'caixa eletronico': ('amenity=atm',),
+    'estacionamento': ('amenity=parking',),
+    'hotel': ('tourism=hotel',),
+    'escola': ('amenity=school',),
+    'universidade': ('amenity=university',),
+    'parque': ('leisure=park',),
+    'delegacia': ('amenity=police',),
+}
+
+
+class PoiIndex:
+    """
+    Pontos de interesse em memória com índice de grade
+
+    Os POIs ficam em arrays NumPy ordenados pela célula da grade (linha e
+    coluna de cell_size_m graus-metro), então as células da caixa
+    envolvente do raio viram poucos intervalos contíguos achados com
+    searchsorted. Os candidatos passam pela caixa geodésica exata
+    (bounding_box), pelo filtro de categoria e só então pela haversine,
+    que ordena o resultado.
+    """
+
+    def __init__(self, records: Iterable[Dict], cell_size_m: float = 500):
+        """
+        Args:
+            records: Registros no formato de build_gazetteer (latitude,
+                longitude, name, category, ...; ex: records_from_osm); só
+                os com category entram
+            cell_size_m: Lado da célula da grade em metros (no equador)
+        """
+        self.step = cell_size_m / METERS_PER_DEGREE
+        self.columns = math.ceil(360 / self.step) + 1
+        pois = []
+        for record in records:
+            if record.get('category'):
+                record = dict(record)
+                record['display_name'] = record.get('display_name') or format_display_name(record)
+                pois.append(record)
+
+        latitudes = np.array([float(poi['latitude']) for poi in pois], dtype=float)
+        longitudes = np.array([float(poi['longitude']) for poi in pois], dtype=float)
+        cells = self._rows(latitudes) * self.columns + self._columns(longitudes)
+        order = np.argsort(cells, kind='stable')
+        self._cells = cells[order]
+        self._latitudes = latitudes[order]
+        self._longitudes = longitudes[order]
+        self._pois = [pois[i] for i in order]
+        self._search = [address_tokens(poi['display_name']) for poi in self._pois]
+
+        self.categories = sorted({poi['category'] for poi in self._pois})
+        codes = {category: code for code, category in enumerate(self.categories)}
+        self._codes = np.array([codes[poi['category']] for poi in self._pois], dtype=np.int32)
+        self._lock = threading.Lock()
+        self.queries = 0
+
+    @classmethod
+    def from_gazetteer(cls, path: str, cell_size_m: float = 500) -> 'PoiIndex':
+        """POIs (lugares com categoria) de um banco gerado por build_gazetteer"""
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute('SELECT * FROM places WHERE category IS NOT NULL').fetchall()
+        finally:
+            conn.close()
+        return cls((dict(row) for row in rows), cell_size_m)
+
+    def _rows(self, latitudes):
+        return np.floor((np.asarray(latitudes) + 90) / self.step).astype(np.int64)
+
+    def _columns(self, longitudes):
+        return np.floor((np.asarray(longitudes) + 180) / self.step).astype(np.int64)
+
+    def _category_codes(self, names: Sequence[str]) -> np.ndarray:
+        """Códigos das categorias pedidas ("amenity=fuel", "fuel" ou um termo de CATEGORY_ALIASES)"""
+        wanted = set()
+        for name in names:
+            if '=' in name:
+                wanted.add(name.strip())
+                continue
+            text = ' '.join(address_tokens(name))
+            wanted.update(CATEGORY_ALIASES.get(text, ()))
+            wanted.update(category for category in self.categories if category.split('=', 1)[1] == text)
+        return np.array([code for code, category in enumerate(self.categories) if category in wanted],
+                        dtype=np.int32)
+
+    def _in_box(self, latitude: float, longitude: float, radius: float) -> np.ndarray:
+        """Índices dos POIs dentro da caixa geodésica do raio"""
+        min_lat, min_lng, max_lat, max_lng = bounding_box(latitude, longitude, radius)
+        rows = np.arange(self._rows(min_lat), self._rows(max_lat) + 1)
+        if min_lng <= max_lng:
+            spans = [(self._columns(min_lng), self._columns(max_lng))]
+        else:
+            spans = [(self._columns(min_lng), self.columns - 1), (0, self._columns(max_lng))]
+        lows = np.concatenate([rows * self.columns + first for first, _ in spans])
+        highs = np.concatenate([rows * self.columns + last for _, last in spans])
+        starts = np.searchsorted(self._cells, lows, side='left')
+        ends = np.searchsorted(self._cells, highs, side='right')
+        ranges = [np.arange(start, end) for start, end in zip(starts.tolist(), ends.tolist()) if end > start]
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.concatenate(ranges)
+
+        # As células passam da caixa: cortar pela caixa exata antes da haversine
+        lats = self._latitudes[candidates]
+        lngs = self._longitudes[candidates]
+        mask = (lats >= min_lat) & (lats <= max_lat)
+        if min_lng <= max_lng:
+            mask &= (lngs >= min_lng) & (lngs <= max_lng)
+        else:
+            mask &= (lngs >= min_lng) | (lngs <= max_lng)
+        return candidates[mask]
+
+    def search_nearby(self, latitude: float, longitude: float, query: Optional[str] = None,
+                      radius: int = 1000, categories: Optional[Sequence[str]] = None,
+                      limit: int = 10) -> List[Dict]:
+        """
+        Busca POIs próximos
+
+        Args:
+            latitude: Latitude central
+            longitude: Longitude central
+            query: Nome (ex: "drogasil") ou tipo de lugar (ex: "farmácia",
+                "posto de gasolina"); tipos conhecidos viram filtro de categoria
+            radius: Raio de busca em metros
+            categories: Categorias aceitas ("amenity=fuel", "fuel" ou "posto")
+            limit: Máximo de resultados
+
+        Returns:
+            POIs ordenados pela distância, no formato de search_nearby do
+            NominatimGeocodingService (mais name e category)
+        """
+        with self._lock:
+            self.queries += 1
+        words = address_tokens(query or '')
+        if not categories and words:
+            codes = self._category_codes([query])
+            if codes.size:
+                categories, words = [query], []
+        candidates = self._in_box(latitude, longitude, radius)
+        if categories:
+            codes = self._category_codes(categories)
+            candidates = candidates[np.isin(self._codes[candidates], codes)]
+        if not candidates.size:
+            return []
+        distances = haversine_many(latitude, longitude, self._latitudes[candidates], self._longitudes[candidates])
+        inside = distances <= radius
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+
+        results = []
+        *exact, last = words or ['']
+        for i in order.tolist():
+            index = int(candidates[i])
+            if words:
+                found = self._search[index]
+                if not (all(word in found for word in exact) and any(term.startswith(last) for term in found)):
+                    continue
+            poi = self._pois[index]
+            results.append({
+                'latitude': float(self._latitudes[index]),
+                'longitude': float(self._longitudes[index]),
+                'display_name': poi['display_name'],
+                'name': poi.get('name'),
+                'category': poi['category'],
+                'address': {field: poi[field] for field in ADDRESS_FIELDS if poi.get(field)},
+                'importance': 0,
+                'distance': round(float(distances[i]), 1)
+            })
+            if len(results) >= limit:
+                break
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            'pois': len(self._pois),
+            'cells': int(np.unique(self._cells).size),
+            'categories': len(self.categories),
+            'queries': self.queries
+        }
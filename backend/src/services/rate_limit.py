@@ -0,0 +1,135 @@
+import os
+import struct
+import threading
+import time
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava de arquivo, limite apenas por processo
+    fcntl = None
+
+# Estado persistido: tokens disponíveis e horário (time.time) da última atualização
+_STATE = struct.Struct('dd')
+
+
+class RateGovernor:
+    """
+    Token bucket que enfileira as chamadas em vez de rejeitá-las
+
+    Cada acquire() reserva o próximo token e dorme até o horário dele, então
+    as chamadas saem espaçadas na taxa configurada e na ordem em que
+    chegaram. Com state_path o balde fica em um arquivo protegido por flock
+    e é compartilhado por todos os workers da máquina (ex: gunicorn com
+    vários processos); sem ele vale só para as threads do processo.
+    """
+
+    def __init__(self, rate: float = 1.0, burst: float = 1.0,
+                 state_path: Optional[str] = None, max_wait: float = 10.0):
+        """
+        Args:
+            rate: Tokens por segundo
+            burst: Tokens acumulados no máximo quando ocioso
+            state_path: Arquivo com o estado compartilhado entre processos
+            max_wait: Espera máxima por um token; acima disso acquire()
+                desiste sem consumir o token
+        """
+        self.rate = rate
+        self.burst = burst
+        self.state_path = state_path if fcntl is not None else None
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._updated = time.time()
+        self.acquired = 0
+        self.rejected = 0
+        self.waited = 0.0
+        self.penalties = 0
+
+    def _reserve(self, max_wait: float, now: float, tokens: float, updated: float):
+        """Reserva um token no estado (tokens, updated); retorna (espera, tokens, updated)"""
+        tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+        wait = max(0.0, (1.0 - tokens) / self.rate)
+        if wait > max_wait:
+            return None, tokens, now
+        return wait, tokens - 1.0, now
+
+    def _drain(self, seconds: float, now: float, tokens: float, updated: float):
+        """Zera o balde e adia o próximo token em seconds; retorna (None, tokens, updated)"""
+        tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+        return None, min(tokens, 0.0) - seconds * self.rate, now
+
+    def _update_shared(self, update):
+        """Aplica update(now, tokens, updated) ao estado do arquivo sob flock"""
+        fd = os.open(self.state_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.pread(fd, _STATE.size, 0)
+            now = time.time()
+            tokens, updated = _STATE.unpack(raw) if len(raw) == _STATE.size else (self.burst, now)
+            result, tokens, updated = update(now, tokens, updated)
+            os.pwrite(fd, _STATE.pack(tokens, updated), 0)
+            return result
+        finally:
+            os.close(fd)  # fechar o descritor libera o flock
+
+    def acquire(self, max_wait: Optional[float] = None) -> bool:
+        """
+        Espera um token
+
+        Args:
+            max_wait: Espera máxima em segundos (padrão: self.max_wait)
+
+        Returns:
+            True quando liberado; False se a fila passaria do tempo máximo
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        with self._lock:
+            if self.state_path:
+                try:
+                    wait = self._update_shared(
+                        lambda now, tokens, updated: self._reserve(max_wait, now, tokens, updated))
+                except OSError as e:
+                    print(f"Erro no estado compartilhado do limitador: {e}")
+                    self.state_path = None
+            if not self.state_path:
+                wait, self._tokens, self._updated = self._reserve(
+                    max_wait, time.time(), self._tokens, self._updated)
+            if wait is None:
+                self.rejected += 1
+                return False
+            self.acquired += 1
+            self.waited += wait
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def penalize(self, seconds: float) -> None:
+        """
+        Suspende a liberação de tokens por seconds (ex: resposta 429 com Retry-After)
+
+        Chamadas já na fila não são afetadas; as seguintes esperam o
+        intervalo normal mais seconds.
+        """
+        with self._lock:
+            self.penalties += 1
+            if self.state_path:
+                try:
+                    self._update_shared(
+                        lambda now, tokens, updated: self._drain(seconds, now, tokens, updated))
+                    return
+                except OSError as e:
+                    print(f"Erro no estado compartilhado do limitador: {e}")
+                    self.state_path = None
+            _, self._tokens, self._updated = self._drain(seconds, time.time(), self._tokens, self._updated)
+
+    def stats(self) -> Dict:
+        return {
+            'rate': self.rate,
+            'burst': self.burst,
+            'shared': bool(self.state_path),
+            'acquired': self.acquired,
+            'rejected': self.rejected,
+            'penalties': self.penalties,
+            'waited_seconds': round(self.waited, 3)
+        }
@@ -0,0 +1,381 @@
+import heapq
+import math
+import threading
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.services.geo import EARTH_RADIUS_M, METERS_PER_DEGREE, haversine_many
+from src.services.routing import RoutingBackend
+
+# Velocidade padrão por tipo de via (km/h) quando a via não tem maxspeed
+HIGHWAY_SPEEDS_KMH = {
+    'motorway': 100, 'motorway_link': 60,
+    'trunk': 80, 'trunk_link': 50,
+    'primary': 60, 'primary_link': 40,
+    'secondary': 50, 'secondary_link': 35,
+    'tertiary': 40, 'tertiary_link': 30,
+    'unclassified': 30, 'residential': 30,
+    'living_street': 10, 'service': 20,
+}
+
+
+def _parse_maxspeed(value: Optional[str]) -> Optional[float]:
+    """Converte a tag maxspeed do OSM ("60", "40 mph") em km/h"""
+    if not value:
+        return None
+    parts = value.split()
+    try:
+        speed = float(parts[0])
+    except ValueError:
+        return None
+    return speed * 1.609 if len(parts) > 1 and parts[1] == 'mph' else speed
+
+
+class RoadGraph:
+    """
+    Grafo viário compacto em arrays CSR (NumPy)
+
+    Os vizinhos do nó i são indices[indptr[i]:indptr[i + 1]], com distância
+    (m) e duração (s) de cada aresta nos arrays paralelos. O grafo é
+    direcionado: vias de mão dupla viram duas arestas.
+    """
+
+    def __init__(self, node_lat: np.ndarray, node_lng: np.ndarray, indptr: np.ndarray,
+                 indices: np.ndarray, distance_m: np.ndarray, duration_s: np.ndarray,
+                 snap_cell_m: float = 250):
+        """
+        Args:
+            node_lat: Latitude de cada nó
+            node_lng: Longitude de cada nó
+            indptr: Início da lista de arestas de cada nó (tamanho n + 1)
+            indices: Nó de destino de cada aresta
+            distance_m: Comprimento de cada aresta em metros
+            duration_s: Tempo de percurso de cada aresta em segundos
+            snap_cell_m: Lado da célula da grade usada para achar o nó mais próximo
+        """
+        self.node_lat = np.asarray(node_lat, dtype=float)
+        self.node_lng = np.asarray(node_lng, dtype=float)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.distance_m = np.asarray(distance_m, dtype=float)
+        self.duration_s = np.asarray(duration_s, dtype=float)
+        self.snap_cell_m = snap_cell_m
+        # Limite inferior do tempo por metro para a heurística do A*
+        speeds = self.distance_m / np.maximum(self.duration_s, 1e-9)
+        self.max_speed_mps = float(speeds.max()) if speeds.size else 1.0
+        # Listas Python: acesso elemento a elemento no laço do A* é bem mais
+        # rápido do que indexar arrays NumPy
+        self._indptr = self.indptr.tolist()
+        self._indices = self.indices.tolist()
+        self._distance = self.distance_m.tolist()
+        self._duration = self.duration_s.tolist()
+        self._lat_rad = np.radians(self.node_lat).tolist()
+        self._lng_rad = np.radians(self.node_lng).tolist()
+        self._build_snap_grid()
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_lat)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices)
+
+    @classmethod
+    def from_edges(cls, node_lat: Sequence[float], node_lng: Sequence[float],
+                   edges: Iterable[Tuple[int, int, float]], **kwargs) -> 'RoadGraph':
+        """
+        Monta o grafo a partir de uma lista de arestas
+
+        Args:
+            node_lat: Latitude de cada nó
+            node_lng: Longitude de cada nó
+            edges: Arestas direcionadas (origem, destino, velocidade em m/s);
+                o comprimento é calculado pelas coordenadas
+        """
+        node_lat = np.asarray(node_lat, dtype=float)
+        node_lng = np.asarray(node_lng, dtype=float)
+        edge_array = np.array(list(edges), dtype=float).reshape(-1, 3)
+        sources = edge_array[:, 0].astype(np.int64)
+        targets = edge_array[:, 1].astype(np.int64)
+        lat1, lng1 = node_lat[sources], node_lng[sources]
+        lat2, lng2 = node_lat[targets], node_lng[targets]
+        phi1, phi2 = np.radians(lat1), np.radians(lat2)
+        a = (np.sin((phi2 - phi1) / 2) ** 2
+             + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lng2 - lng1) / 2) ** 2)
+        distance = 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+        duration = distance / np.maximum(edge_array[:, 2], 0.1)
+
+        order = np.argsort(sources, kind='stable')
+        indptr = np.zeros(len(node_lat) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(node_lat)), out=indptr[1:])
+        return cls(node_lat, node_lng, indptr, targets[order], distance[order], duration[order], **kwargs)
+
+    @classmethod
+    def from_osm(cls, path: str, **kwargs) -> 'RoadGraph':
+        """
+        Monta o grafo a partir de um extrato OSM em XML (.osm)
+
+        Apenas vias com tag highway trafegáveis por carro (HIGHWAY_SPEEDS_KMH)
+        são incluídas; oneway=yes/-1 e maxspeed são respeitados. Nós que não
+        pertencem a nenhuma via são descartados.
+        """
+        coordinates: Dict[int, Tuple[float, float]] = {}
+        ways: List[Tuple[List[int], float, int]] = []
+        for _, element in ET.iterparse(path, events=('end',)):
+            if element.tag == 'node':
+                coordinates[int(element.get('id'))] = (float(element.get('lat')), float(element.get('lon')))
+                element.clear()
+            elif element.tag == 'way':
+                tags = {tag.get('k'): tag.get('v') for tag in element.iter('tag')}
+                highway = tags.get('highway')
+                if highway in HIGHWAY_SPEEDS_KMH:
+                    speed_kmh = _parse_maxspeed(tags.get('maxspeed')) or HIGHWAY_SPEEDS_KMH[highway]
+                    oneway = tags.get('oneway')
+                    direction = 1 if oneway in ('yes', 'true', '1') else -1 if oneway == '-1' else 0
+                    if highway in ('motorway', 'motorway_link') and oneway is None:
+                        direction = 1
+                    refs = [int(nd.get('ref')) for nd in element.iter('nd')]
+                    ways.append((refs, speed_kmh / 3.6, direction))
+                element.clear()
+
+        index: Dict[int, int] = {}
+        node_lat: List[float] = []
+        node_lng: List[float] = []
+
+        def node_index(osm_id: int) -> int:
+            if osm_id not in index:
+                index[osm_id] = len(node_lat)
+                lat, lng = coordinates[osm_id]
+                node_lat.append(lat)
+                node_lng.append(lng)
+            return index[osm_id]
+
+        edges = []
+        for refs, speed, direction in ways:
+            refs = [ref for ref in refs if ref in coordinates]
+            for a, b in zip(refs, refs[1:]):
+                u, v = node_index(a), node_index(b)
+                if direction >= 0:
+                    edges.append((u, v, speed))
+                if direction <= 0:
+                    edges.append((v, u, speed))
+        return cls.from_edges(node_lat, node_lng, edges, **kwargs)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> 'RoadGraph':
+        """Carrega um grafo salvo com save()"""
+        with np.load(path) as data:
+            return cls(data['node_lat'], data['node_lng'], data['indptr'], data['indices'],
+                       data['distance_m'], data['duration_s'], **kwargs)
+
+    def save(self, path: str) -> None:
+        """Salva os arrays do grafo em um .npz compactado"""
+        np.savez_compressed(path, node_lat=self.node_lat, node_lng=self.node_lng, indptr=self.indptr,
+                            indices=self.indices, distance_m=self.distance_m, duration_s=self.duration_s)
+
+    def _build_snap_grid(self) -> None:
+        """Grade lat/lng: célula -> fatia dos nós ordenados por célula"""
+        self._cell_lat = self.snap_cell_m / METERS_PER_DEGREE
+        max_abs_lat = float(np.abs(self.node_lat).max()) if self.node_count else 0.0
+        self._cell_lng = self._cell_lat / max(math.cos(math.radians(min(max_abs_lat, 89.0))), 1e-6)
+        rows = np.floor(self.node_lat / self._cell_lat).astype(np.int64)
+        cols = np.floor(self.node_lng / self._cell_lng).astype(np.int64)
+        order = np.lexsort((cols, rows))
+        self._snap_order = order
+        self._snap_cells: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        if not self.node_count:
+            return
+        keys = np.stack([rows[order], cols[order]], axis=1)
+        boundaries = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [len(order)]])
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            self._snap_cells[(int(keys[start, 0]), int(keys[start, 1]))] = (start, end)
+
+    def nearest_node(self, latitude: float, longitude: float,
+                     max_distance_m: float = 2000) -> Optional[Tuple[int, float]]:
+        """
+        Nó do grafo mais próximo de um ponto
+
+        Returns:
+            Tupla (índice do nó, distância em metros) ou None se não houver
+            nó a até max_distance_m
+        """
+        row = math.floor(latitude / self._cell_lat)
+        col = math.floor(longitude / self._cell_lng)
+        max_ring = math.ceil(max_distance_m / self.snap_cell_m)
+        best = None
+        for ring in range(max_ring + 1):
+            candidates = []
+            for dr in range(-ring, ring + 1):
+                for dc in range(-ring, ring + 1):
+                    if max(abs(dr), abs(dc)) != ring:
+                        continue
+                    span = self._snap_cells.get((row + dr, col + dc))
+                    if span:
+                        candidates.append(self._snap_order[span[0]:span[1]])
+            if candidates:
+                nodes = np.concatenate(candidates)
+                distances = haversine_many(latitude, longitude, self.node_lat[nodes], self.node_lng[nodes])
+                i = int(np.argmin(distances))
+                if best is None or distances[i] < best[1]:
+                    best = (int(nodes[i]), float(distances[i]))
+            # Nós em anéis mais externos estão a pelo menos ring * snap_cell_m
+            if best is not None and best[1] <= ring * self.snap_cell_m:
+                break
+        if best is None or best[1] > max_distance_m:
+            return None
+        return best
+
+    def shortest_path(self, source: int, target: int) -> Optional[Tuple[float, float, List[int]]]:
+        """
+        Caminho de menor tempo entre dois nós (A*)
+
+        A heurística é a distância em linha reta dividida pela maior
+        velocidade do grafo, que nunca superestima o tempo restante.
+
+        Returns:
+            Tupla (duração em s, distância em m, lista de nós) ou None se não
+            houver caminho
+        """
+        if source == target:
+            return 0.0, 0.0, [source]
+        indptr, indices = self._indptr, self._indices
+        edge_duration, edge_distance = self._duration, self._distance
+        lat_rad, lng_rad = self._lat_rad, self._lng_rad
+        target_lat, target_lng = lat_rad[target], lng_rad[target]
+        cos_target = math.cos(target_lat)
+        seconds_per_radian = 2 * EARTH_RADIUS_M / self.max_speed_mps
+
+        def heuristic(node: int) -> float:
+            a = (math.sin((target_lat - lat_rad[node]) / 2) ** 2
+                 + math.cos(lat_rad[node]) * cos_target * math.sin((target_lng - lng_rad[node]) / 2) ** 2)
+            return seconds_per_radian * math.asin(min(1.0, math.sqrt(a)))
+
+        best = {source: 0.0}
+        distance = {source: 0.0}
+        previous = {source: -1}
+        heap = [(heuristic(source), 0.0, source)]
+        closed = set()
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == target:
+                path = [node]
+                while previous[path[-1]] != -1:
+                    path.append(previous[path[-1]])
+                path.reverse()
+                return cost, distance[node], path
+            if node in closed:
+                continue
+            closed.add(node)
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbor = indices[edge]
+                new_cost = cost + edge_duration[edge]
+                if new_cost < best.get(neighbor, math.inf):
+                    best[neighbor] = new_cost
+                    distance[neighbor] = distance[node] + edge_distance[edge]
+                    previous[neighbor] = node
+                    heapq.heappush(heap, (new_cost + heuristic(neighbor), new_cost, neighbor))
+        return None
+
+
+class LocalGraphBackend(RoutingBackend):
+    """
+    Roteamento em processo sobre um RoadGraph, sem rede
+
+    Responde no mesmo formato de OSRMRoutingService.calculate_route
+    (distance, duration, geometry GeoJSON, legs, waypoints). Os trechos
+    entre cada ponto e o nó mais próximo do grafo entram na distância e na
+    duração à velocidade snap_speed_mps. Apenas o perfil "driving" é
+    suportado.
+    """
+
+    name = 'local'
+
+    def __init__(self, graph: Optional[RoadGraph] = None, max_snap_m: float = 2000,
+                 snap_speed_mps: float = 5.0, graph_path: Optional[str] = None):
+        """
+        Args:
+            graph: Grafo viário
+            max_snap_m: Distância máxima de um ponto até a via mais próxima
+            snap_speed_mps: Velocidade usada no trecho ponto -> via
+            graph_path: Arquivo salvo com RoadGraph.save, carregado na
+                primeira rota (em vez de graph); workers que nunca usam o
+                fallback não pagam a carga nem a memória
+        """
+        self._graph = graph
+        self.graph_path = graph_path
+        self._graph_lock = threading.Lock()
+        self.max_snap_m = max_snap_m
+        self.snap_speed_mps = snap_speed_mps
+
+    @property
+    def graph(self) -> Optional[RoadGraph]:
+        """Grafo viário (None se o arquivo não pôde ser carregado)"""
+        if self._graph is None and self.graph_path:
+            with self._graph_lock:
+                if self._graph is None and self.graph_path:
+                    try:
+                        self._graph = RoadGraph.load(self.graph_path)
+                    except (OSError, KeyError, ValueError) as e:
+                        print(f"Erro ao carregar o grafo viário {self.graph_path}: {e}")
+                        self.graph_path = None
+        return self._graph
+
+    def route(self, coordinates: List[Tuple[float, float]],
+              profile: str = "driving") -> Optional[Dict]:
+        if profile != 'driving' or len(coordinates) < 2 or self.graph is None:
+            return None
+
+        snapped = []
+        for lng, lat in coordinates:
+            nearest = self.graph.nearest_node(lat, lng, self.max_snap_m)
+            if nearest is None:
+                return None
+            snapped.append(nearest)
+
+        graph = self.graph
+        geometry: List[List[float]] = []
+        legs = []
+        total_distance = 0.0
+        total_duration = 0.0
+        for leg_index in range(len(coordinates) - 1):
+            (start, start_snap), (end, end_snap) = snapped[leg_index], snapped[leg_index + 1]
+            result = graph.shortest_path(start, end)
+            if result is None:
+                return None
+            duration, distance, path = result
+            offset = start_snap + end_snap
+            leg_distance = distance + offset
+            leg_duration = duration + offset / self.snap_speed_mps
+            legs.append({'distance': leg_distance, 'duration': leg_duration, 'summary': '', 'steps': []})
+            total_distance += leg_distance
+            total_duration += leg_duration
+
+            points = [list(coordinates[leg_index])]
+            points.extend([float(graph.node_lng[node]), float(graph.node_lat[node])] for node in path)
+            points.append(list(coordinates[leg_index + 1]))
+            geometry.extend(points if not geometry else points[1:])
+
+        return {
+            'distance': total_distance,
+            'duration': total_duration,
+            'geometry': {'type': 'LineString', 'coordinates': geometry},
+            'legs': legs,
+            'waypoints': [
+                {'location': [float(graph.node_lng[node]), float(graph.node_lat[node])],
+                 'distance': snap_distance, 'name': ''}
+                for node, snap_distance in snapped
+            ]
+        }
+
+
+if __name__ == '__main__':
+    # Conversão offline: python -m src.services.road_graph extrato.osm grafo.npz
+    import sys
+    graph = RoadGraph.from_osm(sys.argv[1])
+    graph.save(sys.argv[2])
+    print(f"{graph.node_count} nós, {graph.edge_count} arestas salvos em {sys.argv[2]}")
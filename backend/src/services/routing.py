@@ -1,18 +1,123 @@
+import abc
 import requests
 import json
-from typing import List, Dict, Tuple, Optional
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional, Union
+import numpy as np
+from src.services.http_client import DEFAULT_TIMEOUT, get_session
+from src.services.cache import TwoTierCache, TTLCache
+from src.services.geo import haversine_pairwise, douglas_peucker, encode_polyline
 
-class OSRMRoutingService:
+# Formatos de geometria aceitos pela API -> precisão da polyline (None = GeoJSON)
+GEOMETRY_FORMATS = {'geojson': None, 'polyline': 5, 'polyline6': 6}
+
+class RoutingBackend(abc.ABC):
+    """
+    Interface de um backend de rotas
+    
+    route() recebe coordenadas (longitude, latitude) e devolve o dicionário
+    de calculate_route (distance, duration, geometry, legs, waypoints) ou
+    None se não houver rota.
+    """
+    
+    name = 'base'
+    
+    @abc.abstractmethod
+    def route(self, coordinates: List[Tuple[float, float]],
+              profile: str = "driving") -> Optional[Dict]:
+        """Rota passando pelas coordenadas, na ordem"""
+
+
+class OSRMRoutingService(RoutingBackend):
     """Serviço para calcular rotas usando OSRM (Open Source Routing Machine)"""
     
-    def __init__(self, osrm_url: str = "http://router.project-osrm.org"):
+    name = 'osrm'
+    
+    def __init__(self, osrm_url: str = "http://router.project-osrm.org",
+                 route_cache: Optional[TwoTierCache] = None, snap_decimals: int = 5,
+                 session: Optional[requests.Session] = None,
+                 timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT,
+                 matrix_cache: Optional[TTLCache] = None, matrix_tile_size: int = 50,
+                 matrix_workers: int = 4, matrix_row_limit: int = 5000,
+                 fallback_speed_mps: float = 8.3,
+                 fallback_detour_factor: float = 1.3,
+                 fallback_backend: Optional[RoutingBackend] = None,
+                 fallback_timeout: Tuple[float, float] = (1.0, 3.0),
+                 breaker_failures: int = 3, breaker_cooldown: float = 30.0):
         """
         Inicializa o serviço de roteamento
         
         Args:
             osrm_url: URL do servidor OSRM (padrão: servidor público)
+            route_cache: Cache de rotas (padrão: 2000 rotas / 32 MB, TTL de 15 min)
+            snap_decimals: Casas decimais usadas para arredondar coordenadas na
+                chave do cache (5 ≈ 1 m)
+            session: Sessão HTTP (padrão: sessão compartilhada com keep-alive)
+            timeout: Timeout das requisições, em segundos ou (conexão, leitura)
+            matrix_cache: Cache da matriz de tempos, uma entrada por origem
+                com {destino: (duração, distância)} (padrão: 20 mil origens,
+                TTL de 10 min)
+            matrix_tile_size: Origens e destinos por requisição /table (o
+                servidor público aceita até 100 pontos por consulta)
+            matrix_workers: Requisições /table simultâneas
+            matrix_row_limit: Destinos guardados por origem antes de
+                reiniciar a entrada
+            fallback_speed_mps: Velocidade média da estimativa em linha reta
+                usada quando o OSRM falha (8.3 m/s ≈ 30 km/h)
+            fallback_detour_factor: Razão média entre distância por estrada e
+                em linha reta, para a mesma estimativa
+            fallback_backend: Backend usado por calculate_route quando o OSRM
+                falha ou não responde (ex: LocalGraphBackend, sem rede)
+            fallback_timeout: Com fallback_backend, timeout (conexão, leitura)
+                das rotas no OSRM, em uma sessão sem retry: melhor cair no
+                grafo local do que esperar um OSRM lento
+            breaker_failures: Falhas seguidas do OSRM que abrem o circuito;
+                aberto, calculate_route vai direto ao fallback_backend
+            breaker_cooldown: Segundos com o circuito aberto antes de tentar
+                o OSRM de novo
         """
         self.osrm_url = osrm_url.rstrip('/')
+        self.route_cache = route_cache if route_cache is not None else TwoTierCache(
+            memory=TTLCache(max_entries=2000, ttl=15 * 60, max_bytes=32 * 1024 * 1024)
+        )
+        self.snap_decimals = snap_decimals
+        self.session = session if session is not None else get_session('osrm')
+        self.timeout = timeout
+        self.matrix_cache = matrix_cache if matrix_cache is not None else TTLCache(
+            max_entries=20000, ttl=10 * 60
+        )
+        self.matrix_row_limit = matrix_row_limit
+        self.matrix_tile_size = matrix_tile_size
+        self.matrix_workers = matrix_workers
+        self.fallback_speed_mps = fallback_speed_mps
+        self.fallback_detour_factor = fallback_detour_factor
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self.fallback_backend = fallback_backend
+        if fallback_backend is not None:
+            self.route_session = session if session is not None else get_session('osrm-route', retries=0)
+            self.route_timeout = fallback_timeout
+        else:
+            self.route_session = self.session
+            self.route_timeout = self.timeout
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self._breaker_lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+    
+    def cache_stats(self) -> Dict:
+        """Retorna taxa de acerto e uso de memória do cache de rotas"""
+        return self.route_cache.stats()
+    
+    def _route_cache_key(self, coordinates: List[Tuple[float, float]], profile: str) -> str:
+        """Chave do cache: perfil + lista de coordenadas arredondadas"""
+        digits = self.snap_decimals
+        coords_key = ";".join(f"{lng:.{digits}f},{lat:.{digits}f}" for lng, lat in coordinates)
+        return f"{profile}:{coords_key}"
     
     def calculate_route(self, coordinates: List[Tuple[float, float]], 
                        profile: str = "driving") -> Optional[Dict]:
@@ -26,6 +131,40 @@ class OSRMRoutingService:
         Returns:
             Dicionário com informações da rota ou None se erro
         """
+        key = self._route_cache_key(coordinates, profile)
+        if self.fallback_backend is not None and self._circuit_open():
+            # OSRM fora do ar há pouco: só o cache, sem esperar pelo timeout
+            route = self.route_cache.get_or_load(key, lambda: None)
+        else:
+            route = self.route_cache.get_or_load(key, lambda: self._fetch_route(coordinates, profile))
+        # Fallback fora do cache: assim que o OSRM voltar, a rota dele é usada
+        if route is None and self.fallback_backend is not None:
+            route = self.fallback_backend.route(coordinates, profile)
+        return route
+    
+    def _circuit_open(self) -> bool:
+        with self._breaker_lock:
+            return time.monotonic() < self._open_until
+    
+    def _record_osrm_result(self, ok: bool) -> None:
+        """Conta falhas seguidas do OSRM e abre o circuito ao atingir breaker_failures"""
+        with self._breaker_lock:
+            if ok:
+                self._consecutive_failures = 0
+                return
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.breaker_failures:
+                self._open_until = time.monotonic() + self.breaker_cooldown
+                print(f"OSRM indisponível; usando o fallback por {self.breaker_cooldown:g}s")
+    
+    def route(self, coordinates: List[Tuple[float, float]],
+              profile: str = "driving") -> Optional[Dict]:
+        """Interface RoutingBackend: rota pelo OSRM, sem cache nem fallback"""
+        return self._fetch_route(coordinates, profile)
+    
+    def _fetch_route(self, coordinates: List[Tuple[float, float]], 
+                     profile: str = "driving") -> Optional[Dict]:
+        """Consulta o OSRM para calculate_route (sem cache)"""
         try:
             # Formatar coordenadas para OSRM (longitude,latitude)
             coords_str = ";".join([f"{lng},{lat}" for lng, lat in coordinates])
@@ -40,7 +179,14 @@ class OSRMRoutingService:
                 "steps": "true"
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            try:
+                response = self.route_session.get(url, params=params, timeout=self.route_timeout)
+                if response.status_code >= 500:
+                    response.raise_for_status()
+            except requests.RequestException:
+                self._record_osrm_result(False)
+                raise
+            self._record_osrm_result(True)
             response.raise_for_status()
             
             data = response.json()
@@ -67,13 +213,17 @@ class OSRMRoutingService:
             return None
     
     def calculate_distance_matrix(self, coordinates: List[Tuple[float, float]], 
-                                 profile: str = "driving") -> Optional[Dict]:
+                                 profile: str = "driving",
+                                 sources: Optional[List[int]] = None,
+                                 destinations: Optional[List[int]] = None) -> Optional[Dict]:
         """
         Calcula matriz de distâncias entre múltiplos pontos
         
         Args:
             coordinates: Lista de tuplas (longitude, latitude)
             profile: Perfil de roteamento
+            sources: Índices das origens (padrão: todos os pontos)
+            destinations: Índices dos destinos (padrão: todos os pontos)
             
         Returns:
             Dicionário com matriz de distâncias ou None se erro
@@ -81,8 +231,13 @@ class OSRMRoutingService:
         try:
             coords_str = ";".join([f"{lng},{lat}" for lng, lat in coordinates])
             url = f"{self.osrm_url}/table/v1/{profile}/{coords_str}"
+            params = {"annotations": "duration,distance"}
+            if sources is not None:
+                params["sources"] = ";".join(str(i) for i in sources)
+            if destinations is not None:
+                params["destinations"] = ";".join(str(i) for i in destinations)
             
-            response = requests.get(url, timeout=10)
+            response = self.session.get(url, params=params, timeout=self.timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -103,6 +258,114 @@ class OSRMRoutingService:
             print(f"Erro inesperado: {e}")
             return None
     
+    def _matrix_executor(self) -> ThreadPoolExecutor:
+        """Pool limitado para as requisições /table (criado sob demanda)"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.matrix_workers,
+                                                    thread_name_prefix='osrm-table')
+            return self._executor
+    
+    def _coordinate_key(self, point: Tuple[float, float]) -> str:
+        digits = self.snap_decimals
+        return f"{point[0]:.{digits}f},{point[1]:.{digits}f}"
+    
+    def calculate_eta_matrix(self, sources: List[Tuple[float, float]],
+                             destinations: List[Tuple[float, float]],
+                             profile: str = "driving") -> Dict:
+        """
+        Matriz de tempos e distâncias origens x destinos, para N grande
+        
+        Pares já consultados vêm do cache. O restante é dividido em blocos de
+        até matrix_tile_size origens x matrix_tile_size destinos, consultados
+        em paralelo no /table do OSRM (no máximo matrix_workers por vez) e
+        remontados na matriz final. Blocos que falham e células sem rota
+        recebem a estimativa em linha reta (haversine x fator de desvio /
+        velocidade média) e são marcados em 'estimated' (não entram no cache).
+        
+        Args:
+            sources: Lista de tuplas (longitude, latitude) das origens
+            destinations: Lista de tuplas (longitude, latitude) dos destinos
+            profile: Perfil de roteamento
+            
+        Returns:
+            Dicionário com arrays NumPy len(sources) x len(destinations):
+            durations (s), distances (m) e estimated (bool)
+        """
+        shape = (len(sources), len(destinations))
+        durations = np.full(shape, np.nan)
+        distances = np.full(shape, np.nan)
+        estimated = np.zeros(shape, dtype=bool)
+        if not sources or not destinations:
+            return {'durations': durations, 'distances': distances, 'estimated': estimated}
+        
+        # Preencher a partir do cache (uma entrada por origem com os destinos já
+        # consultados); só linhas/colunas com falta vão ao OSRM
+        source_keys = [f"{profile}:{self._coordinate_key(point)}" for point in sources]
+        destination_keys = [self._coordinate_key(point) for point in destinations]
+        empty = (np.nan, np.nan)
+        for i, source_key in enumerate(source_keys):
+            row = self.matrix_cache.get(source_key)
+            if row:
+                cells = [row.get(key, empty) for key in destination_keys]
+                durations[i] = [cell[0] for cell in cells]
+                distances[i] = [cell[1] for cell in cells]
+        missing = np.isnan(durations)
+        missing_sources = np.flatnonzero(missing.any(axis=1)).tolist()
+        missing_destinations = np.flatnonzero(missing.any(axis=0)).tolist()
+        
+        tile = self.matrix_tile_size
+        tiles = [(missing_sources[a:a + tile], missing_destinations[b:b + tile])
+                 for a in range(0, len(missing_sources), tile)
+                 for b in range(0, len(missing_destinations), tile)]
+        tiles = [(rows, cols) for rows, cols in tiles if missing[np.ix_(rows, cols)].any()]
+        
+        def fetch(rows, cols):
+            points = [sources[i] for i in rows] + [destinations[j] for j in cols]
+            return self.calculate_distance_matrix(
+                points, profile,
+                sources=list(range(len(rows))),
+                destinations=list(range(len(rows), len(points)))
+            )
+        
+        if len(tiles) == 1:
+            results = [fetch(*tiles[0])]
+        else:
+            results = list(self._matrix_executor().map(lambda t: fetch(*t), tiles))
+        
+        for (rows, cols), result in zip(tiles, results):
+            if not result or not result.get('durations'):
+                continue
+            block_durations = np.array(result['durations'], dtype=float)
+            block_distances = np.array(result['distances'], dtype=float) if result.get('distances') \
+                else np.full(block_durations.shape, np.nan)
+            durations[np.ix_(rows, cols)] = block_durations
+            distances[np.ix_(rows, cols)] = block_distances
+            column_keys = [destination_keys[j] for j in cols]
+            for a, i in enumerate(rows):
+                row = self.matrix_cache.get(source_keys[i])
+                if row is None or len(row) > self.matrix_row_limit:
+                    row = {}
+                    self.matrix_cache.set(source_keys[i], row)
+                row.update((key, cell) for key, cell in zip(
+                    column_keys, zip(block_durations[a].tolist(), block_distances[a].tolist()))
+                    if cell[0] == cell[0])  # descarta NaN (sem rota)
+        
+        # Estimativa em linha reta para o que o OSRM não respondeu
+        unresolved = np.isnan(durations)
+        if unresolved.any():
+            source_array = np.array(sources, dtype=float)
+            destination_array = np.array(destinations, dtype=float)
+            straight = haversine_pairwise(source_array[:, 1:], source_array[:, :1],
+                                          destination_array[:, 1], destination_array[:, 0])
+            road = straight * self.fallback_detour_factor
+            distances[unresolved] = road[unresolved]
+            durations[unresolved] = road[unresolved] / self.fallback_speed_mps
+            estimated |= unresolved
+        distances = np.where(np.isnan(distances), durations * self.fallback_speed_mps, distances)
+        
+        return {'durations': durations, 'distances': distances, 'estimated': estimated}
+    
     def get_nearest_road(self, latitude: float, longitude: float, 
                         profile: str = "driving") -> Optional[Dict]:
         """
@@ -119,7 +382,7 @@ class OSRMRoutingService:
         try:
             url = f"{self.osrm_url}/nearest/v1/{profile}/{longitude},{latitude}"
             
-            response = requests.get(url, timeout=10)
+            response = self.session.get(url, timeout=self.timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -142,6 +405,76 @@ class OSRMRoutingService:
             print(f"Erro inesperado: {e}")
             return None
 
+def _shape_geometry(geometry: Optional[Dict], precision: Optional[int], tolerance_m: float):
+    if not geometry or geometry.get("type") != "LineString":
+        return geometry
+    coordinates = geometry.get("coordinates") or []
+    if precision is None and tolerance_m <= 0:
+        return geometry
+    points = [(lat, lng) for lng, lat in coordinates]
+    if tolerance_m > 0:
+        points = douglas_peucker(points, tolerance_m)
+    if precision is None:
+        return {"type": "LineString", "coordinates": [[lng, lat] for lat, lng in points]}
+    return encode_polyline(points, precision)
+
+
+def shape_precision(geometry: str, tolerance_m: float) -> Optional[int]:
+    """
+    Valida as opções de shape_route
+
+    Returns:
+        Precisão da polyline do formato (None para GeoJSON)
+
+    Raises:
+        ValueError: Formato de geometria desconhecido ou tolerância não finita
+    """
+    if geometry not in GEOMETRY_FORMATS:
+        raise ValueError(f"Formato de geometria inválido: {geometry}")
+    # NaN passaria por max(tolerance, 0) e o Douglas-Peucker manteria só as pontas
+    if not math.isfinite(tolerance_m):
+        raise ValueError(f"Tolerância inválida: {tolerance_m}")
+    return GEOMETRY_FORMATS[geometry]
+
+
+def shape_route(route: Dict, geometry: str = "geojson", tolerance_m: float = 0.0,
+                steps: bool = False) -> Dict:
+    """
+    Prepara uma rota para a resposta da API, reduzindo o payload
+
+    Não altera o dicionário recebido (que pode estar no cache de rotas).
+
+    Args:
+        route: Rota retornada por calculate_route
+        geometry: "geojson", "polyline" (precisão 5) ou "polyline6"
+        tolerance_m: Tolerância do Douglas-Peucker em metros (0 = sem simplificação)
+        steps: Incluir as instruções passo a passo de cada trecho
+
+    Returns:
+        Cópia da rota com a geometria no formato pedido
+
+    Raises:
+        ValueError: Ver shape_precision
+    """
+    precision = shape_precision(geometry, tolerance_m)
+
+    legs = []
+    for leg in route.get("legs", []):
+        shaped_leg = {key: value for key, value in leg.items() if key != "steps"}
+        if steps:
+            shaped_leg["steps"] = [
+                dict(step, geometry=_shape_geometry(step.get("geometry"), precision, 0.0))
+                for step in leg.get("steps", [])
+            ]
+        legs.append(shaped_leg)
+
+    shaped = dict(route, legs=legs)
+    shaped["geometry"] = _shape_geometry(route.get("geometry"), precision, tolerance_m)
+    if precision is not None:
+        shaped["geometry_format"] = geometry
+    return shaped
+
+
 def format_distance(distance_meters: float) -> str:
     """
     Formata distância em metros para string legível
@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Banco temporário e sem threads de background: os testes chamam os workers
+# diretamente. Precisa vir antes do import de src.main, que cria o app.
+_db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+os.environ.update({
+    'DATABASE_URL': f'sqlite:///{_db_file}',
+    'OUTBOX_WORKER': '0',
+    'LOCATION_INGESTOR': '0',
+    'DISPATCH_ENGINE': '0',
+    'GAZETTEER_PATH': os.path.join(os.path.dirname(_db_file), 'sem-gazetteer.db'),
+    'ROAD_GRAPH_PATH': os.path.join(os.path.dirname(_db_file), 'sem-grafo.npz'),
+})
+
+
+@pytest.fixture(scope='session')
+def app():
+    from src.main import app
+    yield app
+    os.unlink(_db_file)
+
+
+@pytest.fixture(autouse=True)
+def clean_db(app):
+    """Tabelas vazias a cada teste"""
+    from src.models.user import db
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    yield
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(client):
+    def make(user_type, name):
+        response = client.post('/api/users', json={'username': name, 'email': f'{name}@x', 'user_type': user_type})
+        assert response.status_code == 201, response.json
+        return response.json['id']
+    return make
+
+
+@pytest.fixture
+def make_ride(client):
+    def make(passenger_id):
+        response = client.post('/api/rides', json={
+            'passenger_id': passenger_id, 'origin': 'A', 'destination': 'B',
+            'origin_lat': -23.55, 'origin_lng': -46.63, 'destination_lat': -23.56, 'destination_lng': -46.64
+        })
+        assert response.status_code == 201, response.json
+        return response.json['id']
+    return make
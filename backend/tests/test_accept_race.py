@@ -0,0 +1,53 @@
+import threading
+from collections import Counter
+
+from src.models.ride import Ride
+from src.models.user import db
+
+
+def race_accepts(app, ride_id, drivers):
+    """Dispara um aceite por motorista ao mesmo tempo; devolve [(driver_id, status)]"""
+    barrier = threading.Barrier(len(drivers))
+    results = []
+    lock = threading.Lock()
+
+    def accept(driver_id):
+        local_client = app.test_client()
+        barrier.wait()
+        response = local_client.post(f'/api/rides/{ride_id}/accept', json={'driver_id': driver_id})
+        with lock:
+            results.append((driver_id, response.status_code))
+
+    threads = [threading.Thread(target=accept, args=(driver_id,)) for driver_id in drivers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_accepts_have_exactly_one_winner(app, make_user, make_ride):
+    passenger = make_user('passenger', 'p')
+    drivers = [make_user('driver', f'd{i}') for i in range(16)]
+
+    for _ in range(5):
+        ride_id = make_ride(passenger)
+        results = race_accepts(app, ride_id, drivers)
+
+        statuses = Counter(status for _, status in results)
+        assert statuses == {200: 1, 409: len(drivers) - 1}
+        winner = next(driver_id for driver_id, status in results if status == 200)
+        with app.app_context():
+            ride = db.session.get(Ride, ride_id)
+            assert (ride.status, ride.driver_id) == ('accepted', winner)
+
+
+def test_accepting_a_taken_ride_returns_409(client, make_user, make_ride):
+    passenger = make_user('passenger', 'p')
+    first, second = make_user('driver', 'd1'), make_user('driver', 'd2')
+    ride_id = make_ride(passenger)
+
+    assert client.post(f'/api/rides/{ride_id}/accept', json={'driver_id': first}).status_code == 200
+    response = client.post(f'/api/rides/{ride_id}/accept', json={'driver_id': second})
+    assert response.status_code == 409
+    assert client.get(f'/api/rides/{ride_id}').json['driver_id'] == first
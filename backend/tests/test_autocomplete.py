@@ -0,0 +1,47 @@
+import pytest
+
+from src.services.autocomplete import MAX_SCAN, PlaceAutocompleteIndex
+
+
+def build_index():
+    # Muitos lugares populares longe (Rio) e um pouco usado perto do usuário (São Paulo)
+    entries = [(f'Rua Popular {i}, Rio de Janeiro', -22.90 + 0.001 * i, -43.20, 100 + i)
+               for i in range(MAX_SCAN * 2)]
+    entries.append(('Rua Pequena 10, São Paulo', -23.5505, -46.6333, 1))
+    entries.append(('Rua Sem Coordenadas 5', None, None, 1000))
+    index = PlaceAutocompleteIndex()
+    index.load(entries)
+    return index
+
+
+def test_nearby_place_is_found_under_a_large_prefix():
+    index = build_index()
+
+    results = index.search('rua', latitude=-23.55, longitude=-46.63, limit=3)
+
+    assert results[0]['display_name'] == 'Rua Pequena 10, São Paulo'
+    assert results[0]['distance'] < 1000
+
+
+def test_without_position_most_frequent_come_first():
+    index = build_index()
+
+    results = index.search('rua', limit=2)
+
+    assert [result['count'] for result in results] == [1000, 100 + MAX_SCAN * 2 - 1]
+
+
+def test_unlocated_places_rank_after_located_ones():
+    index = build_index()
+
+    results = index.search('rua', latitude=-22.90, longitude=-43.20, limit=100)
+
+    assert results[-1]['display_name'] == 'Rua Sem Coordenadas 5'
+    assert index.stats()['queries'] == 1
+
+
+@pytest.mark.parametrize('params', [{'lat': 'nan', 'lng': -46.63}, {'lat': -23.55, 'lng': 'inf'},
+                                    {'lat': 95, 'lng': -46.63}, {'lat': -23.55}])
+def test_autocomplete_rejects_invalid_position(client, params):
+    response = client.get('/api/places/autocomplete', query_string={'q': 'rua', **params})
+    assert response.status_code == 400
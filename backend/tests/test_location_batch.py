@@ -0,0 +1,33 @@
+import time
+
+
+def post_batch(client, items):
+    response = client.post('/api/locations/batch', json=items)
+    assert response.status_code == 200, response.json
+    return response.json['results']
+
+
+def test_future_timestamp_is_rejected_and_does_not_freeze_the_driver(client, make_user):
+    driver = make_user('driver', 'd')
+
+    [result] = post_batch(client, [{'user_id': driver, 'latitude': -23.55, 'longitude': -46.63,
+                                    'ts': '2030-01-01T00:00:00+05:00'}])
+    assert result['status'] == 'invalid'
+
+    # Relógio um pouco adiantado é tolerado, sem bloquear os pings seguintes
+    [result] = post_batch(client, [{'user_id': driver, 'latitude': -23.55, 'longitude': -46.63,
+                                    'ts': time.time() + 10}])
+    assert result['status'] == 'updated'
+    [result] = post_batch(client, [{'user_id': driver, 'latitude': -23.56, 'longitude': -46.64}])
+    assert result['status'] == 'updated'
+    assert client.get(f'/api/users/{driver}/location').json['latitude'] == -23.56
+
+
+def test_non_object_items_are_reported_as_invalid(client, make_user):
+    driver = make_user('driver', 'd')
+
+    results = post_batch(client, [5, {'user_id': driver, 'latitude': -23.55, 'longitude': -46.63}])
+
+    assert results[0]['status'] == 'invalid'
+    assert 'subscriptable' not in results[0]['error']
+    assert results[1]['status'] == 'updated'
@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta
+
+from src.models.user import User, db
+from src.services.location_ingest import LocationIngestor
+
+
+def test_flushed_idle_positions_are_pruned(app, make_user):
+    active, idle = make_user('driver', 'a'), make_user('driver', 'b')
+    ingestor = LocationIngestor(app, retain_seconds=60)
+    for user_id in (active, idle):
+        ingestor.mark_known_user(user_id)
+    ingestor.record(idle, -23.5, -46.6, datetime.utcnow() - timedelta(seconds=120))
+    ingestor.record(active, -23.6, -46.7)
+
+    # Ainda pendente: não sai da memória antes de ser gravado
+    assert ingestor.prune() == 0
+    assert ingestor.flush() == 2
+    assert ingestor.prune() == 1
+
+    assert ingestor.get(idle) is None
+    assert not ingestor.is_known_user(idle)
+    assert ingestor.get(active)[:2] == (-23.6, -46.7)
+    assert ingestor.is_known_user(active)
+    # A posição descartada continua no banco
+    with app.app_context():
+        assert db.session.get(User, idle).latitude == -23.5
@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.mark.parametrize('radius', ['nan', 'inf', '-1', '0', '50001'])
+def test_invalid_radius_returns_400(client, radius):
+    response = client.get('/api/drivers/nearby', query_string={'lat': -23.55, 'lng': -46.63, 'radius': radius})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('lat, lng', [('nan', -46.63), (-23.55, 'inf'), (91, -46.63)])
+def test_invalid_coordinates_return_400(client, lat, lng):
+    response = client.get('/api/drivers/nearby', query_string={'lat': lat, 'lng': lng})
+    assert response.status_code == 400
+
+
+def test_nearest_drivers_within_radius(client, make_user):
+    near, far = make_user('driver', 'perto'), make_user('driver', 'longe')
+    for driver in (near, far):
+        client.put(f'/api/users/{driver}', json={'is_available': True})
+    client.put(f'/api/users/{near}/location', json={'latitude': -23.551, 'longitude': -46.631})
+    client.put(f'/api/users/{far}/location', json={'latitude': -23.60, 'longitude': -46.70})
+
+    response = client.get('/api/drivers/nearby', query_string={'lat': -23.55, 'lng': -46.63, 'radius': 1000})
+
+    assert response.status_code == 200
+    assert [driver['id'] for driver in response.json] == [near]
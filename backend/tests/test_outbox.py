@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from src.models.outbox import OutboxEvent
+from src.models.user import db
+from src.services.github_dispatch import DispatchSkipped
+from src.services.outbox import OutboxWorker, enqueue_event
+
+
+def enqueue(app, count):
+    with app.app_context():
+        events = [enqueue_event('message_sent', {'n': i}) for i in range(count)]
+        db.session.commit()
+        return [event.id for event in events]
+
+
+def event_states(app):
+    with app.app_context():
+        return {event.id: (event.status, event.attempts) for event in OutboxEvent.query.all()}
+
+
+def test_concurrent_workers_deliver_each_event_once(app):
+    ids = enqueue(app, 150)
+    delivered = Counter()
+    lock = threading.Lock()
+
+    def dispatcher(event_type, payload):
+        with lock:
+            delivered[payload['n']] += 1
+
+    workers = [OutboxWorker(app, dispatcher=dispatcher, batch_size=5) for _ in range(6)]
+    barrier = threading.Barrier(len(workers))
+
+    def drain(worker):
+        barrier.wait()
+        while worker.run_once():
+            pass
+
+    threads = [threading.Thread(target=drain, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(delivered) == list(range(150))
+    assert set(delivered.values()) == {1}
+    assert set(event_states(app).values()) == {('sent', 1)}
+    assert sorted(event_states(app)) == sorted(ids)
+
+
+def test_claimed_event_is_leased_until_it_expires(app):
+    [event_id] = enqueue(app, 1)
+    first = OutboxWorker(app, lease_seconds=60)
+    second = OutboxWorker(app, lease_seconds=60)
+
+    # O primeiro worker reserva o evento e morre antes de gravar o resultado
+    with app.app_context():
+        assert [event.id for event in first._claim_batch()] == [event_id]
+        db.session.remove()
+        assert second._claim_batch() == []
+        db.session.remove()
+
+        # Lease vencido: o evento volta a ficar disponível, com a tentativa contada
+        db.session.execute(db.update(OutboxEvent).values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+        reclaimed = second._claim_batch()
+        assert [(event.id, event.attempts) for event in reclaimed] == [(event_id, 2)]
+        db.session.remove()
+
+
+def test_failures_back_off_then_fail(app):
+    [event_id] = enqueue(app, 1)
+
+    def dispatcher(event_type, payload):
+        raise RuntimeError('GitHub fora do ar')
+
+    worker = OutboxWorker(app, dispatcher=dispatcher, max_attempts=3, backoff_base=2.0)
+    for attempt in range(1, 4):
+        assert worker.run_once() == 1
+        with app.app_context():
+            event = db.session.get(OutboxEvent, event_id)
+            assert event.attempts == attempt
+            assert event.last_error == 'GitHub fora do ar'
+            if attempt < 3:
+                assert event.status == 'pending'
+                delay = (event.next_attempt_at - datetime.utcnow()).total_seconds()
+                assert 2.0 * 2 ** (attempt - 1) - 1 < delay <= 2.0 * 2 ** (attempt - 1)
+                # Ainda em backoff: nada a fazer até next_attempt_at
+                assert worker.run_once() == 0
+                event.next_attempt_at = datetime.utcnow()
+                db.session.commit()
+            db.session.remove()
+
+    assert event_states(app) == {event_id: ('failed', 3)}
+    assert worker.run_once() == 0
+
+
+def test_skipped_dispatch_is_not_retried(app):
+    [event_id] = enqueue(app, 1)
+
+    def dispatcher(event_type, payload):
+        raise DispatchSkipped('GITHUB_TOKEN não configurado')
+
+    worker = OutboxWorker(app, dispatcher=dispatcher)
+    assert worker.run_once() == 1
+    assert event_states(app) == {event_id: ('skipped', 1)}
+    assert worker.run_once() == 0
+
+
+def test_result_is_discarded_when_another_worker_reclaimed_the_event(app):
+    [event_id] = enqueue(app, 1)
+    other = OutboxWorker(app)
+
+    def dispatcher(event_type, payload):
+        # Entrega lenta: o lease vence e outro worker reserva o evento
+        db.session.execute(db.update(OutboxEvent).values(next_attempt_at=datetime.utcnow()))
+        db.session.commit()
+        assert [event.id for event in other._claim_batch()] == [event_id]
+
+    worker = OutboxWorker(app, dispatcher=dispatcher)
+    assert worker.run_once() == 1
+    # O resultado do primeiro worker não sobrescreve a reserva do segundo
+    assert event_states(app) == {event_id: ('pending', 2)}
+
+
+def test_events_that_do_not_fit_in_the_lease_are_released(app):
+    ids = enqueue(app, 3)
+    delivered = []
+
+    def dispatcher(event_type, payload):
+        delivered.append(payload['n'])
+        time.sleep(0.6)
+
+    worker = OutboxWorker(app, dispatcher=dispatcher, lease_seconds=2, dispatch_timeout=1)
+    # 0 s e 0,6 s cabem no lease de 2 s com entrega de até 1 s; 1,2 s não
+    assert worker.run_once() == 2
+    assert delivered == [0, 1]
+    assert event_states(app) == {ids[0]: ('sent', 1), ids[1]: ('sent', 1), ids[2]: ('pending', 0)}
+
+    # Devolvido sem esperar o lease vencer
+    assert worker.run_once() == 1
+    assert event_states(app)[ids[2]] == ('sent', 1)
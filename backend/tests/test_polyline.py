@@ -0,0 +1,98 @@
+import math
+import random
+
+import pytest
+
+from src.services.geo import METERS_PER_DEGREE, decode_polyline, douglas_peucker, encode_polyline
+from src.services.routing import shape_route
+
+# Exemplo da documentação do formato (Google Encoded Polyline)
+REFERENCE_POINTS = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+REFERENCE_ENCODED = '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+
+
+def test_encode_matches_reference():
+    assert encode_polyline(REFERENCE_POINTS) == REFERENCE_ENCODED
+    assert decode_polyline(REFERENCE_ENCODED) == REFERENCE_POINTS
+
+
+@pytest.mark.parametrize('precision', [5, 6])
+def test_round_trip_within_precision(precision):
+    rng = random.Random(precision)
+    # Trajeto com passos pequenos e saltos grandes, cruzando o equador e o meridiano 0
+    points = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(50)]
+    points += [(0.00001 * i - 0.0002, -0.00002 * i + 0.0001) for i in range(40)]
+
+    decoded = decode_polyline(encode_polyline(points, precision), precision)
+
+    assert len(decoded) == len(points)
+    tolerance = 0.5 / 10 ** precision + 1e-12
+    for (lat, lng), (decoded_lat, decoded_lng) in zip(points, decoded):
+        assert abs(lat - decoded_lat) <= tolerance
+        assert abs(lng - decoded_lng) <= tolerance
+
+
+def test_empty_and_single_point():
+    assert encode_polyline([]) == ''
+    assert decode_polyline('') == []
+    assert decode_polyline(encode_polyline([(-23.55, -46.63)])) == [(-23.55, -46.63)]
+
+
+def test_shape_route_polyline_decodes_to_route_geometry():
+    coordinates = [[-46.63 + 0.001 * i, -23.55 - 0.0005 * i] for i in range(30)]
+    route = {'distance': 1000.0, 'duration': 120.0,
+             'geometry': {'type': 'LineString', 'coordinates': coordinates},
+             'legs': [{'distance': 1000.0, 'duration': 120.0, 'steps': [{'name': 'Rua A'}]}]}
+
+    shaped = shape_route(route, geometry='polyline6')
+
+    assert shaped['geometry_format'] == 'polyline6'
+    assert decode_polyline(shaped['geometry'], 6) == [(round(lat, 6), round(lng, 6)) for lng, lat in coordinates]
+    assert 'steps' not in shaped['legs'][0]
+    # A rota original (que pode estar no cache) não é alterada
+    assert route['geometry']['coordinates'] == coordinates
+    assert route['legs'][0]['steps'] == [{'name': 'Rua A'}]
+
+
+def distance_to_path(point, path):
+    """Distância (m) do ponto à linha poligonal, em projeção plana local"""
+    scale = math.cos(math.radians(point[0]))
+
+    def xy(p):
+        return ((p[1] - point[1]) * scale * METERS_PER_DEGREE, (p[0] - point[0]) * METERS_PER_DEGREE)
+
+    best = math.inf
+    for a, b in zip(path, path[1:]):
+        (ax, ay), (bx, by) = xy(a), xy(b)
+        dx, dy = bx - ax, by - ay
+        t = max(0.0, min(1.0, -(ax * dx + ay * dy) / (dx * dx + dy * dy))) if dx or dy else 0.0
+        best = min(best, math.hypot(ax + t * dx, ay + t * dy))
+    return best
+
+
+def test_simplified_polyline_stays_within_tolerance():
+    rng = random.Random(3)
+    # Zigue-zague com ruído de ~3 m: só parte dos vértices sobrevive
+    points = [(-23.55 + 0.0001 * i, -46.63 + 0.001 * ((i // 50) % 2) * (i % 50) / 50 + rng.uniform(-0.00003, 0.00003))
+              for i in range(500)]
+
+    simplified = douglas_peucker(points, tolerance_m=10)
+    decoded = decode_polyline(encode_polyline(simplified))
+
+    assert 2 < len(simplified) < len(points)
+    assert decoded[0] == pytest.approx(points[0]) and decoded[-1] == pytest.approx(points[-1])
+    # Tolerância do Douglas-Peucker mais o arredondamento da precisão 5 (~1 m)
+    assert max(distance_to_path(point, decoded) for point in points) <= 11
+
+
+@pytest.mark.parametrize('tolerance', [math.nan, math.inf])
+def test_shape_route_rejects_non_finite_tolerance(tolerance):
+    route = {'geometry': {'type': 'LineString', 'coordinates': [[-46.63, -23.55], [-46.64, -23.56]]}}
+    with pytest.raises(ValueError):
+        shape_route(route, tolerance_m=tolerance)
+
+
+def test_route_endpoint_rejects_nan_tolerance(client, make_user, make_ride):
+    ride_id = make_ride(make_user('passenger', 'p'))
+    response = client.post(f'/api/rides/{ride_id}/calculate-route', query_string={'tolerance': 'nan'})
+    assert response.status_code == 400
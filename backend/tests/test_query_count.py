@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import event
+
+from src.models.user import db
+
+
+@pytest.fixture
+def statements(app):
+    """SQL executado pelo app durante o teste"""
+    executed = []
+
+    def record(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+@pytest.fixture
+def seed_rides(client, make_user, make_ride):
+    passengers = [make_user('passenger', f'p{i}') for i in range(5)]
+    drivers = [make_user('driver', f'd{i}') for i in range(5)]
+
+    def seed(count):
+        for i in range(count):
+            ride_id = make_ride(passengers[i % 5])
+            client.post(f'/api/rides/{ride_id}/accept', json={'driver_id': drivers[i % 5]})
+            client.post(f'/api/rides/{ride_id}/messages', json={'sender_id': passengers[i % 5], 'content': 'oi'})
+            client.post(f'/api/rides/{ride_id}/messages', json={'sender_id': drivers[i % 5], 'content': 'olá'})
+        return ride_id
+    return seed
+
+
+def count_queries(client, statements, url):
+    statements.clear()
+    response = client.get(url)
+    assert response.status_code == 200, response.json
+    return len(statements), len(response.json)
+
+
+def test_ride_listing_query_count_does_not_grow_with_rows(client, statements, seed_rides):
+    seed_rides(2)
+    few, few_rows = count_queries(client, statements, '/api/rides')
+    seed_rides(20)
+    many, many_rows = count_queries(client, statements, '/api/rides')
+
+    assert (few_rows, many_rows) == (2, 22)
+    assert few == many
+
+
+def test_message_listing_query_count_does_not_grow_with_rows(client, statements, seed_rides):
+    ride_id = seed_rides(1)
+    few, few_rows = count_queries(client, statements, f'/api/rides/{ride_id}/messages')
+    for i in range(20):
+        client.post(f'/api/rides/{ride_id}/messages', json={'sender_id': 1, 'content': f'mais {i}'})
+    many, many_rows = count_queries(client, statements, f'/api/rides/{ride_id}/messages')
+
+    assert (few_rows, many_rows) == (2, 22)
+    assert few == many
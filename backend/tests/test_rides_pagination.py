@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+from src.models.ride import Ride
+from src.models.user import db
+
+
+def insert_rides(app, passenger_id, count, start=datetime(2024, 1, 1)):
+    """Corridas com created_at repetido em grupos de 3 (empates resolvidos pelo id)"""
+    with app.app_context():
+        rides = [Ride(passenger_id=passenger_id, origin='A', destination='B', status='requested',
+                      created_at=start + timedelta(minutes=i // 3))
+                 for i in range(count)]
+        db.session.add_all(rides)
+        db.session.commit()
+        return [ride.id for ride in rides]
+
+
+def page_through(client, limit, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, limit=limit)
+        if cursor:
+            query['cursor'] = cursor
+        response = client.get('/api/rides', query_string=query)
+        assert response.status_code == 200, response.json
+        ids.extend(ride['id'] for ride in response.json)
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return ids, pages
+
+
+def test_keyset_pages_have_no_duplicates_or_gaps(app, client, make_user):
+    passenger = make_user('passenger', 'p')
+    created = insert_rides(app, passenger, 50)
+
+    ids, pages = page_through(client, limit=7)
+
+    assert len(ids) == len(set(ids))
+    assert sorted(ids) == sorted(created)
+    assert pages == 8
+    # Mais recentes primeiro; no mesmo created_at, maior id primeiro
+    with app.app_context():
+        order = [ride.id for ride in Ride.query.order_by(Ride.created_at.desc(), Ride.id.desc())]
+    assert ids == order
+
+
+def test_rides_created_while_paging_do_not_shift_pages(app, client, make_user):
+    passenger = make_user('passenger', 'p')
+    created = insert_rides(app, passenger, 20)
+
+    first = client.get('/api/rides', query_string={'limit': 5})
+    cursor = first.headers['X-Next-Cursor']
+    insert_rides(app, passenger, 4, start=datetime(2025, 1, 1))
+
+    ids = [ride['id'] for ride in first.json]
+    while cursor:
+        response = client.get('/api/rides', query_string={'limit': 5, 'cursor': cursor})
+        ids.extend(ride['id'] for ride in response.json)
+        cursor = response.headers.get('X-Next-Cursor')
+
+    assert sorted(ids) == sorted(created)
+
+
+def test_pagination_respects_filters(app, client, make_user):
+    passenger, other = make_user('passenger', 'p'), make_user('passenger', 'q')
+    mine = insert_rides(app, passenger, 12)
+    insert_rides(app, other, 12)
+
+    ids, _ = page_through(client, limit=5, passenger_id=passenger)
+
+    assert sorted(ids) == sorted(mine)
+
+
+def test_invalid_cursor_returns_400(client):
+    response = client.get('/api/rides', query_string={'cursor': 'nao-e-um-cursor'})
+    assert response.status_code == 400
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Button } from '@/components/ui/button.jsx';
 import { Input } from '@/components/ui/input.jsx';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card.jsx';
@@ -8,6 +8,8 @@ const ChatComponent = ({ ride, currentUser, onClose }) => {
   const [messages, setMessages] = useState([]);
   const [newMessage, setNewMessage] = useState('');
   const [loading, setLoading] = useState(false);
+  // Maior id de mensagem já recebido; o polling busca apenas as mais novas
+  const lastMessageIdRef = useRef(0);
 
   // API Base URL
   const getApiBase = () => {
@@ -27,19 +29,46 @@ const ChatComponent = ({ ride, currentUser, onClose }) => {
 
   useEffect(() => {
     if (ride) {
+      lastMessageIdRef.current = 0;
+      setMessages([]);
       fetchMessages();
-      // Atualizar mensagens a cada 5 segundos
+
+      if (window.EventSource) {
+        // Novas mensagens chegam pelo stream SSE da corrida
+        const events = new EventSource(`${API_BASE}/rides/${ride.id}/events`);
+        events.addEventListener('message', (event) => appendMessages([JSON.parse(event.data)]));
+        // Ao (re)conectar ou após perder eventos, buscar o que faltou com after_id
+        events.addEventListener('open', fetchMessages);
+        events.addEventListener('resync', fetchMessages);
+        return () => events.close();
+      }
+
+      // Navegadores sem EventSource: atualizar mensagens a cada 5 segundos
       const interval = setInterval(fetchMessages, 5000);
       return () => clearInterval(interval);
     }
   }, [ride]);
 
+  const appendMessages = (newMessages) => {
+    if (newMessages.length === 0) return;
+    lastMessageIdRef.current = Math.max(lastMessageIdRef.current, ...newMessages.map((m) => m.id));
+    setMessages((current) => {
+      const knownIds = new Set(current.map((m) => m.id));
+      return [...current, ...newMessages.filter((m) => !knownIds.has(m.id))];
+    });
+  };
+
   const fetchMessages = async () => {
     try {
-      const response = await fetch(`${API_BASE}/rides/${ride.id}/messages`);
-      if (response.ok) {
+      const afterId = lastMessageIdRef.current;
+      const url = afterId
+        ? `${API_BASE}/rides/${ride.id}/messages?after_id=${afterId}`
+        : `${API_BASE}/rides/${ride.id}/messages`;
+      const response = await fetch(url);
+      // 304: nada novo desde o último polling
+      if (response.ok && response.status !== 304) {
         const data = await response.json();
-        setMessages(data);
+        appendMessages(data);
       }
     } catch (error) {
       console.error('Erro ao buscar mensagens:', error);
@@ -64,7 +93,7 @@ const ChatComponent = ({ ride, currentUser, onClose }) => {
 
       if (response.ok) {
         const message = await response.json();
-        setMessages([...messages, message]);
+        appendMessages([message]);
         setNewMessage('');
       } else {
         const error = await response.json();
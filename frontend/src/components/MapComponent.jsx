@@ -8,6 +8,7 @@ import { MapPin, Navigation, Car, User, RefreshCw } from 'lucide-react';
 import 'leaflet/dist/leaflet.css';
 import './MapStyles.css';
 import L from 'leaflet';
+import { decodePolyline } from '@/lib/polyline.js';
 
 // Fix para ícones do Leaflet
 delete L.Icon.Default.prototype._getIconUrl;
@@ -107,8 +108,22 @@ const MapComponent = ({
   useEffect(() => {
     // Buscar localização do motorista se for uma corrida ativa
     if (ride && ride.driver_id && currentUser.user_type === 'passenger') {
-      const interval = setInterval(fetchDriverLocation, 5000); // Atualizar a cada 5 segundos
       fetchDriverLocation(); // Buscar imediatamente
+
+      if (window.EventSource) {
+        // Localização do motorista enviada pelo stream SSE da corrida
+        const events = new EventSource(`${API_BASE}/rides/${ride.id}/events`);
+        events.addEventListener('location', (event) => {
+          const location = JSON.parse(event.data);
+          if (location.user_id === ride.driver_id) {
+            setDriverLocation(location);
+          }
+        });
+        events.addEventListener('resync', fetchDriverLocation);
+        return () => events.close();
+      }
+
+      const interval = setInterval(fetchDriverLocation, 5000); // Atualizar a cada 5 segundos
       return () => clearInterval(interval);
     }
   }, [ride]);
@@ -252,6 +267,10 @@ const MapComponent = ({
     }
 
     const geometry = routeData.route.geometry;
+    if (typeof geometry === 'string') {
+      // Polyline codificada (?geometry=polyline ou polyline6)
+      return decodePolyline(geometry, routeData.route.geometry_format === 'polyline6' ? 6 : 5);
+    }
     if (geometry.type === 'LineString') {
       // Converter de [lng, lat] para [lat, lng] para o Leaflet
       return geometry.coordinates.map(coord => [coord[1], coord[0]]);
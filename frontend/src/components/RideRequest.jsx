@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Button } from '@/components/ui/button.jsx';
 import { Input } from '@/components/ui/input.jsx';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card.jsx';
@@ -28,6 +28,58 @@ const RideRequest = ({ user, onRideCreated }) => {
 
   const API_BASE = getApiBase();
 
+  // Sugestões de endereço enquanto o usuário digita (índice em memória no backend)
+  const suggestionTimers = useRef({});
+  const latestQuery = useRef({});
+
+  const fetchSuggestions = (text, setSuggestions, field) => {
+    clearTimeout(suggestionTimers.current[field]);
+    latestQuery.current[field] = text;
+    if (text.trim().length < 2) {
+      setSuggestions([]);
+      return;
+    }
+    suggestionTimers.current[field] = setTimeout(async () => {
+      try {
+        const params = new URLSearchParams({ q: text });
+        if (user?.latitude != null && user?.longitude != null) {
+          params.set('lat', user.latitude);
+          params.set('lng', user.longitude);
+        }
+        const response = await fetch(`${API_BASE}/places/autocomplete?${params}`);
+        // Descartar respostas de textos que o usuário já alterou
+        if (response.ok && latestQuery.current[field] === text) {
+          setSuggestions(await response.json());
+        }
+      } catch (error) {
+        console.error('Erro ao buscar sugestões:', error);
+      }
+    }, 120);
+  };
+
+  useEffect(() => {
+    const timers = suggestionTimers.current;
+    return () => Object.values(timers).forEach(clearTimeout);
+  }, []);
+
+  const renderSuggestions = (suggestions, onSelect) => (
+    suggestions.length > 0 && (
+      <ul className="border rounded-md divide-y bg-background text-sm">
+        {suggestions.map((suggestion) => (
+          <li key={suggestion.display_name}>
+            <button
+              type="button"
+              className="w-full text-left px-3 py-2 hover:bg-muted"
+              onClick={() => onSelect(suggestion.display_name)}
+            >
+              {suggestion.display_name}
+            </button>
+          </li>
+        ))}
+      </ul>
+    )
+  );
+
   const getCurrentLocation = () => {
     return new Promise((resolve, reject) => {
       if (!navigator.geolocation) {
@@ -117,6 +169,8 @@ const RideRequest = ({ user, onRideCreated }) => {
         const ride = await response.json();
         setOrigin('');
         setDestination('');
+        setOriginSuggestions([]);
+        setDestinationSuggestions([]);
         if (onRideCreated) {
           onRideCreated(ride);
         }
@@ -148,7 +202,10 @@ const RideRequest = ({ user, onRideCreated }) => {
             <Input
               placeholder="Digite o endereço de origem..."
               value={origin}
-              onChange={(e) => setOrigin(e.target.value)}
+              onChange={(e) => {
+                setOrigin(e.target.value);
+                fetchSuggestions(e.target.value, setOriginSuggestions, 'origin');
+              }}
               className="flex-1"
             />
             <Button
@@ -165,6 +222,10 @@ const RideRequest = ({ user, onRideCreated }) => {
               )}
             </Button>
           </div>
+          {renderSuggestions(originSuggestions, (address) => {
+            setOrigin(address);
+            setOriginSuggestions([]);
+          })}
         </div>
 
         <div className="space-y-2">
@@ -172,8 +233,15 @@ const RideRequest = ({ user, onRideCreated }) => {
           <Input
             placeholder="Digite o endereço de destino..."
             value={destination}
-            onChange={(e) => setDestination(e.target.value)}
+            onChange={(e) => {
+              setDestination(e.target.value);
+              fetchSuggestions(e.target.value, setDestinationSuggestions, 'destination');
+            }}
           />
+          {renderSuggestions(destinationSuggestions, (address) => {
+            setDestination(address);
+            setDestinationSuggestions([]);
+          })}
         </div>
 
         <Button
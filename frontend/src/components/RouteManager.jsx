@@ -187,7 +187,7 @@ const RouteManager = ({
     try {
       setIsCalculating(true);
       
-      const response = await fetch(`${API_BASE}/rides/${ride.id}/calculate-route`, {
+      const response = await fetch(`${API_BASE}/rides/${ride.id}/calculate-route?geometry=polyline6&tolerance=5`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -0,0 +1,27 @@
+// Decodifica uma Encoded Polyline (precisão 5 ou 6) em pontos [lat, lng] para o Leaflet
+export function decodePolyline(encoded, precision = 5) {
+  const factor = Math.pow(10, precision);
+  const points = [];
+  let index = 0;
+  let lat = 0;
+  let lng = 0;
+
+  while (index < encoded.length) {
+    const deltas = [];
+    for (let i = 0; i < 2; i++) {
+      let shift = 0;
+      let result = 0;
+      let byte;
+      do {
+        byte = encoded.charCodeAt(index++) - 63;
+        result |= (byte & 0x1f) << shift;
+        shift += 5;
+      } while (byte >= 0x20);
+      deltas.push(result & 1 ? ~(result >> 1) : result >> 1);
+    }
+    lat += deltas[0];
+    lng += deltas[1];
+    points.push([lat / factor, lng / factor]);
+  }
+  return points;
+}